@@ -8,4 +8,11 @@ class Config:
     BACKEND_URL = os.environ.get('BACKEND_URL') or 'http://127.0.0.1:8000/v1'
     DEBUG = os.environ.get('DEBUG', 'False').lower() in ('true', '1', 't')
     HOST = os.environ.get('HOST', '0.0.0.0')
-    PORT = int(os.environ.get('PORT', 3000))
\ No newline at end of file
+    PORT = int(os.environ.get('PORT', 3000))
+    # Downloads are streamed through in chunks of this size
+    DOWNLOAD_CHUNK_SIZE = int(os.environ.get('DOWNLOAD_CHUNK_SIZE', 256 * 1024))
+    # 'nginx' (X-Accel-Redirect) or 'sendfile' (X-Sendfile) hands the body to the web server
+    # when it can read the back end's TRANSLATED_DIR; empty streams through Flask
+    DOWNLOAD_ACCEL_MODE = os.environ.get('DOWNLOAD_ACCEL_MODE', '').lower()
+    DOWNLOAD_ACCEL_PREFIX = os.environ.get('DOWNLOAD_ACCEL_PREFIX', '/protected/translated/')
+    DOWNLOAD_SHARED_DIR = os.environ.get('DOWNLOAD_SHARED_DIR', '')
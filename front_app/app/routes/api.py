@@ -90,12 +90,27 @@ def api_translate_start():
     translation_service = TranslationService()
     return translation_service.start_translation(request.json, request.cookies)
 
+@api_bp.route('/translate/status', methods=['GET'])
+def api_translate_statuses():
+    translation_service = TranslationService()
+    return translation_service.get_statuses(request.args, request.cookies)
+
 @api_bp.route('/translate/status/<project_id>', methods=['GET'])
 def api_translate_status(project_id):
     translation_service = TranslationService()
     return translation_service.get_status(project_id, request.cookies)
 
+@api_bp.route('/translate/events', methods=['GET'])
+def api_translate_events():
+    translation_service = TranslationService()
+    return translation_service.stream_events(request.cookies)
+
+@api_bp.route('/translate/cancel/<project_id>', methods=['POST'])
+def api_translate_cancel(project_id):
+    translation_service = TranslationService()
+    return translation_service.cancel_translation(project_id, request.cookies)
+
 @api_bp.route('/translate/download/<project_id>', methods=['GET'])
 def api_translate_download(project_id):
     translation_service = TranslationService()
-    return translation_service.get_download_url(project_id, request.cookies)
+    return translation_service.get_download_url(project_id, request.cookies, request.headers)
@@ -1,7 +1,15 @@
+import os
 import requests
-from flask import jsonify, redirect, url_for
+from flask import jsonify, redirect, url_for, Response, stream_with_context
 from app.config import Config
 
+# Headers that make ranged and conditional downloads work end to end
+FORWARDED_REQUEST_HEADERS = ('Range', 'If-Range', 'If-None-Match')
+FORWARDED_RESPONSE_HEADERS = (
+    'Content-Type', 'Content-Length', 'Content-Range', 'Content-Disposition',
+    'Accept-Ranges', 'ETag', 'Last-Modified'
+)
+
 class TranslationService:
     def __init__(self):
         self.backend_url = Config.BACKEND_URL
@@ -58,6 +66,8 @@ class TranslationService:
         projectType = data.get('projectType')
         video_size = data.get('video_size')
         useWalletBalance = data.get('useWalletBalance', True)
+        streams = data.get('streams', 1)
+        tier = data.get('tier', 'standard')
 
         try:
             response = requests.post(
@@ -67,7 +77,9 @@ class TranslationService:
                     "resolution" :resolution,
                     "projectType": projectType,
                     "videoSize" : video_size,
-                    "useWalletBalance": True
+                    "useWalletBalance": True,
+                    "streams": streams,
+                    "tier": tier
                 },
                 cookies=cookies
             )
@@ -97,7 +109,74 @@ class TranslationService:
         except requests.exceptions.RequestException:
             return jsonify({"success": False, "message": "Server error"})
     
-    def get_download_url(self, project_id, cookies):
+    def get_statuses(self, params, cookies):
+        try:
+            response = requests.get(
+                f"{self.backend_url}/translate/status",
+                params={name: params.get(name) for name in ('ids', 'since') if params.get(name)},
+                cookies=cookies
+            )
+
+            if response.status_code == 200:
+                return jsonify(response.json())
+            elif response.status_code == 401:
+                return redirect(url_for('auth.login'))
+            else:
+                return jsonify({"success": False, "message": "Failed to get translation status"})
+        except requests.exceptions.RequestException:
+            return jsonify({"success": False, "message": "Server error"})
+
+    def stream_events(self, cookies):
+        try:
+            # No read timeout: the back end holds the stream open and sends keepalives
+            response = requests.get(
+                f"{self.backend_url}/translate/events",
+                cookies=cookies,
+                stream=True,
+                timeout=(10, None)
+            )
+
+            if response.status_code == 200:
+                return Response(
+                    stream_with_context(self._iter_events(response)),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+                )
+            response.close()
+            if response.status_code == 401:
+                return redirect(url_for('auth.login'))
+            else:
+                return jsonify({"success": False, "message": "Failed to open event stream"})
+        except requests.exceptions.RequestException:
+            return jsonify({"success": False, "message": "Server error"})
+
+    def _iter_events(self, response):
+        try:
+            # chunk_size=None hands over each event as soon as it arrives
+            for chunk in response.iter_content(chunk_size=None):
+                if chunk:
+                    yield chunk
+        finally:
+            response.close()
+
+    def cancel_translation(self, project_id, cookies):
+        try:
+            response = requests.post(
+                f"{self.backend_url}/translate/cancel/{project_id}",
+                cookies=cookies
+            )
+
+            if response.status_code == 200:
+                return jsonify(response.json())
+            elif response.status_code == 401:
+                return redirect(url_for('auth.login'))
+            else:
+                message = response.json().get('error', {}).get('message', 'Failed to cancel translation')
+                return jsonify({"success": False, "message": message})
+        except requests.exceptions.RequestException:
+            return jsonify({"success": False, "message": "Server error"})
+
+    def get_download_url(self, project_id, cookies, request_headers=None):
         try:
             response = requests.get(
                 f"{self.backend_url}/translate/download/{project_id}",
@@ -105,7 +184,8 @@ class TranslationService:
             )
             response_data = response.json()
             if response.status_code == 200 and response_data.get('success'):
-                return self.download_file(response_data.get('data').get('downloadUrl') , cookies=cookies)
+                return self.download_file(response_data.get('data').get('downloadUrl') , cookies=cookies,
+                                          request_headers=request_headers)
             elif response.status_code == 401:
                 return redirect(url_for('auth.login'))
             else:
@@ -113,18 +193,61 @@ class TranslationService:
         except requests.exceptions.RequestException:
             return jsonify({"success": False, "message": "Server error"})
     
-    def download_file(self, download_url, cookies):
+    def download_file(self, download_url, cookies, request_headers=None):
         try:
+            forwarded = {
+                name: request_headers.get(name)
+                for name in FORWARDED_REQUEST_HEADERS
+                if request_headers and request_headers.get(name)
+            }
+            # stream=True keeps the body on the socket; it is relayed chunk by chunk below
             response = requests.get(
                 download_url,
-                cookies=cookies
+                cookies=cookies,
+                headers=forwarded,
+                stream=True
             )
-            
-            if response.status_code == 200:
-                return response.content, response.status_code, dict(response.headers)
-            elif response.status_code == 401:
+
+            if response.status_code in (200, 206, 304, 416):
+                headers = {
+                    name: response.headers[name]
+                    for name in FORWARDED_RESPONSE_HEADERS
+                    if name in response.headers
+                }
+                accel_headers = self._accel_headers(response)
+                if accel_headers:
+                    response.close()
+                    # The web server serves the file itself and handles Range on its own
+                    for name in ('Content-Length', 'Content-Range'):
+                        headers.pop(name, None)
+                    return Response(status=200, headers={**headers, **accel_headers})
+                return Response(
+                    stream_with_context(self._iter_body(response)),
+                    status=response.status_code,
+                    headers=headers
+                )
+            response.close()
+            if response.status_code == 401:
                 return redirect(url_for('auth.login'))
             else:
                 return jsonify({"success": False, "message": "Failed to download file"})
         except requests.exceptions.RequestException:
-            return jsonify({"success": False, "message": "Server error"})
\ No newline at end of file
+            return jsonify({"success": False, "message": "Server error"})
+
+    def _iter_body(self, response):
+        try:
+            for chunk in response.iter_content(chunk_size=Config.DOWNLOAD_CHUNK_SIZE):
+                if chunk:
+                    yield chunk
+        finally:
+            response.close()
+
+    def _accel_headers(self, response):
+        file_name = os.path.basename(response.headers.get('X-Translated-File', ''))
+        if response.status_code != 200 or not file_name:
+            return None
+        if Config.DOWNLOAD_ACCEL_MODE == 'nginx':
+            return {'X-Accel-Redirect': Config.DOWNLOAD_ACCEL_PREFIX.rstrip('/') + '/' + file_name}
+        if Config.DOWNLOAD_ACCEL_MODE == 'sendfile' and Config.DOWNLOAD_SHARED_DIR:
+            return {'X-Sendfile': os.path.join(Config.DOWNLOAD_SHARED_DIR, file_name)}
+        return None
@@ -12,6 +12,7 @@ document.addEventListener('DOMContentLoaded', function() {
     initializeFileUpload();
     initializeSidebar();
     initializeFormValidation();
+    initializeProjectEvents();
 
     // Hide unsupported features
     hideUnsupportedFeatures();
@@ -499,6 +500,14 @@ function initializeTranslationForm() {
         });
     });
 
+    const processingTier = document.getElementById('processingTier');
+    if (processingTier) {
+        processingTier.addEventListener('change', function() {
+            recalculateCostAndDuration();
+            updateSubmitButton();
+        });
+    }
+
     if (sourceLanguage && targetLanguage) {
         sourceLanguage.addEventListener('change', function() {
             recalculateCostAndDuration();
@@ -545,7 +554,8 @@ function updateCostPreview(duration) {
         const operationData = pricingData[operationType.value];
         const costPerMinute = operationData.cost_per_minute;
         const multiplier = operationData.multiplier || 1.0;
-        const cost = operationData.price;
+        const tier = getSelectedTier();
+        const cost = operationData.tiers ? operationData.tiers[tier] : operationData.price;
 
         // Update resolution display
         const videoResolution = document.getElementById('videoResolution');
@@ -608,6 +618,11 @@ function updateCostPreview(duration) {
 }
 
 // Helper functions
+function getSelectedTier() {
+    const processingTier = document.getElementById('processingTier');
+    return processingTier ? processingTier.value : 'standard';
+}
+
 function getOperationCost(operationType, resolution = '720p') {
     // Use API data if available
     if (pricingData && pricingData[operationType]) {
@@ -811,7 +826,10 @@ function initializeFormValidation() {
 }
 
 // Websocket upload functionality
-// Websocket upload functionality
+// Large files are sent over several sockets at once to get past a single TCP window on high-latency links
+const PARALLEL_UPLOAD_MIN_SIZE = 64 * 1024 * 1024;
+const PARALLEL_UPLOAD_STREAMS = 4;
+
 function startWebsocketUpload(file, operationType, sourceLanguage, targetLanguage) {
     // Show upload progress UI
     const uploadProgress = document.getElementById('uploadProgress');
@@ -840,7 +858,9 @@ function startWebsocketUpload(file, operationType, sourceLanguage, targetLanguag
             duration: duration,
             resolution: resolution,
             projectType: operationType,
-            useWalletBalance: true
+            useWalletBalance: true,
+            tier: getSelectedTier(),
+            streams: file.size >= PARALLEL_UPLOAD_MIN_SIZE ? PARALLEL_UPLOAD_STREAMS : 1
         })
     })
     .then(response => response.json())
@@ -851,9 +871,10 @@ function startWebsocketUpload(file, operationType, sourceLanguage, targetLanguag
             const uploadUrl = data.uploadUrl;
             const logsUrl = data.logsUrl;
             const chunkSize = data.chunkSize;
+            const streamUrls = data.streamUrls || [];
 
             // Start websocket upload
-            uploadViaWebsocket(file, uploadUrl, uploadToken, chunkSize, logsUrl, projectId);
+            uploadViaWebsocket(file, uploadUrl, uploadToken, chunkSize, logsUrl, projectId, streamUrls);
         } else {
             throw new Error(data.message || 'Failed to start translation');
         }
@@ -868,24 +889,49 @@ function startWebsocketUpload(file, operationType, sourceLanguage, targetLanguag
     });
 }
 
+// SHA-256 of the file for the duplicate pre-check. WebCrypto cannot hash incrementally,
+// so files too large to hold in memory are sent without a hash and checked on the server only.
+const CONTENT_HASH_MAX_SIZE = 256 * 1024 * 1024;
+
+function computeContentHash(file) {
+    if (!window.crypto || !window.crypto.subtle || file.size > CONTENT_HASH_MAX_SIZE) {
+        return Promise.resolve(null);
+    }
+    return file.arrayBuffer()
+        .then(buffer => window.crypto.subtle.digest('SHA-256', buffer))
+        .then(digest => Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join(''))
+        .catch(() => null);
+}
+
 // Upload via websocket
-function uploadViaWebsocket(file, uploadUrl, uploadToken, chunkSize, logsUrl, projectId) {
+function uploadViaWebsocket(file, uploadUrl, uploadToken, chunkSize, logsUrl, projectId, streamUrls = []) {
     const uploadProgress = document.getElementById('uploadProgress');
     const progressBar = document.getElementById('progressBar');
     const uploadStatus = document.getElementById('uploadStatus');
+    const submitBtn = document.getElementById('submitBtn');
+    const MAX_RECONNECT_ATTEMPTS = 10;
 
     // Create websocket connection for logs
     const logsSocket = new WebSocket(logsUrl);
 
-    // Create websocket connection for upload
     const wsUrl = uploadUrl.replace('http', 'ws');
-    const uploadSocket = new WebSocket(wsUrl);
+    let uploadSocket = null;
 
     let totalChunks = Math.ceil(file.size / chunkSize);
-    let currentChunk = 0;
-    let uploadedBytes = 0;
+    let nextOffset = 0; // Byte offset of the next chunk, set from the server's durable offset on (re)connect
     let canStartUpload = false; // Flag to control upload start
     let stopUpload = false; // Flag to stop upload on complete/error
+    let reconnectAttempts = 0;
+    // The server skips the transfer entirely when it already has a file with this hash
+    let contentHash = null;
+    const contentHashReady = computeContentHash(file).then(hash => { contentHash = hash; });
+
+    function resetSubmitButton() {
+        uploadProgress.style.display = 'none';
+        submitBtn.disabled = false;
+        submitBtn.innerHTML = '<i data-feather="play" class="me-1"></i>شروع ترجمه';
+        if (typeof feather !== 'undefined') feather.replace();
+    }
 
     // Handle logs messages
     logsSocket.onmessage = function(event) {
@@ -893,22 +939,24 @@ function uploadViaWebsocket(file, uploadUrl, uploadToken, chunkSize, logsUrl, pr
 
         if (data.type === 'status') {
             uploadStatus.textContent = data.message || 'در حال پردازش...';
-            canStartUpload = true; // Allow upload to start
-            // Start sending metadata and chunks if upload socket is open
-            if (uploadSocket.readyState === WebSocket.OPEN) {
-                sendMetadataAndStart();
+            if (!canStartUpload) {
+                canStartUpload = true; // Allow upload to start
+                contentHashReady.then(() => {
+                    if (streamUrls.length > 1) {
+                        streamUrls.forEach(streamUrl => openUploadStream(streamUrl, 0));
+                    } else {
+                        openUploadSocket();
+                    }
+                });
             }
         } else if (data.type === 'progress') {
-            const progress = Math.round((data.progress || 0) * 100);
+            const progress = Math.min(100, Math.round(data.progress || 0)); // Percent of the file received
             progressBar.style.width = progress + '%';
             progressBar.textContent = progress + '%';
             uploadStatus.textContent = data.message || `در حال آپلود... (${progress}%)`;
         } else if (data.type === 'error') {
             showNotification('خطا در آپلود: ' + data.message, 'error');
-            uploadProgress.style.display = 'none';
-            submitBtn.disabled = false;
-            submitBtn.innerHTML = '<i data-feather="play" class="me-1"></i>شروع ترجمه';
-            if (typeof feather !== 'undefined') feather.replace();
+            resetSubmitButton();
             stopUpload = true; // Stop upload on error
         } else if (data.type === 'complete') {
             uploadProgress.style.display = 'none';
@@ -924,62 +972,158 @@ function uploadViaWebsocket(file, uploadUrl, uploadToken, chunkSize, logsUrl, pr
     logsSocket.onerror = function(error) {
         console.error('Logs WebSocket error:', error);
         showNotification('خطا در اتصال به سرور لاگ', 'error');
-        uploadProgress.style.display = 'none';
-        submitBtn.disabled = false;
-        submitBtn.innerHTML = '<i data-feather="play" class="me-1"></i>شروع ترجمه';
-        if (typeof feather !== 'undefined') feather.replace();
+        resetSubmitButton();
         stopUpload = true;
     };
 
-    // Handle upload socket events
-    uploadSocket.onopen = function() {
-        uploadStatus.textContent = 'در حال اتصال به سرور...';
-        // Only send metadata and start upload if status message received
-        if (canStartUpload) {
-            sendMetadataAndStart();
-        }
-    };
+    // Open (or reopen after a drop) the upload socket; the server replies with the offset to resume from
+    function openUploadSocket() {
+        uploadSocket = new WebSocket(wsUrl);
+        uploadSocket.binaryType = 'arraybuffer';
 
-    uploadSocket.onerror = function(error) {
-        console.error('Upload WebSocket error:', error);
-        showNotification('خطا در اتصال به سرور', 'error');
-        uploadProgress.style.display = 'none';
-        submitBtn.disabled = false;
-        submitBtn.innerHTML = '<i data-feather="play" class="me-1"></i>شروع ترجمه';
-        if (typeof feather !== 'undefined') feather.replace();
-        stopUpload = true;
-    };
+        uploadSocket.onopen = function() {
+            uploadStatus.textContent = 'در حال اتصال به سرور...';
+            uploadSocket.send(uploadMetadata());
+        };
 
-    function sendMetadataAndStart() {
-        // Send file metadata first
-        const fileExtension = file.name.toLowerCase().substring(file.name.lastIndexOf('.'));
-        uploadSocket.send(JSON.stringify({
-            file_extension: fileExtension
-        }));
+        uploadSocket.onmessage = function(event) {
+            const data = JSON.parse(event.data);
+            if (data.type === 'ready') {
+                reconnectAttempts = 0;
+                nextOffset = data.offset || 0;
+                sendNextChunk();
+            }
+        };
+
+        uploadSocket.onclose = function() {
+            if (stopUpload || nextOffset >= file.size) {
+                return;
+            }
+            if (reconnectAttempts >= MAX_RECONNECT_ATTEMPTS) {
+                showNotification('اتصال آپلود قطع شد', 'error');
+                resetSubmitButton();
+                return;
+            }
+            reconnectAttempts++;
+            uploadStatus.textContent = 'اتصال قطع شد، در حال اتصال مجدد...';
+            setTimeout(openUploadSocket, Math.min(30000, 1000 * 2 ** reconnectAttempts));
+        };
+
+        uploadSocket.onerror = function(error) {
+            console.error('Upload WebSocket error:', error);
+        };
+    }
+
+    function fileExtensionOf(file) {
+        return file.name.toLowerCase().substring(file.name.lastIndexOf('.') + 1);
+    }
+
+    function uploadMetadata() {
+        return JSON.stringify({
+            file_extension: fileExtensionOf(file),
+            file_size: file.size,
+            content_hash: contentHash
+        });
+    }
 
-        // Start sending chunks
-        sendNextChunk();
+    function showUploadedBytes(bytes) {
+        const progress = Math.round((bytes / file.size) * 100);
+        progressBar.style.width = progress + '%';
+        progressBar.textContent = progress + '%';
+        uploadStatus.textContent = `در حال آپلود موازی... (${progress}%)`;
+    }
+
+    // One of several parallel streams: the server assigns chunk indexes, each frame is an 8-byte offset plus the chunk
+    let parallelSentBytes = 0;
+    const parallelSentChunks = new Set(); // A chunk resent after a reconnect must not count twice
+    function openUploadStream(streamUrl, attempt) {
+        const socket = new WebSocket(streamUrl.replace('http', 'ws'));
+        socket.binaryType = 'arraybuffer';
+        let queue = [];
+        const outstanding = new Set(); // Assigned chunks the server has not acknowledged as durable yet
+
+        socket.onopen = function() {
+            socket.send(uploadMetadata());
+        };
+
+        socket.onmessage = function(event) {
+            const data = JSON.parse(event.data);
+            if (data.type === 'ready') {
+                attempt = 0;
+                queue = data.chunks.slice();
+                data.chunks.forEach(index => outstanding.add(index));
+                sendNextFrame();
+            } else if (data.type === 'ack') {
+                data.chunks.forEach(index => outstanding.delete(index));
+            }
+        };
+
+        socket.onclose = function() {
+            if (stopUpload || outstanding.size === 0) {
+                return;
+            }
+            if (attempt >= MAX_RECONNECT_ATTEMPTS) {
+                stopUpload = true;
+                showNotification('اتصال آپلود قطع شد', 'error');
+                resetSubmitButton();
+                return;
+            }
+            uploadStatus.textContent = 'اتصال قطع شد، در حال اتصال مجدد...';
+            setTimeout(() => openUploadStream(streamUrl, attempt + 1), Math.min(30000, 1000 * 2 ** (attempt + 1)));
+        };
+
+        function sendNextFrame() {
+            if (stopUpload || queue.length === 0 || socket.readyState !== WebSocket.OPEN) {
+                return;
+            }
+            const index = queue.shift();
+            const start = index * chunkSize;
+            const end = Math.min(start + chunkSize, file.size);
+
+            const reader = new FileReader();
+            reader.onload = function(e) {
+                if (socket.readyState !== WebSocket.OPEN) {
+                    return;
+                }
+                const frame = new Uint8Array(8 + (end - start));
+                new DataView(frame.buffer).setBigUint64(0, BigInt(start));
+                frame.set(new Uint8Array(e.target.result), 8);
+                socket.send(frame.buffer);
+
+                if (!parallelSentChunks.has(index)) {
+                    parallelSentChunks.add(index);
+                    parallelSentBytes += end - start;
+                }
+                showUploadedBytes(parallelSentBytes);
+                setTimeout(sendNextFrame, 10);
+            };
+            reader.readAsArrayBuffer(file.slice(start, end));
+        }
     }
 
     function sendNextChunk() {
-        if (currentChunk >= totalChunks || stopUpload) {
-            uploadSocket.close();
+        if (nextOffset >= file.size || stopUpload) {
             return;
         }
+        if (uploadSocket.readyState !== WebSocket.OPEN) {
+            return; // onclose schedules a reconnect which resumes from the server's offset
+        }
 
-        const start = currentChunk * chunkSize;
+        const start = nextOffset;
         const end = Math.min(start + chunkSize, file.size);
         const chunk = file.slice(start, end);
 
         const reader = new FileReader();
         reader.onload = function(e) {
+            if (uploadSocket.readyState !== WebSocket.OPEN) {
+                return;
+            }
             const arrayBuffer = e.target.result;
             uploadSocket.send(arrayBuffer);
+            nextOffset = end;
 
-            currentChunk++;
-            uploadedBytes += end - start;
-
-            const progress = Math.round((uploadedBytes / file.size) * 100);
+            const currentChunk = Math.ceil(end / chunkSize);
+            const progress = Math.round((end / file.size) * 100);
             progressBar.style.width = progress + '%';
             progressBar.textContent = progress + '%';
             uploadStatus.textContent = `آپلود بخش ${currentChunk} از ${totalChunks} (${progress}%)`;
@@ -991,29 +1135,73 @@ function uploadViaWebsocket(file, uploadUrl, uploadToken, chunkSize, logsUrl, pr
         reader.readAsArrayBuffer(chunk);
     }
 }
-// Progress tracking for uploads
-function trackUploadProgress(projectId) {
-    const checkStatus = () => {
-        fetch(`${API_BASE_URL}/translate/status/${projectId}`, {
-            credentials: 'include'
-        })
-        .then(response => response.json())
-        .then(data => {
-            if (data.success && data.data.status === 'completed') {
+// Project status updates pushed by the server over one Server-Sent Events stream
+let projectEvents = null;
+const trackedProjects = new Set(); // Projects uploaded from this page, announced when they finish
+
+function initializeProjectEvents() {
+    if (projectEvents || typeof EventSource === 'undefined') return;
+    // EventSource reconnects on its own and the server resends a snapshot on every connect
+    projectEvents = new EventSource(`${API_BASE_URL}/translate/events`, { withCredentials: true });
+    projectEvents.addEventListener('project', function(event) {
+        handleProjectEvent(JSON.parse(event.data));
+    });
+    projectEvents.onerror = function(error) {
+        console.error('Project events error:', error);
+    };
+}
+
+function handleProjectEvent(project) {
+    const row = document.querySelector(`#jobs-table tr[data-project-id="${project.projectId}"]`);
+    const badge = row ? row.querySelector('.project-status') : null;
+    const changed = row && row.dataset.status !== project.status;
+
+    if (project.status === 'processing' && badge) {
+        badge.className = 'badge bg-warning project-status';
+        badge.textContent = `در حال پردازش (${Math.round(project.progress || 0)}%)`;
+        row.dataset.status = project.status;
+    } else if (project.status === 'cancelled') {
+        trackedProjects.delete(project.projectId);
+        if (changed) location.reload();
+    } else if (project.status === 'completed' || project.status === 'failed') {
+        if (trackedProjects.has(project.projectId)) {
+            trackedProjects.delete(project.projectId);
+            if (project.status === 'completed') {
                 showNotification('پردازش ویدیو تکمیل شد!', 'success');
-                location.reload();
-            } else if (data.success && data.data.status === 'failed') {
+            } else {
                 showNotification('پردازش ویدیو ناموفق بود', 'error');
-            } else if (data.success && data.data.status === 'processing') {
-                setTimeout(checkStatus, 5000); // Check again in 5 seconds
             }
-        })
-        .catch(error => {
-            console.error('Error checking job status:', error);
-        });
-    };
+        }
+        // Re-render so the row gets its download button
+        if (changed) location.reload();
+    }
+}
 
-    checkStatus();
+function cancelProject(projectId) {
+    if (!confirm('پروژه لغو شود؟ مبلغ پرداخت‌شده به کیف پول شما بازمی‌گردد.')) return;
+    fetch(`${API_BASE_URL}/translate/cancel/${projectId}`, {
+        method: 'POST',
+        credentials: 'include'
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            showNotification(data.message, 'success');
+            setTimeout(() => location.reload(), 1000);
+        } else {
+            showNotification(data.message || 'لغو پروژه ناموفق بود', 'error');
+        }
+    })
+    .catch(error => {
+        console.error('Cancel error:', error);
+        showNotification('خطا در ارتباط با سرور', 'error');
+    });
+}
+
+// Progress tracking for uploads
+function trackUploadProgress(projectId) {
+    trackedProjects.add(projectId);
+    initializeProjectEvents();
 }
 
 // Notification system
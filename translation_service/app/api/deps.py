@@ -2,6 +2,7 @@ from fastapi import Depends, Cookie, Header
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.security import verify_mobile_token
+from app.core.config import settings
 from app.models.user import User
 from app.services.error_handlers import app_error
 
@@ -38,3 +39,13 @@ async def get_current_user(
             status_code=401
         )
     return user
+
+
+async def get_current_admin(current_user: User = Depends(get_current_user)):
+    if current_user.mobile != settings.ADMIN_PHONE:
+        app_error(
+            code="FORBIDDEN",
+            message="دسترسی غیرمجاز",
+            status_code=403
+        )
+    return current_user
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from .endpoints import auth, dashboard, account, wallet, translate
+from .endpoints import auth, dashboard, account, wallet, translate, metrics
 
 api_router = APIRouter()
 
@@ -8,3 +8,4 @@ api_router.include_router(dashboard.router, tags=["Dashboard"])
 api_router.include_router(account.router, tags=["Account"])
 api_router.include_router(wallet.router, tags=["Wallet"])
 api_router.include_router(translate.router, tags=["Translate"])
+api_router.include_router(metrics.router, tags=["Metrics"])
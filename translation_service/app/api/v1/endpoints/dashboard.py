@@ -9,7 +9,7 @@ from typing import Dict
 from app.models.project import Project, ProjectStatus
 from app.schemas.project import ProjectBase, DashboardData
 from app.api.deps import get_current_user
-from app.services.download import get_download_url_with_token
+from app.services.download import get_download_urls_with_tokens
 from app.services.error_handlers import app_error
 from app.core.config import settings
 
@@ -34,8 +34,12 @@ def get_dashboard(current_user: User = Depends(get_current_user), db: Session =
             Project.user_id == current_user.id,
             Project.status == ProjectStatus.completed
         ).all()
+        # One batch lookup instead of issuing a URL per completed project
+        download_urls = get_download_urls_with_tokens(
+            p.id for p in recent_projects + completed_projects if p.status == ProjectStatus.completed
+        )
         def project_to_dict(project: Project) -> Dict:
-            (download_url , expire_at) = get_download_url_with_token(project.id) if project.status == ProjectStatus.completed else (None , datetime.utcnow())
+            (download_url , expire_at) = download_urls.get(project.id, (None , datetime.utcnow()))
             return {
                 "name": project.name,
                 "type": project.type,
@@ -44,7 +48,8 @@ def get_dashboard(current_user: User = Depends(get_current_user), db: Session =
                 "progress": project.progress,
                 "completed_at": project.completed_at.isoformat() if project.completed_at else None,
                 "price" : project.price,
-                "project_id" : project.id
+                "project_id" : project.id,
+                "download_url" : download_url
             }
 
         recent_projects = [project_to_dict(p) for p in recent_projects]
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from app.core.database import get_db
+from app.models.user import User
+from app.api.deps import get_current_admin
+from app.services.eta import queue_backlog
+from app.services.job_queue import user_queue_depths, stuck_job_stats
+from app.services.output_cache import output_cache_stats
+from app.core.websocket_manager import manager
+
+router = APIRouter()
+
+@router.get("/metrics")
+def get_metrics(current_user: User = Depends(get_current_admin), db: Session = Depends(get_db)):
+    return {
+        "success": True,
+        "data": {
+            "progressEvents": manager.get_progress_stats(),
+            "queue": queue_backlog(db),
+            "userQueues": user_queue_depths(db),
+            "stuckJobs": stuck_job_stats(db),
+            "outputCache": output_cache_stats(db)
+        }
+    }
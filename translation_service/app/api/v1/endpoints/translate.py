@@ -3,30 +3,43 @@ import uuid
 import math
 import asyncio
 import json
+import hashlib
+import logging
+from typing import Optional, Set
 from datetime import datetime, timedelta, timezone
-from fastapi import APIRouter, Depends, UploadFile, File, WebSocket, WebSocketDisconnect, Query, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, UploadFile, File, WebSocket, WebSocketDisconnect, Query, HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse
 from requests import session
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, or_
 from app.core.config import settings
 from app.core.database import get_db, SessionLocal
 from app.models.user import User
 from app.models.project import Project as DBProject, ProjectStatus, get_project_type
+from app.models.job import JobStatus
 from app.schemas.project import (
     VideoUploadResponse, TranslationPricesResponse,
     StartTranslationRequest, StartTranslationResponse,
-    TranslationStatusResponse, DownloadUrlResponse, TranslationPricesRequest
+    TranslationStatusResponse, DownloadUrlResponse, TranslationPricesRequest, CancelTranslationResponse
 )
 from app.api.deps import get_current_user
-from app.services.download import verify_download_token, get_download_url_with_token
-from app.services.pricing import PRICING, calculate_price, calculate_prices
+from app.services.download import verify_download_token, get_download_url_with_token, build_file_response
+from app.services.pricing import PRICING, TIERS, calculate_price, calculate_prices
+from app.services.eta import QueueSnapshot, queue_snapshot, queue_estimate, format_eta
 from app.core.security import generate_upload_token, verify_upload_token, create_access_token
 from app.core.websocket_manager import manager
-from app.services.videos import add_to_executor
+from app.core.file_handler import UploadSink, run_io, preallocate_file
+from app.core.content_store import normalize_content_hash, link_existing, add_to_store, hash_file, link_or_copy
+from app.services.videos import add_to_executor, discard_cancelled_output
+from app.services.job_queue import cancel_job
+from app.services.output_cache import cached_output
+from app.services.translation import translated_path
+from app.services import early_start
+from app.services.media_probe import MediaInfo, probe_file
 from app.services.error_handlers import app_error
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 os.makedirs(settings.TRANSLATED_DIR, exist_ok=True)
@@ -69,10 +82,17 @@ def start_translation(
                 message="گزینه ترجمه یافت نشد",
                 status_code=404
             )
+        if request.tier not in TIERS:
+            app_error(
+                code="INVALID_TIER",
+                message="سطح پردازش نامعتبر است",
+                status_code=400
+            )
 
         width, height = map(int, request.resolution.split("x"))
 
-        total_price, multiplier, video_type = calculate_price(request.projectType,width , height , request.duration)
+        total_price, multiplier, video_type = calculate_price(request.projectType,width , height , request.duration,
+                                                              request.tier)
         if request.useWalletBalance and current_user.balance < total_price:
             app_error(
                 code="INSUFFICIENT_BALANCE",
@@ -87,6 +107,9 @@ def start_translation(
             video_id=None,
             status=ProjectStatus.awaiting_upload,
             price=total_price,
+            tier=request.tier,
+            duration=request.duration,
+            resolution=request.resolution,
         )
         db.add(new_project)
         db.flush()
@@ -96,25 +119,38 @@ def start_translation(
             project_id=new_project.id,
             expires_delta=timedelta(hours=settings.UPLOAD_TOKEN_EXPIRE_HOURS)
         )
+        streams = max(1, min(request.streams, settings.UPLOAD_MAX_STREAMS))
         manager.create_upload_session(
             upload_id=upload_id,
             project_id=new_project.id,
             user_id=current_user.id,
-            file_size=request.videoSize
+            file_size=request.videoSize,
+            streams=streams
         )
         websocket_url = f"{settings.BASE_URL}/v1/translate/ws/upload/{upload_id}?token={upload_token}"
         logs_url = f"{settings.BASE_URL}/v1/translate/ws/logs/{upload_id}?token={upload_token}"
+        estimate = queue_estimate(queue_snapshot(db, [new_project]), new_project)
+        stream_urls = [
+            f"{settings.BASE_URL}/v1/translate/ws/upload/{upload_id}/stream/{index}?token={upload_token}"
+            for index in range(streams)
+        ] if streams > 1 else []
         return {
             "success": True,
             "message": "ترجمه ثبت شد. اکنون می‌توانید فایل را آپلود کنید",
             "projectId": new_project.id,
-            "estimatedTime": settings.ESTIMATED_TRANSLATION_TIME,
+            "estimatedTime": format_eta(estimate["estimatedSeconds"]),
+            "estimatedSeconds": estimate["estimatedSeconds"],
+            "queuePosition": estimate["queuePosition"],
             "uploadToken": upload_token,
             "uploadUrl": websocket_url,
             "logsUrl": logs_url,
             "chunkSize": settings.CHUNK_SIZE,
+            "streams": streams,
+            "streamUrls": stream_urls,
             "price": total_price,
         }
+    except HTTPException as http:
+        raise http
     except Exception as e:
         app_error(
             code="INTERNAL_SERVER_ERROR",
@@ -123,6 +159,223 @@ def start_translation(
             status_code=500
         )
 
+def media_price(project: DBProject, media: Optional[MediaInfo]) -> Optional[tuple]:
+    """
+    Price a project from the duration and resolution read from its file,
+    falling back to the declared value for whatever the file doesn't tell.
+
+    Returns:
+        (price, duration, resolution), or None when the file tells nothing
+    """
+    if media is None or not (media.duration or media.resolution):
+        return None
+    duration = media.duration or project.duration
+    resolution = media.resolution or project.resolution
+    billed = duration
+    if project.duration and duration <= project.duration + settings.MEDIA_DURATION_TOLERANCE_SECONDS:
+        # Clients declare whole seconds; a fraction over must not tip the price into the next minute
+        billed = min(duration, project.duration)
+    width, height = map(int, resolution.split("x"))
+    price, _, _ = calculate_price(project.type.value, width, height, billed, project.tier)
+    return price, duration, resolution
+
+
+def reconcile_media(project: DBProject, file_path: str):
+    """Re-price a project from its uploaded file, rejecting files that cost more than they were priced at."""
+    priced = media_price(project, probe_file(file_path))
+    if priced is None:
+        if settings.MEDIA_PROBE_REQUIRED:
+            app_error(
+                code="UNREADABLE_MEDIA",
+                message="مشخصات ویدیو قابل خواندن نیست",
+                status_code=400
+            )
+        return
+    price, duration, resolution = priced
+    if price > project.price:
+        app_error(
+            code="MEDIA_MISMATCH",
+            message="مدت یا کیفیت ویدیو با اطلاعات اعلام‌شده مطابقت ندارد",
+            details={"duration": round(duration), "resolution": resolution, "price": price},
+            status_code=400
+        )
+    # Declared values may overstate the file; charge for what it really is
+    project.duration = duration
+    project.resolution = resolution
+    project.price = price
+
+
+def check_media_prefix(session: dict, file_path: str, received: int):
+    """Stop an upload as soon as the received header shows the file costs more than it was priced at."""
+    media = probe_file(file_path, received)
+    if media is None or not media.complete:
+        return
+    db = SessionLocal()
+    try:
+        project = db.get(DBProject, session["project_id"])
+        priced = media_price(project, media)
+        if priced and priced[0] > project.price:
+            raise ValueError(f"Video is {round(media.duration)}s at {media.resolution}, "
+                             "which doesn't match the duration and resolution it was priced with")
+    finally:
+        db.close()
+    # Only a passed check is skipped from now on; a rejected upload is checked again when it reconnects
+    session["media_checked"] = True
+
+
+async def finalize_upload(db: Session, upload_id: str, session: dict, file_path: str, content_hash: str | None = None):
+    """
+    Charge the user, queue the project and close the upload session once every
+    byte is on disk. A video already translated to the same project type is
+    completed right away from the output cache.
+    """
+    try:
+        if content_hash:
+            await run_io(add_to_store, file_path, content_hash)
+        # Segments processed while the upload streamed in move under the key the job will use. A pass
+        # still running hands them over when it stops, so no upload I/O thread waits for it
+        adoption = await run_io(early_start.adopt, upload_id, content_hash or f"video-{os.path.basename(file_path)}")
+        await asyncio.wrap_future(adoption)
+        with db.begin():
+            project = db.query(DBProject).filter(DBProject.id == session["project_id"]).first()
+            if not project:
+                app_error(
+                    code="PROJECT_NOT_FOUND",
+                    message="پروژه یافت نشد",
+                    status_code=404
+                )
+            if project.status == ProjectStatus.cancelled:
+                app_error(
+                    code="PROJECT_CANCELLED",
+                    message="پروژه لغو شده است",
+                    status_code=400
+                )
+            await run_io(reconcile_media, project, file_path)
+            if project.owner.balance < project.price:
+                app_error(
+                    code="INSUFFICIENT_BALANCE",
+                    message="موجودی کافی نیست",
+                    status_code=400
+                )
+            project.video_id = os.path.basename(file_path)
+            project.content_hash = content_hash
+            project.status = ProjectStatus.awaiting_queue
+            project.progress = 0
+            project.owner.balance -= project.price
+            cached = cached_output(db, content_hash, project.type) if content_hash else None
+            if cached:
+                try:
+                    await run_io(link_or_copy, cached, translated_path(project.id, file_path))
+                except OSError as e:
+                    logger.warning(f"Could not reuse cached output {cached} for project {project.id}: {e}")
+                    cached = None
+            if cached:
+                project.status = ProjectStatus.completed
+                project.progress = 100.0
+                project.completed_at = datetime.utcnow()
+                result = {"status": "Translation reused from an earlier project"}
+            else:
+                result = add_to_executor(project.id, db)
+            user_id = project.user_id
+            status, progress = project.status, project.progress
+            await manager.send_json_to_type(
+                {
+                    "type": "complete",
+                    "message": f"File upload completed successfully, {result.get('status', 'Task status unknown')}",
+                    "project_id": project.id
+                },
+                upload_id,
+                "logs"
+            )
+            if cached:
+                await manager.send_json_to_type(
+                    {"type": "translation_complete", "project_id": project.id, "progress": 100.0},
+                    upload_id,
+                    "logs"
+                )
+    except Exception:
+        # Let a reconnecting client retry the finalization
+        session["status"] = "uploading"
+        raise
+    manager.complete_upload_session(upload_id, file_path)
+    manager.notify_user(user_id, session["project_id"], status.value, progress)
+
+
+def resolve_upload_file(upload_id: str, session: dict, metadata_frame: str) -> str:
+    try:
+        metadata = json.loads(metadata_frame)
+        file_extension = metadata.get("file_extension", "mp4")
+    except json.JSONDecodeError:
+        raise ValueError("Invalid metadata format")
+    if metadata.get("file_size") is not None and metadata["file_size"] != session["file_size"]:
+        raise ValueError("File size does not match the size given at start")
+    session["content_hash"] = session.get("content_hash") or normalize_content_hash(metadata.get("content_hash"))
+    # On resume keep writing into the file the session already started
+    file_extension = session["file_extension"] or file_extension
+    session["file_extension"] = file_extension
+    file_path = os.path.join(settings.UPLOAD_DIR, f"{session['project_id']}_{upload_id}.{file_extension}")
+    session["file_path"] = file_path
+    return file_path
+
+
+# Uploads whose duplicate check is running; their other streams wait for its outcome
+_checking_duplicates: Set[str] = set()
+
+
+async def _link_stored_upload(db: Session, session: dict, file_path: str, content_hash: str) -> bool:
+    with db.begin():
+        uploaded_before = db.query(DBProject.id).filter(
+            DBProject.user_id == session["user_id"],
+            DBProject.content_hash == content_hash
+        ).first()
+    return uploaded_before is not None and await run_io(link_existing, content_hash, session["file_size"], file_path)
+
+
+async def link_duplicate_upload(db: Session, websocket: WebSocket, upload_id: str, session: dict, file_path: str) -> bool:
+    """
+    Skip the transfer when the content store already has the file the client
+    described. A hash alone proves nothing about having the file, so only
+    videos the same user uploaded before are reused this way. The check runs
+    once per upload, and only one of its parallel streams finalizes it.
+    """
+    content_hash = session.get("content_hash")
+    if not content_hash:
+        return False
+    if upload_id in _checking_duplicates:
+        while upload_id in _checking_duplicates:
+            await asyncio.sleep(0.05)
+    elif "duplicate" not in session:
+        # Claimed before the first await, so the other streams can't start a check of their own
+        _checking_duplicates.add(upload_id)
+        try:
+            session["duplicate"] = await _link_stored_upload(db, session, file_path, content_hash)
+        finally:
+            _checking_duplicates.discard(upload_id)
+    if not session.get("duplicate"):
+        return False
+    # Likewise claimed before the next await, so only the first stream to get here finalizes
+    finalize = session["status"] not in ("finalizing", "completed")
+    if finalize:
+        session["status"] = "finalizing"
+    await manager.send_personal_message(
+        json.dumps({"type": "ready", "offset": session["file_size"], "chunks": [], "duplicate": True}),
+        websocket
+    )
+    if finalize:
+        await finalize_upload(db, upload_id, session, file_path, content_hash)
+    return True
+
+
+async def verify_content_hash(upload_id: str, session: dict, file_path: str, actual_hash: str):
+    """Reject an upload whose bytes do not match the hash the client announced."""
+    claimed_hash = session.get("content_hash")
+    if claimed_hash and claimed_hash != actual_hash:
+        # Nothing received can be trusted, so the client has to start over
+        await run_io(os.remove, file_path)
+        await asyncio.wrap_future(await run_io(early_start.discard, upload_id))
+        manager.reset_upload_session(upload_id)
+        raise ValueError("Content hash mismatch, upload must be restarted")
+
 @router.websocket("/translate/ws/upload/{upload_id}")
 async def websocket_upload(websocket: WebSocket, upload_id: str, token: str = Query(...)):
     token_data = verify_upload_token(token)
@@ -133,88 +386,223 @@ async def websocket_upload(websocket: WebSocket, upload_id: str, token: str = Qu
     if not session:
         await websocket.close(code=4002, reason="Upload session not found")
         return
-    if session["status"] == "completed":
+    if session["status"] in ("completed", "finalizing"):
         await websocket.close(code=4003, reason="Upload session already completed")
         return
     if not manager.is_logs_socket_connected(upload_id):
         await websocket.close(code=4003, reason="Logs socket not connected. Please connect to logs socket first.")
         return
+    if session.get("streams", 1) > 1:
+        await websocket.close(code=4005, reason="Multi-stream session, use the stream upload URLs")
+        return
+    if manager.is_upload_socket_connected(upload_id):
+        # A stale socket from before a network blip is still open; the client retries once it is gone
+        await websocket.close(code=4004, reason="Upload already in progress on another connection")
+        return
     await manager.connect(websocket, upload_id, "upload")
     db = SessionLocal()
     try:
-        data = await websocket.receive_text()
-        try:
-            metadata = json.loads(data)
-            file_extension = metadata.get("file_extension", "mp4")
-        except json.JSONDecodeError:
-            await manager.send_json_to_type(
-                {"type": "error", "message": "Invalid metadata format"},
-                upload_id,
-                "logs"
-            )
-            raise ValueError("Invalid metadata format")
-        session["file_extension"] = file_extension
-        file_path = os.path.join(settings.UPLOAD_DIR, f"{session['project_id']}_{upload_id}.{file_extension}")
-        session["file_path"] = file_path
+        file_path = resolve_upload_file(upload_id, session, await websocket.receive_text())
+        if await link_duplicate_upload(db, websocket, upload_id, session, file_path):
+            return
+        # Only bytes that were fsynced before the last ack are trusted
+        offset = 0
+        if os.path.exists(file_path):
+            offset = min(session.get("committed_offset", 0), os.path.getsize(file_path))
+        manager.commit_upload_offset(upload_id, offset)
+        await manager.send_personal_message(json.dumps({"type": "ready", "offset": offset}), websocket)
         await manager.send_json_to_type(
-            {"status": "ready", "message": "Ready to receive file"},
+            {"status": "ready", "message": "Ready to receive file", "offset": offset},
             upload_id,
             "logs"
         )
-        bytes_received = 0
-        with open(file_path, "wb") as f:
+        bytes_received = offset
+        # Hash in write order; a resumed upload first catches up on the bytes already on disk
+        hasher = await run_io(hash_file, file_path, offset) if offset else hashlib.sha256()
+        sink = await UploadSink(file_path, offset, hasher=hasher).open()
+        try:
+            async def commit():
+                durable_offset = await sink.flush()
+                await run_io(manager.commit_upload_offset, upload_id, durable_offset)
+                early_start.advance(upload_id, session, durable_offset)
+                if not session.get("media_checked"):
+                    await run_io(check_media_prefix, session, file_path, durable_offset)
+
             while bytes_received < session["file_size"]:
                 try:
                     chunk = await websocket.receive_bytes()
-                    f.write(chunk)
+                    # Waits only when the write-behind buffers are full, pausing reads from the socket
+                    await sink.write(chunk)
                     bytes_received += len(chunk)
+                    if bytes_received - session["committed_offset"] >= settings.UPLOAD_ACK_BYTES:
+                        await commit()
+                        await manager.send_personal_message(
+                            json.dumps({"type": "ack", "offset": bytes_received}),
+                            websocket
+                        )
                     updated_session = manager.update_upload_progress(upload_id, bytes_received)
                     if updated_session:
-                        await manager.send_json_to_type(
+                        await manager.publish_progress(
+                            upload_id,
                             {
                                 "type": "progress",
                                 "progress": updated_session["progress"],
                                 "bytes_received": bytes_received
                             },
-                            upload_id,
-                            "logs"
+                            progress=100 * bytes_received / max(1, session["file_size"]),
+                            final=bytes_received >= session["file_size"]
                         )
                 except WebSocketDisconnect:
+                    # Keep what has arrived so the client can resume instead of starting over
+                    await commit()
+                    manager.progress_publisher.discard(upload_id)
                     await manager.send_json_to_type(
-                        {"type": "error", "message": "Upload disconnected unexpectedly"},
+                        {
+                            "type": "paused",
+                            "message": "Upload disconnected, reconnect to resume",
+                            "offset": bytes_received
+                        },
                         upload_id,
                         "logs"
                     )
-                    raise
-        with db.begin():
-            project = db.query(DBProject).filter(DBProject.id == session["project_id"]).first()
-            if not project:
-                app_error(
-                    code="PROJECT_NOT_FOUND",
-                    message="پروژه یافت نشد",
-                    status_code=404
-                )
-            if project.owner.balance < project.price:
-                app_error(
-                    code="INSUFFICIENT_BALANCE",
-                    message="موجودی کافی نیست",
-                    status_code=400
-                )
-            project.video_id = f"{session['project_id']}_{upload_id}.{file_extension}"
-            project.status = ProjectStatus.awaiting_queue
-            project.progress = 0
-            project.owner.balance -= project.price
-            result = add_to_executor(project.id)
-            await manager.send_json_to_type(
-                {
-                    "type": "complete",
-                    "message": f"File upload completed successfully, {result.get('status', 'Task status unknown')}",
-                    "project_id": project.id
-                },
+                    return
+            await commit()
+        finally:
+            await sink.close()
+        content_hash = hasher.hexdigest()
+        await verify_content_hash(upload_id, session, file_path, content_hash)
+        await finalize_upload(db, upload_id, session, file_path, content_hash)
+    except Exception as e:
+        await manager.send_json_to_type(
+            {"type": "error", "message": f"Error during upload: {str(e)}"},
+            upload_id,
+            "logs"
+        )
+        raise
+    finally:
+        manager.disconnect(websocket, upload_id, "upload")
+        db.close()
+
+@router.websocket("/translate/ws/upload/{upload_id}/stream/{stream_index}")
+async def websocket_upload_stream(websocket: WebSocket, upload_id: str, stream_index: int, token: str = Query(...)):
+    """
+    One of several parallel upload streams. Every binary frame is an
+    8-byte big-endian file offset followed by one chunk, which is written
+    in place into the preallocated file. The upload completes when the
+    session's chunk bitmap is full, whichever stream lands the last chunk.
+    """
+    token_data = verify_upload_token(token)
+    if not token_data or token_data["upload_id"] != upload_id:
+        await websocket.close(code=4001, reason="Invalid or expired token")
+        return
+    session = manager.get_upload_session(upload_id)
+    if not session:
+        await websocket.close(code=4002, reason="Upload session not found")
+        return
+    if session["status"] in ("completed", "finalizing"):
+        await websocket.close(code=4003, reason="Upload session already completed")
+        return
+    if not manager.is_logs_socket_connected(upload_id):
+        await websocket.close(code=4003, reason="Logs socket not connected. Please connect to logs socket first.")
+        return
+    streams = session.get("streams", 1)
+    if streams < 2 or not 0 <= stream_index < streams:
+        await websocket.close(code=4005, reason="Invalid upload stream")
+        return
+    stream_id = f"{upload_id}:{stream_index}"
+    if manager.is_upload_socket_connected(stream_id):
+        await websocket.close(code=4004, reason="Upload already in progress on another connection")
+        return
+    await manager.connect(websocket, stream_id, "upload")
+    db = SessionLocal()
+    try:
+        file_path = resolve_upload_file(upload_id, session, await websocket.receive_text())
+        if await link_duplicate_upload(db, websocket, upload_id, session, file_path):
+            return
+        bitmap = manager.get_range_bitmap(upload_id)
+        await run_io(preallocate_file, file_path, session["file_size"])
+        # Missing chunks are dealt round-robin, so a reconnecting stream only gets what is still absent
+        assigned = [index for index in bitmap.missing() if index % streams == stream_index]
+        await manager.send_personal_message(
+            json.dumps({"type": "ready", "stream": stream_index, "chunks": assigned}),
+            websocket
+        )
+        remaining = set(assigned)
+        pending = []
+        pending_bytes = 0
+        sink = await UploadSink(file_path, truncate=False).open()
+        try:
+            async def commit():
+                nonlocal pending_bytes
+                await sink.flush()
+                committed = list(pending)
+                pending.clear()
+                pending_bytes = 0
+                await run_io(manager.commit_upload_ranges, upload_id, committed)
+                # Counted from the bitmap, so a chunk sent twice (e.g. resent after a reconnect) counts once
+                updated_session = manager.update_upload_progress(upload_id, bitmap.received_bytes())
+                if updated_session:
+                    await manager.publish_progress(
+                        upload_id,
+                        {
+                            "type": "progress",
+                            "progress": updated_session["progress"],
+                            "bytes_received": updated_session["bytes_received"]
+                        },
+                        progress=100 * updated_session["bytes_received"] / max(1, session["file_size"])
+                    )
+                return committed
+
+            while remaining:
+                try:
+                    frame = await websocket.receive_bytes()
+                    if len(frame) < 8:
+                        raise ValueError("Chunk frame is missing its offset header")
+                    offset = int.from_bytes(frame[:8], "big")
+                    index = offset // bitmap.chunk_size
+                    payload = memoryview(frame)[8:]
+                    if offset % bitmap.chunk_size or index >= bitmap.total or len(payload) != bitmap.chunk_length(index):
+                        raise ValueError(f"Invalid chunk frame at offset {offset}")
+                    await sink.write_at(offset, payload)
+                    remaining.discard(index)
+                    pending.append(index)
+                    pending_bytes += len(payload)
+                    if pending_bytes >= settings.UPLOAD_ACK_BYTES:
+                        await manager.send_personal_message(
+                            json.dumps({"type": "ack", "chunks": await commit()}),
+                            websocket
+                        )
+                except WebSocketDisconnect:
+                    await commit()
+                    await manager.send_json_to_type(
+                        {
+                            "type": "paused",
+                            "message": "Upload stream disconnected, reconnect to resume",
+                            "stream": stream_index
+                        },
+                        upload_id,
+                        "logs"
+                    )
+                    return
+            await manager.send_personal_message(
+                json.dumps({"type": "ack", "chunks": await commit()}),
+                websocket
+            )
+        finally:
+            await sink.close()
+        # Only the stream that fills the bitmap finalizes; the status check keeps it to one
+        if bitmap.is_complete() and session["status"] != "finalizing":
+            session["status"] = "finalizing"
+            await manager.publish_progress(
                 upload_id,
-                "logs"
+                {"type": "progress", "progress": 100, "bytes_received": session["file_size"]},
+                progress=100,
+                final=True
             )
-        manager.complete_upload_session(upload_id, file_path)
+            # Chunks arrive out of order, so the hash needs one pass over the finished file
+            content_hash = (await run_io(hash_file, file_path)).hexdigest()
+            await verify_content_hash(upload_id, session, file_path, content_hash)
+            await finalize_upload(db, upload_id, session, file_path, content_hash)
     except Exception as e:
         await manager.send_json_to_type(
             {"type": "error", "message": f"Error during upload: {str(e)}"},
@@ -223,7 +611,7 @@ async def websocket_upload(websocket: WebSocket, upload_id: str, token: str = Qu
         )
         raise
     finally:
-        manager.disconnect(websocket, upload_id, "upload")
+        manager.disconnect(websocket, stream_id, "upload")
         db.close()
 
 @router.websocket("/translate/ws/logs/{upload_id}")
@@ -243,7 +631,8 @@ async def websocket_logs(websocket: WebSocket, upload_id: str, token: str = Quer
                 "type": "status",
                 "status": session["status"],
                 "progress": session["progress"],
-                "bytes_received": session["bytes_received"]
+                "bytes_received": session["bytes_received"],
+                "offset": session.get("committed_offset", 0)
             }),
             websocket
         )
@@ -257,6 +646,138 @@ async def websocket_logs(websocket: WebSocket, upload_id: str, token: str = Quer
     finally:
         manager.disconnect(websocket, upload_id, "logs")
 
+def format_project_event(data: dict) -> str:
+    return f"event: project\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/translate/events")
+async def project_events(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Server-Sent Events stream of status and progress changes for all of the
+    user's projects. Starts with a snapshot of in-flight and just-finished
+    projects; queued updates are coalesced per project before sending.
+    """
+    recent = datetime.utcnow() - timedelta(minutes=settings.EVENTS_RECENT_MINUTES)
+    projects = db.query(DBProject).filter(
+        DBProject.user_id == current_user.id,
+        or_(
+            DBProject.status.in_([ProjectStatus.awaiting_queue, ProjectStatus.processing]),
+            DBProject.completed_at >= recent
+        )
+    ).all()
+    snapshot = []
+    for project in projects:
+        live = manager.get_project_progress(project.id) if project.status == ProjectStatus.processing else None
+        snapshot.append({
+            "projectId": project.id,
+            "status": project.status.value,
+            "progress": live["progress"] if live else project.progress,
+            "stage": live["stage"] if live else None
+        })
+    user_id = current_user.id
+    queue = manager.subscribe_user(user_id)
+
+    async def stream():
+        try:
+            for data in snapshot:
+                yield format_project_event(data)
+            while True:
+                try:
+                    data = await asyncio.wait_for(queue.get(), timeout=settings.EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                updates = {data["projectId"]: data}
+                while not queue.empty():
+                    data = queue.get_nowait()
+                    updates[data["projectId"]] = data
+                for data in updates.values():
+                    yield format_project_event(data)
+        finally:
+            manager.unsubscribe_user(user_id, queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def project_status_data(snapshot: QueueSnapshot, project: DBProject) -> dict:
+    # Workers only store progress every few seconds; prefer the live value they publish
+    progress = project.progress
+    stage = None
+    live = manager.get_project_progress(project.id)
+    if project.status == ProjectStatus.processing and live:
+        progress = live["progress"]
+        stage = live["stage"]
+    estimate = queue_estimate(snapshot, project, progress)
+    return {
+        "projectId": project.id,
+        "status": project.status.value,
+        "progress": progress,
+        "stage": stage,
+        "queuePosition": estimate["queuePosition"],
+        "estimatedSeconds": estimate["estimatedSeconds"],
+        "estimatedTimeRemaining": format_eta(estimate["estimatedSeconds"])
+    }
+
+
+@router.get("/translate/status", response_model=TranslationStatusResponse)
+def get_translation_statuses(
+    ids: str = Query(..., description="Comma separated project IDs"),
+    since: Optional[datetime] = Query(None, description="Version from a previous response"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Statuses of several projects in one query. With `since`, projects not
+    updated after that version are left out, except the ones still
+    processing whose live progress moves without touching the database.
+    """
+    try:
+        try:
+            project_ids = {int(project_id) for project_id in ids.split(",") if project_id.strip()}
+        except ValueError:
+            app_error(
+                code="INVALID_PROJECT_IDS",
+                message="شناسه پروژه‌ها نامعتبر است",
+                status_code=400
+            )
+        if len(project_ids) > settings.STATUS_BATCH_MAX_IDS:
+            app_error(
+                code="TOO_MANY_PROJECTS",
+                message=f"حداکثر {settings.STATUS_BATCH_MAX_IDS} پروژه در هر درخواست مجاز است",
+                status_code=400
+            )
+        query = db.query(DBProject).filter(DBProject.id.in_(project_ids), DBProject.user_id == current_user.id)
+        if since is not None:
+            # >= because some databases store updated_at with one-second resolution
+            query = query.filter(or_(DBProject.updated_at >= since, DBProject.status == ProjectStatus.processing))
+        projects = query.all()
+        version = max((project.updated_at for project in projects if project.updated_at), default=since)
+        # One look at the queue serves every project in the batch
+        snapshot = queue_snapshot(db, projects)
+        return {
+            "success": True,
+            "data": {
+                "projects": [project_status_data(snapshot, project) for project in projects],
+                "version": version.isoformat() if version else None
+            }
+        }
+    except HTTPException as http:
+        raise http
+    except Exception as e:
+        app_error(
+            code="INTERNAL_SERVER_ERROR",
+            message="خطای غیرمنتظره رخ داد",
+            details={"error": str(e)},
+            status_code=500
+        )
+
 @router.get("/translate/status/{project_id}", response_model=TranslationStatusResponse)
 def get_translation_status(
     project_id: int,
@@ -271,22 +792,87 @@ def get_translation_status(
                 message="پروژه یافت نشد",
                 status_code=404
             )
-        if project.status == ProjectStatus.processing:
-            progress = min(100, (project.progress or 0) + 10)
-            project.progress = progress
-            if progress >= 100:
-                project.status = ProjectStatus.completed
-                project.completed_at = datetime.utcnow()
         return {
             "success": True,
-            "data": {
-                "projectId": project.id,
-                "status": project.status.value,
-                "progress": project.progress,
-                "estimatedTimeRemaining": settings.ESTIMATED_TIME_REMAINING if project.status == ProjectStatus.processing else None
-            }
+            "data": project_status_data(queue_snapshot(db, [project]), project)
+        }
+    except Exception as e:
+        app_error(
+            code="INTERNAL_SERVER_ERROR",
+            message="خطای غیرمنتظره رخ داد",
+            details={"error": str(e)},
+            status_code=500
+        )
+
+def discard_upload_of(project_id: int):
+    """Drop the upload session of a project that was never fully uploaded, with its partial file."""
+    for upload_id in manager.upload_ids_of(project_id):
+        session = manager.get_upload_session(upload_id)
+        if session is None:
+            continue
+        file_path = session.get("file_path")
+        manager.remove_upload_session(upload_id)
+        early_start.discard(upload_id)
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+
+
+@router.post("/translate/cancel/{project_id}", response_model=CancelTranslationResponse)
+def cancel_translation(
+    project_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Cancel a project that hasn't finished. A queued job is dropped and a
+    running one stops at its next stage boundary; a project that was already
+    charged is refunded in the transaction that cancels it.
+    """
+    try:
+        project = db.query(DBProject).filter(
+            DBProject.id == project_id, DBProject.user_id == current_user.id
+        ).with_for_update().first()
+        if not project:
+            app_error(
+                code="PROJECT_NOT_FOUND",
+                message="پروژه یافت نشد",
+                status_code=404
+            )
+        refunded = 0.0
+        previous = None
+        uploading = project.status == ProjectStatus.awaiting_upload
+        if uploading:
+            project.status = ProjectStatus.cancelled
+        elif project.status in (ProjectStatus.awaiting_queue, ProjectStatus.processing) \
+                and (previous := cancel_job(db, project.id)) is not None:
+            project.status = ProjectStatus.cancelled
+            refunded = project.price or 0.0
+            project.owner.balance += refunded
+        else:
+            app_error(
+                code="PROJECT_NOT_CANCELLABLE",
+                message="این پروژه قابل لغو نیست",
+                status_code=400
+            )
+        db.commit()
+        if uploading:
+            discard_upload_of(project.id)
+        elif previous == JobStatus.queued:
+            # A running job cleans up when it stops; one waiting for a retry has nobody to drop
+            # the checkpoint, segments and output its earlier attempts left behind
+            discard_cancelled_output(project.id)
+        manager.relay_job_event({"type": "job_cancelled", "project_id": project.id})
+        return {
+            "success": True,
+            "message": "پروژه لغو شد" + (" و مبلغ آن به کیف پول بازگشت" if refunded else ""),
+            "refunded": refunded,
+            "newBalance": current_user.balance
         }
+    except HTTPException as http:
+        db.rollback()
+        raise http
     except Exception as e:
+        db.rollback()
         app_error(
             code="INTERNAL_SERVER_ERROR",
             message="خطای غیرمنتظره رخ داد",
@@ -329,6 +915,7 @@ def get_download_url(
 @router.get("/translate/download/{project_id}/file")
 def download_file(
     project_id: int,
+    request: Request,
     token: str = Query(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -356,7 +943,10 @@ def download_file(
                 message="فایل ترجمه شده هنوز آماده نشده است",
                 status_code=404
             )
-        return FileResponse(path=file_path, filename=f"translated_{project.video_id}")
+        response = build_file_response(request, file_path, f"translated_{project.video_id}")
+        # Lets a front end that shares TRANSLATED_DIR hand the body off to its web server
+        response.headers["X-Translated-File"] = os.path.basename(file_path)
+        return response
     except HTTPException as http:
         raise http
     except Exception as e:
@@ -0,0 +1,89 @@
+# app/core/cache.py
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+
+class TTLCache:
+    """
+    Bounded in-process cache. Every entry carries its own expiry time and
+    the least recently used entry is evicted once max_size is reached.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at: float):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_many(self, keys: Iterable) -> Dict[Any, Any]:
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisTTLStore:
+    """
+    Shared store with the same interface as TTLCache, so several API
+    processes reuse each other's entries. Values are stored as JSON.
+    """
+
+    def __init__(self, url: str, prefix: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis package is required when a shared cache URL is configured")
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, key) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get(self, key) -> Optional[Any]:
+        raw = self._client.get(self._key(key))
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, expires_at: float):
+        ttl = int(expires_at - time.time())
+        if ttl > 0:
+            self._client.set(self._key(key), json.dumps(value), ex=ttl)
+
+    def get_many(self, keys: Iterable) -> Dict[Any, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        raws = self._client.mget([self._key(key) for key in keys])
+        return {key: json.loads(raw) for key, raw in zip(keys, raws) if raw is not None}
+
+    def delete(self, key):
+        self._client.delete(self._key(key))
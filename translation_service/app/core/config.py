@@ -16,15 +16,72 @@ class Settings(BaseSettings):
     UPLOAD_DIR: str | None = "./uploads"
     URL_STORAGE_DIR : str | None = "./urls"
     TRANSLATED_DIR: str | None = "translated"
+    CONTENT_STORE_DIR: str = "./content_store"
+    CONTENT_STORE_PRUNE_INTERVAL_SECONDS: float = 3600.0 # How often stored uploads no project refers to are removed
+    CONTENT_STORE_MIN_AGE_SECONDS: int = 3600 # Younger entries may belong to an upload still being finalized
+    ARTIFACTS_DIR: str = "./artifacts"
+    OUTPUT_CACHE_DIR: str = "./output_cache"
+    OUTPUT_CACHE_MAX_BYTES: int = 50 * 1024 ** 3 # Least recently used outputs are evicted past this; 0 disables the cache
+    SEGMENT_SECONDS: dict[str, int] = {
+        "english_subtitle": 600,
+        "persian_subtitle": 600,
+        "persian_dubbing": 300,
+        "persian_dubbing_english_subtitle": 300,
+        "persian_dubbing_persian_subtitle": 300,
+    }
+    SEGMENT_DEFAULT_SECONDS: int = 600
+    SEGMENT_RESOLUTION_FACTORS: dict[str, float] = {"2K": 0.75, "4K": 0.5} # Keyed by calculate_price's video_type
+    SEGMENT_MIN_VIDEO_SECONDS: int = 900 # Shorter videos are never split
+    SEGMENT_BOUNDARY_TOLERANCE_SECONDS: int = 30
+    SEGMENT_SILENCE_THRESHOLD: int = 500 # Peak amplitude (16-bit) below which audio counts as silence
+    SEGMENT_WORKERS: int = 4
+    ARTIFACT_TEMP_MAX_AGE_SECONDS: int = 6 * 3600 # Unfinished artifacts untouched this long belong to dead writers
+    MEDIA_PROBE_REQUIRED: bool = False # Reject uploads whose duration and resolution can't be read from the file
+    MEDIA_DURATION_TOLERANCE_SECONDS: float = 1.0 # Probed duration may exceed the declared one by this much
+    EARLY_START_ENABLED: bool = True # Run ASR on the received part of long sequential uploads
+    EARLY_START_STEP_BYTES: int = 32 * 1024 * 1024 # New bytes needed before the received part is looked at again
+    EARLY_START_FORMATS: list[str] = ["mp4", "mov", "m4v", "webm", "mkv"]
+    EARLY_START_WORKERS: int = 1
     ENVIRONMENT: str = "development"
     ADMIN_PHONE: str = "09923651580"
     MOBILE_PATTERN: str = "^09[0-9]{9}$"
     RECENT_PROJECTS_HOURS: int = 48
     UPLOAD_TOKEN_EXPIRE_HOURS: int = 2
     DOWNLOAD_TOKEN_EXPIRE_MINUTES: int = 30
-    ESTIMATED_TRANSLATION_TIME: str = "30 دقیقه"
-    ESTIMATED_TIME_REMAINING: str = "10 دقیقه"
+    DOWNLOAD_URL_REFRESH_MARGIN_MINUTES: int = 5
+    DOWNLOAD_URL_CACHE_SIZE: int = 10000
+    DOWNLOAD_URL_CACHE_REDIS_URL: str | None = None
+    ETA_SAMPLE_JOBS: int = 20 # Recent jobs per project type and resolution class behind an estimate
+    ETA_CACHE_SECONDS: int = 60
+    ETA_DEFAULT_RATIO: float = 1.0 # Processing seconds per video second before any job was timed
+    ETA_DEFAULT_DURATION: float = 60.0
+    EXECUTION_BACKEND: str = "thread" # thread, process or external (see app.worker)
+    TRANSLATION_WORKERS: int = 1
+    FAIR_SHARE_WEIGHTS: dict[str, float] = {} # user_id -> weight, e.g. {"42": 0.25} for a bulk reseller
+    FAIR_SHARE_DEFAULT_WEIGHT: float = 1.0
+    FAIR_SHARE_MAX_RUNNING_PER_USER: int = 2 # 0 disables the cap
+    OFF_PEAK_START_HOUR: int = 1 # Local hours when off-peak jobs run; the window may wrap past midnight
+    OFF_PEAK_END_HOUR: int = 7
+    OFF_PEAK_TIMEZONE: str = "Asia/Tehran"
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF_SECONDS: int = 30
+    JOB_VISIBILITY_TIMEOUT_SECONDS: int = 300 # Lease on a running job, renewed by its worker's heartbeat
+    JOB_HEARTBEAT_SECONDS: int = 60
+    JOB_REAPER_INTERVAL_SECONDS: float = 30.0 # How often jobs whose heartbeat outlived their lease are settled
+    JOB_POLL_INTERVAL_SECONDS: float = 2.0
+    JOB_CLAIM_BATCH: int = 10
     CHUNK_SIZE: int = 1024 * 1024
+    UPLOAD_ACK_BYTES: int = 8 * 1024 * 1024
+    UPLOAD_MAX_STREAMS: int = 4
+    UPLOAD_IO_THREADS: int = 4
+    UPLOAD_WRITE_BEHIND_BUFFERS: int = 8
+    PROGRESS_EMIT_INTERVAL: float = 0.2
+    PROGRESS_EMIT_STEP: float = 1.0
+    PROGRESS_DB_WRITE_INTERVAL: float = 5.0 # Seconds between progress writes per project
+    STATUS_BATCH_MAX_IDS: int = 100
+    EVENTS_KEEPALIVE_SECONDS: int = 15
+    EVENTS_QUEUE_SIZE: int = 100
+    EVENTS_RECENT_MINUTES: int = 10 # Projects finished this recently are part of a new stream's snapshot
     MINIMUM_PAYMENT_AMOUNT: int = 5000
     BASE_URL : str = "http://127.0.0.1:8000"
 
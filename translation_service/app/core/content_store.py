@@ -0,0 +1,170 @@
+# app/core/content_store.py
+import os
+import re
+import uuid
+import time
+import errno
+import shutil
+import hashlib
+import logging
+from typing import AbstractSet, Optional
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 1024 * 1024
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+os.makedirs(settings.CONTENT_STORE_DIR, exist_ok=True)
+
+
+def normalize_content_hash(content_hash: Optional[str]) -> Optional[str]:
+    """
+    Validate a client-supplied SHA-256 hex digest.
+
+    Args:
+        content_hash: The digest sent in the upload metadata frame
+
+    Returns:
+        The lower-cased digest, or None if it is missing or malformed
+    """
+    if not content_hash:
+        return None
+    content_hash = content_hash.strip().lower()
+    return content_hash if SHA256_PATTERN.match(content_hash) else None
+
+
+def content_path(content_hash: str) -> str:
+    """
+    Get the path of a stored upload from its content hash.
+
+    Args:
+        content_hash: The SHA-256 hex digest of the file
+
+    Returns:
+        The path inside the content store (sharded by the first two hex digits)
+    """
+    return os.path.join(settings.CONTENT_STORE_DIR, content_hash[:2], content_hash)
+
+
+def hash_file(file_path: str, length: Optional[int] = None):
+    """
+    Hash a file (or its first `length` bytes) without loading it into memory.
+
+    Args:
+        file_path: The path to the file
+        length: Number of leading bytes to hash, or None for the whole file
+
+    Returns:
+        The hashlib object, so callers can keep feeding it further bytes
+    """
+    hasher = hashlib.sha256()
+    remaining = length
+    with open(file_path, "rb") as f:
+        while remaining is None or remaining > 0:
+            block = f.read(HASH_BLOCK_SIZE if remaining is None else min(HASH_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return hasher
+
+
+# link() errors meaning "hardlinks can't work here", as opposed to a real failure
+LINK_UNSUPPORTED_ERRORS = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP}
+
+
+def link_or_copy(source: str, destination: str):
+    """
+    Atomically make `destination` a hardlink to `source`, or a copy when the two
+    can't share an inode. Concurrent calls for the same destination each work
+    on their own temporary name, and the last rename wins.
+    """
+    tmp_destination = f"{destination}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+    try:
+        try:
+            os.link(source, tmp_destination)
+        except OSError as e:
+            if e.errno not in LINK_UNSUPPORTED_ERRORS:
+                raise
+            # Different filesystem or no hardlink support
+            shutil.copyfile(source, tmp_destination)
+        os.replace(tmp_destination, destination)
+    finally:
+        if os.path.lexists(tmp_destination):
+            os.remove(tmp_destination)
+
+
+def link_existing(content_hash: str, file_size: int, destination: str) -> bool:
+    """
+    Materialize a stored upload at `destination` if the store has it.
+
+    Args:
+        content_hash: The SHA-256 hex digest of the wanted file
+        file_size: The expected size in bytes, checked against the stored file
+        destination: Where the project's upload file should appear
+
+    Returns:
+        True if the file was found and linked, False otherwise
+    """
+    stored_path = content_path(content_hash)
+    try:
+        if os.path.getsize(stored_path) != file_size:
+            return False
+        link_or_copy(stored_path, destination)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logger.error(f"Error linking stored upload {content_hash}: {e}")
+        return False
+
+
+def add_to_store(file_path: str, content_hash: str) -> str:
+    """
+    Add a verified upload to the content store.
+
+    Args:
+        file_path: The uploaded file
+        content_hash: Its verified SHA-256 hex digest
+
+    Returns:
+        The path of the stored copy
+    """
+    stored_path = content_path(content_hash)
+    if not os.path.exists(stored_path):
+        os.makedirs(os.path.dirname(stored_path), exist_ok=True)
+        link_or_copy(file_path, stored_path)
+    return stored_path
+
+
+def prune_store(referenced: AbstractSet[str]) -> int:
+    """
+    Remove stored uploads that no project refers to any more. Entries younger
+    than CONTENT_STORE_MIN_AGE_SECONDS are kept, since their upload may still
+    be finalizing. Projects keep their own link to the file, so only the
+    store's copy goes.
+
+    Args:
+        referenced: Content hashes of the projects that exist
+
+    Returns:
+        Number of entries removed
+    """
+    cutoff = time.time() - settings.CONTENT_STORE_MIN_AGE_SECONDS
+    removed = 0
+    for directory, _, names in os.walk(settings.CONTENT_STORE_DIR):
+        for name in names:
+            if not SHA256_PATTERN.match(name) or name in referenced:
+                continue
+            path = os.path.join(directory, name)
+            try:
+                if os.path.getmtime(path) > cutoff:
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            logger.info(f"Removed unreferenced stored upload {name}")
+            removed += 1
+    return removed
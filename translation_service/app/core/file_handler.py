@@ -1,10 +1,13 @@
 # app/core/file_handler.py
 import os
 import uuid
-from typing import Optional, Tuple
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple, List
 from fastapi import UploadFile
 import aiofiles
 import logging
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -92,4 +95,172 @@ def get_file_size(file_path: str) -> Optional[int]:
     """
     if not file_exists(file_path):
         return None
-    return os.path.getsize(file_path)
\ No newline at end of file
+    return os.path.getsize(file_path)
+
+
+# Dedicated threads for upload disk I/O so a slow disk never blocks the event loop
+_io_executor = ThreadPoolExecutor(max_workers=settings.UPLOAD_IO_THREADS, thread_name_prefix="upload-io")
+# Buffers returned by closed sinks, handed to the next sink instead of being reallocated
+_spare_buffers: List[bytearray] = []
+
+
+async def run_io(func, *args):
+    """
+    Run a blocking file operation on the upload I/O threads.
+
+    Args:
+        func: The blocking callable
+        *args: Arguments passed to the callable
+
+    Returns:
+        Whatever the callable returns
+    """
+    return await asyncio.get_running_loop().run_in_executor(_io_executor, func, *args)
+
+
+def preallocate_file(file_path: str, size: int):
+    """
+    Reserve `size` bytes for a file that is written out of order, keeping existing content.
+
+    Args:
+        file_path: The path to the file
+        size: The final size of the file in bytes
+    """
+    fd = os.open(file_path, os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        if os.fstat(fd).st_size < size:
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except (AttributeError, OSError):
+                # Not every platform or filesystem supports fallocate; a sparse file works too
+                os.ftruncate(fd, size)
+    finally:
+        os.close(fd)
+
+
+def _pwrite_all(fd: int, data: memoryview, offset: int, hasher=None):
+    if hasher is not None:
+        hasher.update(data)
+    while data:
+        written = os.pwrite(fd, data, offset)
+        data = data[written:]
+        offset += written
+
+
+class BufferPool:
+    """
+    A fixed number of reusable buffers. acquire() waits while all of them
+    are queued for writing, which is what applies backpressure to the socket.
+    """
+
+    def __init__(self, buffer_size: int, count: int):
+        self.buffer_size = buffer_size
+        self.count = count
+        self._free: asyncio.Queue = asyncio.Queue()
+        for _ in range(count):
+            buffer = _spare_buffers.pop() if _spare_buffers else bytearray(buffer_size)
+            if len(buffer) != buffer_size:
+                buffer = bytearray(buffer_size)
+            self._free.put_nowait(buffer)
+
+    async def acquire(self) -> bytearray:
+        return await self._free.get()
+
+    def release(self, buffer: bytearray):
+        self._free.put_nowait(buffer)
+
+    def close(self):
+        while not self._free.empty():
+            _spare_buffers.append(self._free.get_nowait())
+        del _spare_buffers[settings.UPLOAD_WRITE_BEHIND_BUFFERS * settings.UPLOAD_IO_THREADS:]
+
+
+class UploadSink:
+    """
+    Write-behind file writer for the upload receive loop.
+
+    Chunks are copied into pooled buffers and written with positional writes
+    on the upload I/O threads. write() only waits when the pool is exhausted,
+    i.e. when the disk has fallen behind the socket. An optional hasher is
+    fed in write order on the same threads, so sequential uploads get their
+    content hash without a second pass over the file.
+    """
+
+    def __init__(self, path: str, offset: int = 0, buffer_size: int = settings.CHUNK_SIZE,
+                 max_buffers: int = settings.UPLOAD_WRITE_BEHIND_BUFFERS, truncate: bool = True,
+                 hasher=None):
+        self.path = path
+        self.offset = offset
+        self.truncate = truncate
+        self.hasher = hasher
+        self.durable_offset = offset
+        self._pool = BufferPool(buffer_size, max_buffers)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._fd: Optional[int] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+
+    async def open(self):
+        """Open the file, drop anything past `offset` (unless truncate is off) and start the writer task."""
+        self._fd = await run_io(os.open, self.path, os.O_WRONLY | os.O_CREAT, 0o644)
+        if self.truncate:
+            await run_io(os.ftruncate, self._fd, self.offset)
+        self._writer = asyncio.create_task(self._drain())
+        return self
+
+    async def _drain(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                if item is None:
+                    return
+                offset, buffer, length = item
+                if self._error is None:
+                    try:
+                        await run_io(_pwrite_all, self._fd, memoryview(buffer)[:length], offset, self.hasher)
+                    except Exception as e:
+                        logger.error(f"Error writing upload chunk to {self.path}: {e}")
+                        self._error = e
+                self._pool.release(buffer)
+            finally:
+                self._queue.task_done()
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise self._error
+
+    async def write_at(self, offset: int, data: bytes):
+        """Queue `data` to be written at `offset`, waiting for a free buffer if needed."""
+        self._raise_if_failed()
+        view = memoryview(data)
+        while view:
+            buffer = await self._pool.acquire()
+            length = min(len(view), len(buffer))
+            buffer[:length] = view[:length]
+            await self._queue.put((offset, buffer, length))
+            view = view[length:]
+            offset += length
+
+    async def write(self, data: bytes):
+        """Queue `data` right after the previously written bytes."""
+        await self.write_at(self.offset, data)
+        self.offset += len(data)
+
+    async def flush(self) -> int:
+        """Wait for queued writes, fsync, and return the offset that is now durable."""
+        offset = self.offset
+        await self._queue.join()
+        self._raise_if_failed()
+        await run_io(os.fsync, self._fd)
+        self.durable_offset = offset
+        return offset
+
+    async def close(self):
+        if self._writer is not None:
+            await self._queue.put(None)
+            await self._writer
+            self._writer = None
+        if self._fd is not None:
+            await run_io(os.close, self._fd)
+            self._fd = None
+        self._pool.close()
@@ -0,0 +1,84 @@
+import logging
+from sqlalchemy import inspect, text, Enum
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import MetaData, Column
+
+logger = logging.getLogger(__name__)
+
+# create_all only creates missing tables; this brings existing ones up to the models.
+# Columns are only ever added, so the upgrade is idempotent and safe to run on every start.
+#
+# It diffs the whole metadata, so one upgrade covers the schema changes of every feature
+# that extended an existing table:
+#   projects.content_hash (+ index)                    upload deduplication
+#   projects.duration, projects.resolution             segmented processing
+#   projects.updated_at (+ index)                      batch status "since"
+#   translation_jobs.user_id, virtual_start/finish     fair-share scheduling
+#   projects.tier, translation_jobs.tier, deadline     processing tiers
+#   ProjectStatus/JobStatus "cancelled"                cancellation
+#   translation_jobs.heartbeat_at (+ index)            heartbeats and reaping
+# New tables (translation_jobs, stage_timings, output_cache) come from create_all.
+
+
+def _column_ddl(engine: Engine, column: Column) -> str:
+    column_type = column.type.compile(dialect=engine.dialect)
+    ddl = f"{engine.dialect.identifier_preparer.quote(column.name)} {column_type}"
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if isinstance(default, str):
+        ddl += " DEFAULT '" + default.replace("'", "''") + "'"
+    elif isinstance(default, (int, float)) and not isinstance(default, bool):
+        ddl += f" DEFAULT {default}"
+    if default is not None and not column.nullable:
+        ddl += " NOT NULL"
+    return ddl
+
+
+def upgrade_schema(engine: Engine, metadata: MetaData) -> int:
+    """
+    Add the columns, indexes and enum values the models have but the
+    database doesn't.
+
+    Args:
+        engine: Engine of the database to upgrade
+        metadata: Metadata of the models, after create_all
+
+    Returns:
+        Number of changes made
+    """
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    changes = 0
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            quoted_table = engine.dialect.identifier_preparer.format_table(table)
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                connection.execute(text(f"ALTER TABLE {quoted_table} ADD COLUMN {_column_ddl(engine, column)}"))
+                if column.server_default is not None:
+                    # Non-constant server defaults (e.g. now()) can't be part of ADD COLUMN on SQLite
+                    value = column.server_default.arg.compile(dialect=engine.dialect)
+                    name = engine.dialect.identifier_preparer.quote(column.name)
+                    connection.execute(text(f"UPDATE {quoted_table} SET {name} = {value} WHERE {name} IS NULL"))
+                logger.warning(f"Added column {table.name}.{column.name}")
+                changes += 1
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(connection)
+                    logger.warning(f"Added index {index.name}")
+                    changes += 1
+    if engine.dialect.name == "postgresql":
+        # New members of native enums (e.g. ProjectStatus.cancelled); ADD VALUE can't run in a transaction block
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            for table in metadata.sorted_tables:
+                for column in table.columns:
+                    if isinstance(column.type, Enum) and column.type.native_enum:
+                        for value in column.type.enums:
+                            connection.execute(text(
+                                f"ALTER TYPE {column.type.name} ADD VALUE IF NOT EXISTS '{value}'"
+                            ))
+    return changes
@@ -1,11 +1,128 @@
-from typing import Dict, Set, List
+from typing import Dict, Set, List, Optional
 from fastapi import WebSocket
 import json
 import asyncio
 import logging
+import os
+import time
+import math
+import base64
+import tempfile
+import threading
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
-CHUNK_SIZE2 = 1024 * 1024  # 1MB chunks
+
+class RangeBitmap:
+    """One bit per chunk of a multi-stream upload; set once the chunk is durable on disk."""
+
+    def __init__(self, file_size: int, chunk_size: int, bits: Optional[bytearray] = None):
+        self.file_size = file_size
+        self.chunk_size = chunk_size
+        self.total = max(1, math.ceil(file_size / chunk_size))
+        self.bits = bits if bits is not None else bytearray(math.ceil(self.total / 8))
+        self.count = sum(bin(byte).count("1") for byte in self.bits)
+
+    def chunk_length(self, index: int) -> int:
+        return min(self.chunk_size, self.file_size - index * self.chunk_size)
+
+    def has(self, index: int) -> bool:
+        return bool(self.bits[index >> 3] & (1 << (index & 7)))
+
+    def set(self, index: int):
+        if not self.has(index):
+            self.bits[index >> 3] |= 1 << (index & 7)
+            self.count += 1
+
+    def missing(self) -> List[int]:
+        return [i for i in range(self.total) if not self.has(i)]
+
+    def is_complete(self) -> bool:
+        return self.count >= self.total
+
+    def received_bytes(self) -> int:
+        # Every chunk is chunk_size long except possibly the last one
+        size = self.count * self.chunk_size
+        if self.has(self.total - 1):
+            size -= self.chunk_size - self.chunk_length(self.total - 1)
+        return size
+
+    def encode(self) -> str:
+        return base64.b64encode(bytes(self.bits)).decode()
+
+    @classmethod
+    def decode(cls, data: str, file_size: int, chunk_size: int) -> "RangeBitmap":
+        return cls(file_size, chunk_size, bytearray(base64.b64decode(data)))
+
+
+class ProgressPublisher:
+    """
+    Throttles progress broadcasts per upload. An event goes out when
+    PROGRESS_EMIT_INTERVAL seconds have passed or progress moved by
+    PROGRESS_EMIT_STEP percent since the last one; anything in between is
+    coalesced into a trailing send of the latest state. Final events are
+    always sent immediately.
+    """
+
+    def __init__(self, manager: "WebSocketManager", min_interval: float, min_step: float):
+        self.manager = manager
+        self.min_interval = min_interval
+        self.min_step = min_step
+        self._state: Dict[str, Dict] = {}
+        self.sent = 0
+        self.suppressed = 0
+
+    async def publish(self, upload_id: str, data: dict, progress: float, connection_type: str = "logs",
+                      final: bool = False):
+        state = self._state.setdefault(upload_id, {"last_emit": 0.0, "last_progress": None, "pending": None,
+                                                    "trailing": None})
+        now = time.monotonic()
+        due = (
+            final
+            or state["last_progress"] is None
+            or now - state["last_emit"] >= self.min_interval
+            or progress - state["last_progress"] >= self.min_step
+        )
+        if not due:
+            self.suppressed += 1
+            state["pending"] = (data, progress, connection_type)
+            if state["trailing"] is None:
+                delay = self.min_interval - (now - state["last_emit"])
+                state["trailing"] = asyncio.create_task(self._send_trailing(upload_id, delay))
+            return False
+        if state["trailing"] is not None:
+            state["trailing"].cancel()
+        await self._emit(upload_id, state, data, progress, connection_type)
+        if final:
+            self._state.pop(upload_id, None)
+        return True
+
+    async def _send_trailing(self, upload_id: str, delay: float):
+        await asyncio.sleep(delay)
+        state = self._state.get(upload_id)
+        if not state or state["pending"] is None:
+            return
+        state["trailing"] = None
+        data, progress, connection_type = state["pending"]
+        await self._emit(upload_id, state, data, progress, connection_type)
+
+    async def _emit(self, upload_id: str, state: Dict, data: dict, progress: float, connection_type: str):
+        state["last_emit"] = time.monotonic()
+        state["last_progress"] = progress
+        state["pending"] = None
+        state["trailing"] = None
+        self.sent += 1
+        await self.manager.send_json_to_type(data, upload_id, connection_type)
+
+    def discard(self, upload_id: str):
+        """Drop throttling state, e.g. when the upload pauses, so no stale trailing event follows."""
+        state = self._state.pop(upload_id, None)
+        if state and state["trailing"] is not None:
+            state["trailing"].cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {"sent": self.sent, "suppressed": self.suppressed, "active": len(self._state)}
+
 
 class WebSocketManager:
     def __init__(self):
@@ -14,8 +131,26 @@ class WebSocketManager:
             "upload": {},  # upload_id -> set of WebSockets for file upload
             "logs": {}  # upload_id -> set of WebSockets for logs
         }
-        # Store upload session data
+        # Store upload session data, mirrored to SESSIONS_DIR so uploads survive restarts
         self.upload_sessions: Dict[str, Dict] = {}
+        # Chunk bitmaps of multi-stream uploads, serialized into the session on save
+        self.range_bitmaps: Dict[str, RangeBitmap] = {}
+        # Streams commit ranges and save sessions from several I/O threads at once
+        self._session_locks: Dict[str, threading.RLock] = {}
+        # Latest worker progress per project and the upload whose logs sockets follow it
+        self.project_progress: Dict[int, Dict] = {}
+        self.project_uploads: Dict[int, str] = {}
+        # Per-user event streams (/translate/events) and the owner of each project they report on
+        self.user_streams: Dict[int, Set[asyncio.Queue]] = {}
+        self.project_users: Dict[int, int] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.sessions_dir = settings.SESSIONS_DIR
+        os.makedirs(self.sessions_dir, exist_ok=True)
+        self.progress_publisher = ProgressPublisher(
+            self,
+            min_interval=settings.PROGRESS_EMIT_INTERVAL,
+            min_step=settings.PROGRESS_EMIT_STEP
+        )
 
     async def connect(self, websocket: WebSocket, upload_id: str, connection_type: str):
         await websocket.accept()
@@ -55,47 +190,280 @@ class WebSocketManager:
         message = json.dumps(data)
         await self.broadcast_to_type(message, upload_id, connection_type)
 
+    async def publish_progress(self, upload_id: str, data: dict, progress: float, final: bool = False):
+        """Broadcast a progress event to the logs sockets, subject to the publisher's rate limit."""
+        return await self.progress_publisher.publish(upload_id, data, progress, final=final)
+
+    def get_progress_stats(self) -> Dict[str, int]:
+        return self.progress_publisher.stats()
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+
+    def relay_job_event(self, job_event: dict):
+        """Forward a worker's job event to the logs sockets. Safe to call from worker threads."""
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.publish_job_event(job_event), self.loop)
+
+    async def publish_job_event(self, job_event: dict):
+        project_id = job_event["project_id"]
+        event_type = job_event["type"]
+        final = False
+        stage = None
+        if event_type == "job_started":
+            self.project_progress[project_id] = {"stage": None, "progress": 0.0}
+            status, progress = "processing", 0.0
+            data = {"type": "translation_started", "project_id": project_id, "progress": progress}
+        elif event_type == "job_progress":
+            stage = job_event["stage"]
+            self.project_progress[project_id] = {"stage": stage, "progress": job_event["progress"]}
+            status, progress = "processing", job_event["progress"]
+            data = {"type": "translation_progress", "project_id": project_id, "stage": stage, "progress": progress}
+        elif event_type == "job_succeeded":
+            self.project_progress.pop(project_id, None)
+            status, progress = "completed", 100.0
+            data = {"type": "translation_complete", "project_id": project_id, "progress": progress}
+            final = True
+        elif event_type == "job_failed":
+            self.project_progress.pop(project_id, None)
+            retrying = job_event.get("status") == "queued"
+            status, progress = ("awaiting queue" if retrying else "failed"), 0.0
+            data = {"type": "translation_failed", "project_id": project_id, "retrying": retrying}
+            final = True
+        elif event_type == "job_released":
+            # Its worker stopped; another one picks it up from where it was
+            self.project_progress.pop(project_id, None)
+            status, progress = "awaiting queue", 0.0
+            data = {"type": "translation_requeued", "project_id": project_id}
+            final = True
+        elif event_type == "job_cancelled":
+            self.project_progress.pop(project_id, None)
+            status, progress = "cancelled", 0.0
+            data = {"type": "translation_cancelled", "project_id": project_id}
+            final = True
+        else:
+            return
+        upload_id = self.project_uploads.get(project_id)
+        if upload_id is not None:
+            await self.publish_progress(upload_id, data, data.get("progress", 0.0), final=final)
+        user_id = await self._project_user(project_id)
+        if user_id is not None:
+            self.notify_user(user_id, project_id, status, progress, stage)
+
+    async def _project_user(self, project_id: int) -> Optional[int]:
+        if project_id not in self.project_users:
+            user_id = await asyncio.to_thread(_load_project_user, project_id)
+            if user_id is None:
+                return None
+            self.project_users[project_id] = user_id
+        return self.project_users[project_id]
+
+    def subscribe_user(self, user_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+        self.user_streams.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe_user(self, user_id: int, queue: asyncio.Queue):
+        streams = self.user_streams.get(user_id)
+        if streams is not None:
+            streams.discard(queue)
+            if not streams:
+                del self.user_streams[user_id]
+
+    def notify_user(self, user_id: int, project_id: int, status: str, progress: float, stage: Optional[str] = None):
+        """Push a project's new state to every event stream of its owner. Must run on the event loop."""
+        self.project_users[project_id] = user_id
+        data = {"projectId": project_id, "status": status, "progress": progress, "stage": stage}
+        for queue in self.user_streams.get(user_id, ()):
+            if queue.full():
+                # Events are full snapshots, so a slow reader only loses superseded states
+                queue.get_nowait()
+            queue.put_nowait(data)
+
+    def get_project_progress(self, project_id: int) -> Optional[Dict]:
+        return self.project_progress.get(project_id)
+
     def is_upload_socket_connected(self, upload_id: str) -> bool:
         return upload_id in self.active_connections["upload"] and len(self.active_connections["upload"][upload_id]) > 0
 
     def is_logs_socket_connected(self, upload_id: str) -> bool:
         return upload_id in self.active_connections["logs"] and len(self.active_connections["logs"][upload_id]) > 0
 
-    def create_upload_session(self, upload_id: str, project_id: int, user_id: int, file_size: int):
+    def _session_file(self, upload_id: str) -> str:
+        return os.path.join(self.sessions_dir, f"{upload_id}.json")
+
+    def _session_lock(self, upload_id: str) -> threading.RLock:
+        return self._session_locks.setdefault(upload_id, threading.RLock())
+
+    def save_upload_session(self, upload_id: str):
+        """
+        Persist the session atomically so a crash never leaves a half-written file.
+        Saves of one upload are serialized, so the newest snapshot is the one that lands.
+        """
+        with self._session_lock(upload_id):
+            session = self.upload_sessions.get(upload_id)
+            if session is None:
+                return
+            if upload_id in self.range_bitmaps:
+                session["chunk_bitmap"] = self.range_bitmaps[upload_id].encode()
+            session_file = self._session_file(upload_id)
+            tmp_file = None
+            try:
+                # The event loop may change the session meanwhile; copying it is atomic, iterating it is not
+                data = json.dumps(dict(session))
+                fd, tmp_file = tempfile.mkstemp(dir=self.sessions_dir, prefix=f"{upload_id}.", suffix=".tmp")
+                with os.fdopen(fd, "w") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, session_file)
+                tmp_file = None
+            except OSError as e:
+                logger.error(f"Error persisting upload session {upload_id}: {e}")
+            finally:
+                if tmp_file is not None and os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+
+    def _load_upload_session(self, upload_id: str) -> Optional[Dict]:
+        session_file = self._session_file(upload_id)
+        if not os.path.exists(session_file):
+            return None
+        try:
+            with open(session_file, "r") as f:
+                session = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Error loading upload session {upload_id}: {e}")
+            return None
+        self.upload_sessions[upload_id] = session
+        self.project_uploads[session["project_id"]] = upload_id
+        if session.get("chunk_bitmap") is not None:
+            bitmap = RangeBitmap.decode(session["chunk_bitmap"], session["file_size"], session["chunk_size"])
+            self.range_bitmaps[upload_id] = bitmap
+            session["bytes_received"] = bitmap.received_bytes()
+        return session
+
+    def create_upload_session(self, upload_id: str, project_id: int, user_id: int, file_size: int,
+                              streams: int = 1):
         self.upload_sessions[upload_id] = {
             "project_id": project_id,
             "user_id": user_id,
             "file_size": file_size,
             "bytes_received": 0,
+            "committed_offset": 0,
             "progress": 0,
             "status": "initialized",
             "file_path": None,
-            "file_extension": None
+            "file_extension": None,
+            "streams": streams
         }
+        self.project_uploads[project_id] = upload_id
+        self.project_users[project_id] = user_id
+        if streams > 1:
+            self.upload_sessions[upload_id]["chunk_size"] = settings.CHUNK_SIZE
+            self.range_bitmaps[upload_id] = RangeBitmap(file_size, settings.CHUNK_SIZE)
+        self.save_upload_session(upload_id)
 
     def update_upload_progress(self, upload_id: str, bytes_received: int):
         if upload_id in self.upload_sessions:
             session = self.upload_sessions[upload_id]
             session["bytes_received"] = bytes_received
             if session["file_size"] > 0:
-                session["progress"] = min(100, int((bytes_received / (session["file_size"] * CHUNK_SIZE2)) * 100))
+                session["progress"] = min(100, int(bytes_received * 100 / session["file_size"]))
             return session
         return None
 
+    def commit_upload_offset(self, upload_id: str, offset: int):
+        """Record `offset` as durable (already fsynced) so a reconnecting client can resume from it."""
+        session = self.update_upload_progress(upload_id, offset)
+        if session:
+            session["committed_offset"] = offset
+            session["status"] = "uploading"
+            self.save_upload_session(upload_id)
+        return session
+
+    def get_range_bitmap(self, upload_id: str) -> Optional[RangeBitmap]:
+        return self.range_bitmaps.get(upload_id)
+
+    def commit_upload_ranges(self, upload_id: str, chunk_indexes: List[int]):
+        """Mark fsynced chunks of a multi-stream upload as received and persist the bitmap."""
+        session = self.upload_sessions.get(upload_id)
+        bitmap = self.range_bitmaps.get(upload_id)
+        if session is None or bitmap is None:
+            return None
+        with self._session_lock(upload_id):
+            for index in chunk_indexes:
+                bitmap.set(index)
+            session["status"] = "uploading"
+            self.save_upload_session(upload_id)
+        return session
+
+    def reset_upload_session(self, upload_id: str):
+        """Forget every received byte, e.g. after the upload failed hash verification."""
+        session = self.upload_sessions.get(upload_id)
+        if session is None:
+            return None
+        with self._session_lock(upload_id):
+            session.update(bytes_received=0, committed_offset=0, progress=0, status="initialized")
+            if upload_id in self.range_bitmaps:
+                self.range_bitmaps[upload_id] = RangeBitmap(session["file_size"], session["chunk_size"])
+            self.save_upload_session(upload_id)
+        return session
+
+    def upload_ids_of(self, project_id: int) -> List[str]:
+        """Upload sessions of a project, including ones persisted by an earlier process and not loaded yet."""
+        upload_ids = {upload_id for upload_id, session in self.upload_sessions.items()
+                      if session.get("project_id") == project_id}
+        for name in os.listdir(self.sessions_dir):
+            upload_id, extension = os.path.splitext(name)
+            if extension != ".json" or upload_id in self.upload_sessions:
+                continue
+            try:
+                with open(os.path.join(self.sessions_dir, name)) as f:
+                    if json.load(f).get("project_id") == project_id:
+                        upload_ids.add(upload_id)
+            except (OSError, ValueError):
+                continue
+        return sorted(upload_ids)
+
     def get_upload_session(self, upload_id: str):
-        return self.upload_sessions.get(upload_id)
+        session = self.upload_sessions.get(upload_id)
+        if session is None:
+            session = self._load_upload_session(upload_id)
+        return session
 
     def complete_upload_session(self, upload_id: str, file_path: str):
         if upload_id in self.upload_sessions:
             self.upload_sessions[upload_id]["status"] = "completed"
             self.upload_sessions[upload_id]["progress"] = 100
             self.upload_sessions[upload_id]["file_path"] = file_path
+            self.save_upload_session(upload_id)
             return self.upload_sessions[upload_id]
         return None
 
     def remove_upload_session(self, upload_id: str):
-        if upload_id in self.upload_sessions:
-            del self.upload_sessions[upload_id]
+        self.progress_publisher.discard(upload_id)
+        with self._session_lock(upload_id):
+            self.range_bitmaps.pop(upload_id, None)
+            if upload_id in self.upload_sessions:
+                del self.upload_sessions[upload_id]
+            try:
+                os.remove(self._session_file(upload_id))
+            except FileNotFoundError:
+                pass
+        self._session_locks.pop(upload_id, None)
+
+
+def _load_project_user(project_id: int) -> Optional[int]:
+    from app.core.database import SessionLocal
+    from app.models.project import Project
+
+    db = SessionLocal()
+    try:
+        row = db.query(Project.user_id).filter(Project.id == project_id).first()
+        return row[0] if row else None
+    finally:
+        db.close()
 
 
 # Create a singleton instance
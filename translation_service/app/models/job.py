@@ -0,0 +1,64 @@
+from sqlalchemy import Column, Integer, String, Enum, DateTime, ForeignKey, Float, UniqueConstraint
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.core.database import Base
+import enum
+
+class JobStatus(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+    cancelled = "cancelled"
+
+class TranslationJob(Base):
+    __tablename__ = "translation_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, unique=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    status = Column(Enum(JobStatus), default=JobStatus.queued, nullable=False, index=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, nullable=False)
+    available_at = Column(DateTime, default=datetime.utcnow, nullable=False) # Not claimable before this (retry backoff)
+    locked_by = Column(String, nullable=True) # Worker currently holding the job
+    locked_until = Column(DateTime, nullable=True) # Lease, extended by every heartbeat
+    heartbeat_at = Column(DateTime, nullable=True, index=True) # Last sign of life of the worker running the job
+    last_error = Column(String, nullable=True)
+    tier = Column(String, default="standard", nullable=False) # See TIERS in app.services.pricing
+    deadline = Column(DateTime, nullable=True, index=True) # Jobs are claimed by tier, then earliest deadline
+    # Weighted fair queueing tags, folded into the deadline
+    virtual_start = Column(Float, default=0.0, nullable=False, index=True)
+    virtual_finish = Column(Float, default=0.0, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    project = relationship("Project")
+
+class StageTiming(Base):
+    """How long one pipeline stage took for a project, the samples behind ETA estimates."""
+    __tablename__ = "stage_timings"
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, index=True)
+    project_type = Column(String, nullable=False)
+    video_type = Column(String, nullable=False) # Resolution class from calculate_price (SD, HD, ...)
+    video_duration = Column(Float, nullable=False) # Seconds of video
+    stage = Column(String, nullable=False)
+    elapsed = Column(Float, nullable=False) # Seconds of processing
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class OutputCacheEntry(Base):
+    """A finished translation kept for reuse by later projects on the same video and project type."""
+    __tablename__ = "output_cache"
+    __table_args__ = (UniqueConstraint("content_hash", "project_type", "pipeline_version"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String, nullable=False, index=True) # SHA-256 of the source video
+    project_type = Column(String, nullable=False)
+    pipeline_version = Column(String, nullable=False)
+    path = Column(String, nullable=False) # Inside OUTPUT_CACHE_DIR
+    size = Column(Integer, nullable=False)
+    hits = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True) # LRU eviction order
@@ -10,6 +10,7 @@ class ProjectStatus(str, enum.Enum):
     processing = "processing"
     completed = "completed"
     failed = "failed"
+    cancelled = "cancelled"
 
 class ProjectType(str, enum.Enum):
     english_subtitle = "english_subtitle"
@@ -37,9 +38,15 @@ class Project(Base):
     progress = Column(Float, default=0.0)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     video_id = Column(String, nullable=True) # Reference to video file
+    content_hash = Column(String, nullable=True, index=True) # SHA-256 of the uploaded video
+    duration = Column(Float, nullable=True) # Seconds
+    resolution = Column(String, nullable=True) # WIDTHxHEIGHT
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
+    # Bumped on every write; GET /translate/status?since= uses it as the change version
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
     price = Column(Float)
+    tier = Column(String, default="standard", nullable=False) # express, standard or off_peak
     owner = relationship("User", back_populates="projects")
 
 # Add relationship to User model
@@ -17,6 +17,7 @@ class ProjectBase(BaseModel):
     price : float
     progress: Optional[float] = None
     completed_at: Optional[datetime] = None
+    download_url: Optional[str] = None
     class Config:
         use_enum_values = True
 
@@ -72,6 +73,8 @@ class StartTranslationRequest(BaseModel):
     projectType: str
     videoSize : int
     useWalletBalance: bool = True
+    streams: int = 1
+    tier: str = "standard" # express, standard or off_peak (see TIERS in app.services.pricing)
 
     @field_validator("resolution")
     @classmethod
@@ -95,11 +98,15 @@ class StartTranslationResponse(BaseModel):
     message: str
     projectId: int
     estimatedTime: str
+    estimatedSeconds: Optional[int] = None
+    queuePosition: Optional[int] = None
     uploadToken: str
     uploadUrl: str
     logsUrl: str
     price: float
     chunkSize: int
+    streams: int = 1
+    streamUrls: List[str] = []
 
 
 class TranslationStatusResponse(BaseModel):
@@ -107,6 +114,12 @@ class TranslationStatusResponse(BaseModel):
     data: dict
 
 
+class CancelTranslationResponse(BaseModel):
+    success: bool
+    message: str
+    refunded: float
+    newBalance: float
+
 class DownloadUrlResponse(BaseModel):
     success: bool
     data: dict
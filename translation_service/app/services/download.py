@@ -1,86 +1,198 @@
 import os
-import json
+import time
+import hashlib
+import mimetypes
 from datetime import datetime, timedelta
-from fastapi import HTTPException
+from email.utils import formatdate
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from app.core.config import settings
+from app.core.cache import TTLCache, RedisTTLStore
 from app.core.security import create_access_token, verify_upload_token, verify_access_token
 from app.services.error_handlers import app_error
 
 
-def get_download_url_with_token(project_id: int):
-    # Define file path for storing URLs
-    url_dir = settings.URL_STORAGE_DIR  # Directory from settings
-    try:
-        os.makedirs(url_dir, exist_ok=True)  # Create directory if it doesn't exist
-    except OSError as e:
-        app_error(
-            code="URL_STORAGE_DIR_CREATION_FAILED",
-            message="Failed to create URL storage directory",
-            details={"error": str(e)},
-            status_code=500
-        )
+# Issued download URLs per project, reused until they get close to expiry
+_url_cache = TTLCache(settings.DOWNLOAD_URL_CACHE_SIZE)
+_shared_url_store = (
+    RedisTTLStore(settings.DOWNLOAD_URL_CACHE_REDIS_URL, prefix="download_url")
+    if settings.DOWNLOAD_URL_CACHE_REDIS_URL else None
+)
 
-    url_file = os.path.join(url_dir, f"project_{project_id}_url.json")
 
-    # Check for existing URL
-    try:
-        if os.path.exists(url_file):
-            with open(url_file, 'r') as f:
-                data = json.load(f)
-                try:
-                    stored_expires_at = datetime.fromisoformat(data['expires_at'])
-                    # Check if URL is still valid
-                    if stored_expires_at > datetime.utcnow():
-                        return data['download_url'], stored_expires_at
-                except (KeyError, ValueError) as e:
-                    app_error(
-                        code="INVALID_URL_FILE",
-                        message="Invalid or corrupted URL file",
-                        details={"error": str(e), "file": url_file},
-                        status_code=500
-                    )
-    except json.JSONDecodeError as e:
-        app_error(
-            code="JSON_DECODE_ERROR",
-            message="Failed to parse URL file",
-            details={"error": str(e), "file": url_file},
-            status_code=500
-        )
-    except OSError as e:
-        app_error(
-            code="URL_FILE_READ_ERROR",
-            message="Failed to read URL file",
-            details={"error": str(e), "file": url_file},
-            status_code=500
-        )
+def _reusable_until() -> float:
+    return time.time() + settings.DOWNLOAD_URL_REFRESH_MARGIN_MINUTES * 60
+
+
+def _cached_download_urls(project_ids):
+    found = {}
+    min_expiry = _reusable_until()
+    for project_id, entry in _url_cache.get_many(project_ids).items():
+        if entry["expires_at"] > min_expiry:
+            found[project_id] = entry
+    missing = [project_id for project_id in project_ids if project_id not in found]
+    if _shared_url_store is not None and missing:
+        for project_id, entry in _shared_url_store.get_many(missing).items():
+            if entry["expires_at"] > min_expiry:
+                _url_cache.set(project_id, entry, entry["expires_at"])
+                found[project_id] = entry
+    return found
 
-    # Generate new URL and token if none exists or expired
+
+def _issue_download_url(project_id: int) -> dict:
     expires_at = datetime.utcnow() + timedelta(minutes=settings.DOWNLOAD_TOKEN_EXPIRE_MINUTES)
     download_token = create_access_token(
         data={"project_id": project_id, "type": "download"},
         expires_delta=timedelta(minutes=settings.DOWNLOAD_TOKEN_EXPIRE_MINUTES)
     )
-    download_url = f"{settings.BASE_URL}/v1/translate/download/{project_id}/file?token={download_token}"
+    entry = {
+        "download_url": f"{settings.BASE_URL}/v1/translate/download/{project_id}/file?token={download_token}",
+        "expires_at": time.time() + settings.DOWNLOAD_TOKEN_EXPIRE_MINUTES * 60,
+        "expires_at_iso": expires_at.isoformat()
+    }
+    _url_cache.set(project_id, entry, entry["expires_at"])
+    if _shared_url_store is not None:
+        _shared_url_store.set(project_id, entry, entry["expires_at"])
+    return entry
+
 
-    # Save new URL to file
+def get_download_urls_with_tokens(project_ids):
+    """Return {project_id: (download_url, expires_at)}, issuing tokens only for projects without a reusable one."""
+    project_ids = list(dict.fromkeys(project_ids))
     try:
-        with open(url_file, 'w') as f:
-            json.dump({
-                'download_url': download_url,
-                'expires_at': expires_at.isoformat()
-            }, f)
-    except OSError as e:
+        entries = _cached_download_urls(project_ids)
+        for project_id in project_ids:
+            if project_id not in entries:
+                entries[project_id] = _issue_download_url(project_id)
+    except Exception as e:
         app_error(
-            code="URL_FILE_WRITE_ERROR",
-            message="Failed to write URL to file",
-            details={"error": str(e), "file": url_file},
+            code="DOWNLOAD_URL_ISSUE_FAILED",
+            message="Failed to issue download URL",
+            details={"error": str(e)},
             status_code=500
         )
+    return {
+        project_id: (entry["download_url"], datetime.fromisoformat(entry["expires_at_iso"]))
+        for project_id, entry in entries.items()
+    }
 
-    return download_url, expires_at
+
+def get_download_url_with_token(project_id: int):
+    return get_download_urls_with_tokens([project_id])[project_id]
 
 def verify_download_token(token):
     payload = verify_access_token(token)
     if payload is None:
         return None, False
-    return payload.get("project_id"), payload.get("type") == "download"
\ No newline at end of file
+    return payload.get("project_id"), payload.get("type") == "download"
+
+
+RANGE_READ_SIZE = 1024 * 1024
+
+
+class FullFileResponse(FileResponse):
+    """FileResponse that always sends the whole file; range decisions are made before it is built."""
+
+    async def __call__(self, scope, receive, send):
+        headers = [(key, value) for key, value in scope["headers"] if key not in (b"range", b"if-range")]
+        await super().__call__(dict(scope, headers=headers), receive, send)
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    # Strong validator from the file's identity: a rewritten or replaced file gets a new tag
+    identity = f"{stat_result.st_dev}-{stat_result.st_ino}-{stat_result.st_size}-{stat_result.st_mtime_ns}"
+    return '"' + hashlib.sha256(identity.encode()).hexdigest()[:32] + '"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in candidates
+
+
+def parse_byte_range(header: str, file_size: int):
+    """
+    Parse a Range header against a file of `file_size` bytes.
+
+    Rules: anything that is not a single well-formed `bytes=` range is
+    ignored and the whole file is sent (multipart/byteranges is never
+    produced); a single range that starts past the end, or any range of an
+    empty file, is unsatisfiable.
+
+    Returns:
+        (start, end) inclusive, None to ignore the header, or "unsatisfiable"
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or not ranges or "," in ranges:
+        return None
+    first, sep, last = ranges.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first == "":
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0 or file_size == 0:
+                return "unsatisfiable"
+            return max(0, file_size - length), file_size - 1
+        start = int(first)
+        end = int(last) if last else file_size - 1
+    except ValueError:
+        return None
+    if start >= file_size:
+        return "unsatisfiable"
+    if start < 0 or end < start:
+        return None
+    return start, min(end, file_size - 1)
+
+
+def _iter_file_range(file_path: str, start: int, end: int):
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = f.read(min(RANGE_READ_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def build_file_response(request: Request, file_path: str, filename: str):
+    """
+    Serve a file with ETag, If-None-Match, If-Range and single byte-range support.
+    Full responses go through FileResponse so the server can use sendfile.
+    """
+    stat_result = os.stat(file_path)
+    etag = file_etag(stat_result)
+    last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+    headers = {"ETag": etag, "Last-Modified": last_modified, "Accept-Ranges": "bytes"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range needs a strong match, otherwise the client gets the full, current file
+    if range_header and (if_range is None or if_range.strip() in (etag, last_modified)):
+        byte_range = parse_byte_range(range_header, stat_result.st_size)
+        if byte_range == "unsatisfiable":
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{stat_result.st_size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            return StreamingResponse(
+                _iter_file_range(file_path, start, end),
+                status_code=206,
+                media_type=media_type,
+                headers={
+                    **headers,
+                    "Content-Range": f"bytes {start}-{end}/{stat_result.st_size}",
+                    "Content-Length": str(end - start + 1),
+                    "Content-Disposition": f'attachment; filename="{filename}"'
+                }
+            )
+    return FullFileResponse(path=file_path, filename=filename, headers=headers, stat_result=stat_result)
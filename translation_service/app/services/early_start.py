@@ -0,0 +1,193 @@
+import shutil
+import struct
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.project import Project
+from app.services.pipeline import run_prefix, adopt_segments, artifact_dir
+
+logger = logging.getLogger(__name__)
+
+# Formats whose prefix can be decoded; MP4 family files only when the index comes before the media data
+MP4_EXTENSIONS = ("mp4", "mov", "m4v")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_uploads: Dict[str, "_Upload"] = {}
+_lock = threading.Lock()
+
+
+class _Upload:
+    def __init__(self, project_id: int, file_path: str, file_size: int, extension: str):
+        self.project_id = project_id
+        self.file_path = file_path
+        self.file_size = file_size
+        self.extension = extension
+        self.received = 0  # Latest durable offset reported by the upload
+        self.scanned = 0  # Offset the last pass worked from
+        self.pending = False
+        self.skip = False
+        self.project: Optional[Tuple] = None  # (type, duration, resolution)
+        self.done: Set[Tuple[float, float]] = set()
+        self.stopped = threading.Event()
+        self.handoffs: List[Callable[[], None]] = []  # Run once the pass in progress ends
+
+
+def staging_key(upload_id: str) -> str:
+    return f"upload-{upload_id}"
+
+
+def mp4_streamable(file_path: str, available: int) -> Optional[bool]:
+    """
+    Whether an MP4 can be decoded from its prefix: its index (moov, or the
+    moof of a fragmented file) comes before the media data.
+
+    Returns:
+        True or False, or None when the received bytes don't tell yet
+    """
+    position = 0
+    with open(file_path, "rb") as f:
+        while position + 8 <= available:
+            f.seek(position)
+            size, box_type = struct.unpack(">I4s", f.read(8))
+            if box_type in (b"moov", b"moof"):
+                return True
+            if box_type == b"mdat":
+                return False
+            if size == 1:
+                if position + 16 > available:
+                    return None
+                size = struct.unpack(">Q", f.read(8))[0]
+            if size < 8:
+                # Size 0 runs to the end of the file; anything smaller is not an MP4
+                return False
+            position += size
+    return None
+
+
+def advance(upload_id: str, session: dict, received: int):
+    """
+    Note the durable offset of a sequential upload and, every
+    EARLY_START_STEP_BYTES, start processing the part received so far.
+    Cheap enough to call from the event loop.
+    """
+    if not settings.EARLY_START_ENABLED or session.get("streams", 1) > 1:
+        return
+    extension = (session.get("file_extension") or "").lower()
+    if extension not in settings.EARLY_START_FORMATS or received >= session["file_size"]:
+        return
+    global _executor
+    with _lock:
+        upload = _uploads.get(upload_id)
+        if upload is None:
+            upload = _Upload(session["project_id"], session["file_path"], session["file_size"], extension)
+            _uploads[upload_id] = upload
+        upload.received = max(upload.received, received)
+        if upload.skip or upload.pending or upload.received - upload.scanned < settings.EARLY_START_STEP_BYTES:
+            return
+        upload.pending = True
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.EARLY_START_WORKERS, thread_name_prefix="early-start")
+    _executor.submit(_process, upload_id, upload)
+
+
+def _process(upload_id: str, upload: _Upload):
+    try:
+        while not upload.stopped.is_set():
+            with _lock:
+                received = upload.received
+                if received - upload.scanned < settings.EARLY_START_STEP_BYTES:
+                    break
+                upload.scanned = received
+            _scan(upload_id, upload, received)
+            if upload.skip:
+                break
+    except Exception as e:
+        # The final run redoes whatever is missing, so this only costs the head start
+        logger.error(f"Early processing of upload {upload_id} failed: {e}")
+        upload.skip = True
+    finally:
+        with _lock:
+            upload.pending = False
+            handoffs, upload.handoffs = upload.handoffs, []
+        for handoff in handoffs:
+            handoff()
+
+
+def _scan(upload_id: str, upload: _Upload, received: int):
+    if upload.project is None:
+        db = SessionLocal()
+        try:
+            project = db.get(Project, upload.project_id)
+            upload.project = (project.type, project.duration, project.resolution)
+        finally:
+            db.close()
+    project_type, duration, resolution = upload.project
+    if not duration:
+        upload.skip = True
+        return
+    if upload.extension in MP4_EXTENSIONS:
+        streamable = mp4_streamable(upload.file_path, received)
+        if streamable is None:
+            return
+        if not streamable:
+            logger.info(f"Upload {upload_id} has its MP4 index at the end, waiting for the whole file")
+            upload.skip = True
+            return
+    processed = run_prefix(
+        staging_key(upload_id), upload.file_path, received, upload.file_size, project_type,
+        duration, resolution, upload.done, upload.stopped.is_set
+    )
+    if processed:
+        logger.info(f"Processed {processed} segments of upload {upload_id} ahead of its last byte")
+
+
+def _stop(upload_id: str) -> Optional[_Upload]:
+    with _lock:
+        upload = _uploads.pop(upload_id, None)
+    if upload is not None:
+        upload.stopped.set()
+    return upload
+
+
+def _after_pass(upload_id: str, function: Callable[[], None]) -> Future:
+    """
+    Stop the upload's pass and run `function` once it has let go of the staged
+    files: right away when no pass is running, otherwise on the early-start
+    thread as soon as the pass reaches a window boundary. Nothing blocks.
+    """
+    future = Future()
+
+    def run():
+        try:
+            function()
+            future.set_result(None)
+        except Exception as e:
+            future.set_exception(e)
+
+    upload = _stop(upload_id)
+    with _lock:
+        if upload is not None and upload.pending:
+            upload.handoffs.append(run)
+            return future
+    # Work staged before a restart has no state left but is handled all the same
+    run()
+    return future
+
+
+def adopt(upload_id: str, source_key: str) -> Future:
+    """
+    Hand the work done during the upload to the verified source key the job
+    runs under.
+
+    Returns:
+        Future that resolves once the segments are adopted
+    """
+    return _after_pass(upload_id, lambda: adopt_segments(staging_key(upload_id), source_key))
+
+
+def discard(upload_id: str) -> Future:
+    """Drop the work done on an upload that was cancelled or failed verification."""
+    return _after_pass(upload_id, lambda: shutil.rmtree(artifact_dir(staging_key(upload_id)), ignore_errors=True))
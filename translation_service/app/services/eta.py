@@ -0,0 +1,207 @@
+import math
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.job import TranslationJob, JobStatus, StageTiming
+from app.models.project import Project, ProjectStatus
+from app.services.pricing import resolution_class
+from app.services.job_queue import claim_order, tier_rank, next_off_peak_start
+
+logger = logging.getLogger(__name__)
+
+# (project_type, video_type) -> (monotonic time computed, seconds of processing per second of video)
+_ratio_cache: Dict[Tuple[str, str], Tuple[float, float]] = {}
+
+
+def video_class(resolution: Optional[str]) -> str:
+    """The calculate_price resolution bucket of a "WIDTHxHEIGHT" string."""
+    if not resolution:
+        return "SD"
+    width, height = map(int, resolution.split("x"))
+    return resolution_class(width, height)[1]
+
+
+def _type_value(project_type) -> str:
+    return getattr(project_type, "value", project_type)
+
+
+def record_stage_timings(project_id: int, project_type, duration: Optional[float], resolution: Optional[str],
+                         timings: List[Tuple[str, float]]):
+    """Store the stage timings of a finished job as ETA samples."""
+    if not timings or not duration:
+        return
+    db = SessionLocal()
+    try:
+        with db.begin():
+            for stage, elapsed in timings:
+                db.add(StageTiming(
+                    project_id=project_id,
+                    project_type=_type_value(project_type),
+                    video_type=video_class(resolution),
+                    video_duration=duration,
+                    stage=stage,
+                    elapsed=elapsed
+                ))
+    except Exception as e:
+        logger.error(f"Could not record stage timings of project {project_id}: {e}")
+    finally:
+        db.close()
+
+
+def processing_ratio(db: Session, project_type, video_type: str) -> float:
+    """
+    Seconds of processing per second of video, averaged over the last
+    ETA_SAMPLE_JOBS jobs of the same project type and resolution class.
+    Falls back to the project type alone, then to ETA_DEFAULT_RATIO.
+    """
+    key = (_type_value(project_type), video_type)
+    cached = _ratio_cache.get(key)
+    if cached and time.monotonic() - cached[0] < settings.ETA_CACHE_SECONDS:
+        return cached[1]
+
+    ratio = settings.ETA_DEFAULT_RATIO
+    for filters in (
+        (StageTiming.project_type == key[0], StageTiming.video_type == video_type),
+        (StageTiming.project_type == key[0],)
+    ):
+        samples = db.query(
+            func.sum(StageTiming.elapsed),
+            func.max(StageTiming.video_duration)
+        ).filter(*filters).group_by(StageTiming.project_id) \
+            .order_by(func.max(StageTiming.created_at).desc()) \
+            .limit(settings.ETA_SAMPLE_JOBS).all()
+        if samples:
+            ratio = sum(elapsed for elapsed, _ in samples) / max(1.0, sum(duration for _, duration in samples))
+            break
+    _ratio_cache[key] = (time.monotonic(), ratio)
+    return ratio
+
+
+def estimate_processing_seconds(db: Session, project_type, duration: Optional[float],
+                                resolution: Optional[str]) -> float:
+    return processing_ratio(db, project_type, video_class(resolution)) * (duration or settings.ETA_DEFAULT_DURATION)
+
+
+def _estimate_work(db: Session, condition, remaining_only: bool = False) -> Tuple[int, float]:
+    """Count the jobs matching `condition` and the processing seconds they still need."""
+    duration = func.coalesce(Project.duration, settings.ETA_DEFAULT_DURATION)
+    if remaining_only:
+        duration = duration * (1 - func.coalesce(Project.progress, 0) / 100)
+    rows = db.query(Project.type, Project.resolution, func.count(), func.sum(duration)) \
+        .join(TranslationJob, TranslationJob.project_id == Project.id) \
+        .filter(condition) \
+        .group_by(Project.type, Project.resolution).all()
+    count = sum(row[2] for row in rows)
+    seconds = sum(processing_ratio(db, row[0], video_class(row[1])) * (row[3] or 0) for row in rows)
+    return count, seconds
+
+
+@dataclass
+class QueueSnapshot:
+    """The queue as seen by one request, so estimating many projects costs a fixed number of queries."""
+    now: datetime
+    running_seconds: float  # Processing left on running jobs
+    ranks: List[int]  # Tier rank of each queued job, in claim order
+    queued_seconds: List[float]  # Processing needed by the queued jobs before each index, plus the total
+    positions: Dict[int, int]  # project_id -> index of its queued job
+    ratios: Dict[Tuple[str, str], float]  # (project_type, video_type) -> processing_ratio
+
+
+def queue_snapshot(db: Session, projects: List[Project]) -> QueueSnapshot:
+    """
+    Load what queue_estimate needs for `projects`: the queued jobs in claim
+    order with their estimated cost, the work left on running jobs, and the
+    processing ratios of the projects.
+    """
+    now = datetime.utcnow()
+    ratios: Dict[Tuple[str, str], float] = {}
+
+    def ratio(project_type, resolution) -> float:
+        key = (_type_value(project_type), video_class(resolution))
+        if key not in ratios:
+            ratios[key] = processing_ratio(db, project_type, key[1])
+        return ratios[key]
+
+    for project in projects:
+        ratio(project.type, project.resolution)
+    rows = db.query(TranslationJob.project_id, TranslationJob.tier, Project.type, Project.resolution,
+                    func.coalesce(Project.duration, settings.ETA_DEFAULT_DURATION)) \
+        .join(Project, TranslationJob.project_id == Project.id) \
+        .filter(TranslationJob.status == JobStatus.queued) \
+        .order_by(*claim_order(now)).all()
+    queued_seconds = [0.0]
+    for _, _, project_type, resolution, duration in rows:
+        queued_seconds.append(queued_seconds[-1] + ratio(project_type, resolution) * (duration or 0))
+    _, running_seconds = _estimate_work(db, TranslationJob.status == JobStatus.running, remaining_only=True)
+    return QueueSnapshot(
+        now=now,
+        running_seconds=running_seconds,
+        ranks=[tier_rank(tier, now) for _, tier, _, _, _ in rows],
+        queued_seconds=queued_seconds,
+        positions={row[0]: index for index, row in enumerate(rows)},
+        ratios=ratios
+    )
+
+
+def queue_estimate(snapshot: QueueSnapshot, project: Project, progress: Optional[float] = None) -> Dict:
+    """
+    Queue position and ETA of a project, from a queue_snapshot that
+    included it. Queued work ahead of it, plus the rest of the running jobs,
+    is spread over TRANSLATION_WORKERS workers. Off-peak projects wait at
+    least until the next off-peak window.
+
+    Args:
+        snapshot: Queue state of the current request
+        project: The project, in any status
+        progress: Live progress of a processing project, when fresher than the stored one
+
+    Returns:
+        {"queuePosition": 1-based place in the queue (0 while processing) or None,
+         "estimatedSeconds": seconds until done or None}
+    """
+    if project.status in (ProjectStatus.completed, ProjectStatus.failed, ProjectStatus.cancelled):
+        return {"queuePosition": None, "estimatedSeconds": None}
+
+    own = snapshot.ratios[(_type_value(project.type), video_class(project.resolution))] \
+        * (project.duration or settings.ETA_DEFAULT_DURATION)
+    if project.status == ProjectStatus.processing:
+        done = project.progress if progress is None else progress
+        remaining = own * (1 - (done or 0) / 100)
+        return {"queuePosition": 0, "estimatedSeconds": math.ceil(remaining)}
+
+    ahead = snapshot.positions.get(project.id) if project.status == ProjectStatus.awaiting_queue else None
+    if ahead is None:
+        # Not queued yet: behind every queued job in its lane or a faster one
+        ahead = bisect_right(snapshot.ranks, tier_rank(project.tier, snapshot.now))
+    wait = (snapshot.queued_seconds[ahead] + snapshot.running_seconds) / max(1, settings.TRANSLATION_WORKERS)
+    if project.tier == "off_peak":
+        wait = max(wait, (next_off_peak_start(snapshot.now) - snapshot.now).total_seconds())
+    return {"queuePosition": ahead + 1, "estimatedSeconds": math.ceil(wait + own)}
+
+
+def format_eta(seconds: Optional[float]) -> Optional[str]:
+    if seconds is None:
+        return None
+    return f"{max(1, math.ceil(seconds / 60))} دقیقه"
+
+
+def queue_backlog(db: Session) -> Dict:
+    """Queue depth and the processing time it represents, to spot capacity falling behind."""
+    queued, queued_seconds = _estimate_work(db, TranslationJob.status == JobStatus.queued)
+    running, running_seconds = _estimate_work(db, TranslationJob.status == JobStatus.running, remaining_only=True)
+    oldest = db.query(func.min(TranslationJob.available_at)) \
+        .filter(TranslationJob.status == JobStatus.queued).scalar()
+    return {
+        "queued": queued,
+        "running": running,
+        "workers": settings.TRANSLATION_WORKERS,
+        "backlogSeconds": math.ceil((queued_seconds + running_seconds) / max(1, settings.TRANSLATION_WORKERS)),
+        "oldestQueuedSeconds": max(0, math.ceil((datetime.utcnow() - oldest).total_seconds())) if oldest else 0
+    }
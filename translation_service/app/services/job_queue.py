@@ -0,0 +1,572 @@
+import os
+import math
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+from zoneinfo import ZoneInfo
+from sqlalchemy import update, or_, and_, func, select, case
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.job import TranslationJob, JobStatus
+from app.models.project import Project, ProjectStatus
+from app.services.pricing import TIERS
+
+logger = logging.getLogger(__name__)
+
+HOSTNAME = socket.gethostname()
+
+# Set when a job is enqueued so idle workers don't wait out the poll interval. Worker
+# processes swap in a multiprocessing event shared with the API process.
+_new_job_event = threading.Event()
+
+
+def use_wake_event(wake_event):
+    global _new_job_event
+    _new_job_event = wake_event
+
+
+def notify_workers():
+    _new_job_event.set()
+
+
+def wait_for_jobs(timeout: float):
+    _new_job_event.wait(timeout)
+    _new_job_event.clear()
+
+
+class JobCancelled(Exception):
+    """Raised in a worker at the next stage boundary once its job was cancelled."""
+
+
+class JobInterrupted(Exception):
+    """Raised in a worker at the next stage boundary once it lost its lease or is shutting down."""
+
+
+# Projects whose running job stops at its next stage boundary without being settled
+_interrupted: Set[int] = set()
+
+
+def worker_id(name: str) -> str:
+    return f"{HOSTNAME}:{os.getpid()}:{name}"
+
+
+def user_weight(user_id: Optional[int]) -> float:
+    return float(settings.FAIR_SHARE_WEIGHTS.get(str(user_id), settings.FAIR_SHARE_DEFAULT_WEIGHT))
+
+
+def _local_time(now: datetime) -> datetime:
+    return now.replace(tzinfo=timezone.utc).astimezone(ZoneInfo(settings.OFF_PEAK_TIMEZONE))
+
+
+def in_off_peak(now: datetime) -> bool:
+    """Whether the naive UTC time `now` falls in the OFF_PEAK_START_HOUR..OFF_PEAK_END_HOUR window."""
+    hour = _local_time(now).hour
+    start, end = settings.OFF_PEAK_START_HOUR, settings.OFF_PEAK_END_HOUR
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def next_off_peak_start(now: datetime) -> datetime:
+    """`now` inside the off-peak window, otherwise the (naive UTC) start of the next one."""
+    if in_off_peak(now):
+        return now
+    local = _local_time(now)
+    start = local.replace(hour=settings.OFF_PEAK_START_HOUR, minute=0, second=0, microsecond=0)
+    if start <= local:
+        start += timedelta(days=1)
+    return start.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def available_from(tier: str, earliest: datetime) -> datetime:
+    """When a job of `tier` may run at or after `earliest`: off-peak jobs wait for their window."""
+    return next_off_peak_start(earliest) if tier == "off_peak" else earliest
+
+
+def tier_rank(tier: str, now: datetime) -> int:
+    """Lane of a tier; off-peak jobs share the standard lane while the window is open."""
+    if tier == "off_peak" and in_off_peak(now):
+        return TIERS["standard"]["rank"]
+    return TIERS.get(tier, TIERS["standard"])["rank"]
+
+
+def _tier_rank_column(now: datetime):
+    return case(
+        {tier: tier_rank(tier, now) for tier in TIERS},
+        value=TranslationJob.tier,
+        else_=TIERS["standard"]["rank"]
+    )
+
+
+def _virtual_time(db: Session) -> float:
+    """The smallest start tag still waiting, or the latest one handed out when nothing is queued."""
+    waiting = db.query(func.min(TranslationJob.virtual_start)) \
+        .filter(TranslationJob.status == JobStatus.queued).scalar()
+    if waiting is not None:
+        return waiting
+    return db.query(func.max(TranslationJob.virtual_start)).scalar() or 0.0
+
+
+def enqueue_job(db: Session, project_id: int) -> TranslationJob:
+    """
+    Add (or re-arm) the job of a project inside the caller's transaction.
+
+    Jobs get weighted fair queueing tags: a job starts at the later of the
+    queue's virtual time and the finish tag of its owner's last pending job,
+    and finishes its estimated cost / the owner's weight later. The finish
+    tag becomes the job's deadline, counted from now, or from the next
+    off-peak window for off-peak jobs, which are not claimable before it.
+    Claiming by tier, then earliest deadline, interleaves users instead of
+    serving them FIFO.
+    """
+    from app.services.eta import estimate_processing_seconds
+
+    project = db.get(Project, project_id)
+    job = db.query(TranslationJob).filter(TranslationJob.project_id == project_id).first()
+    if job is None:
+        job = TranslationJob(project_id=project_id, max_attempts=settings.JOB_MAX_ATTEMPTS)
+        db.add(job)
+    user_last_finish = db.query(func.max(TranslationJob.virtual_finish)).filter(
+        TranslationJob.user_id == project.user_id,
+        TranslationJob.status.in_([JobStatus.queued, JobStatus.running]),
+        TranslationJob.project_id != project_id
+    ).scalar()
+    cost = estimate_processing_seconds(db, project.type, project.duration, project.resolution)
+    virtual_time = _virtual_time(db)
+    now = datetime.utcnow()
+    start = available_from(project.tier, now)
+    job.user_id = project.user_id
+    job.tier = project.tier
+    job.virtual_start = max(virtual_time, user_last_finish or 0.0)
+    job.virtual_finish = job.virtual_start + cost / user_weight(project.user_id)
+    job.deadline = start + timedelta(seconds=job.virtual_finish - virtual_time)
+    job.status = JobStatus.queued
+    job.attempts = 0
+    job.available_at = start
+    job.locked_by = None
+    job.locked_until = None
+    job.last_error = None
+    return job
+
+
+def _claimable(now: datetime):
+    # A running job whose lease ran out is handed back by reap_stale_jobs, which enforces the attempt limit
+    return and_(TranslationJob.status == JobStatus.queued, TranslationJob.available_at <= now)
+
+
+def claim_order(now: datetime):
+    """The order in which queued jobs are claimed: by tier, then earliest deadline first."""
+    return (_tier_rank_column(now), TranslationJob.deadline, TranslationJob.id)
+
+
+def _users_at_capacity(now: datetime):
+    """Users already running FAIR_SHARE_MAX_RUNNING_PER_USER jobs (expired leases don't count)."""
+    return select(TranslationJob.user_id).where(
+        TranslationJob.status == JobStatus.running,
+        TranslationJob.locked_until >= now,
+        TranslationJob.user_id.is_not(None)
+    ).group_by(TranslationJob.user_id).having(func.count() >= settings.FAIR_SHARE_MAX_RUNNING_PER_USER)
+
+
+def _schedulable(now: datetime):
+    condition = _claimable(now)
+    if settings.FAIR_SHARE_MAX_RUNNING_PER_USER > 0:
+        condition = and_(condition, or_(
+            TranslationJob.user_id.is_(None),
+            TranslationJob.user_id.not_in(_users_at_capacity(now))
+        ))
+    return condition
+
+
+def claim_job(owner: str) -> Optional[TranslationJob]:
+    """
+    Atomically take the claimable job of the fastest tier with the earliest
+    deadline, skipping users who already run their share of jobs. The conditional
+    UPDATE only succeeds for one worker, so concurrent claimers never share
+    a job; on PostgreSQL, FOR UPDATE SKIP LOCKED also keeps them from racing
+    for the same row. The job is leased for JOB_VISIBILITY_TIMEOUT_SECONDS,
+    which its worker keeps extending with renew_lease.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        candidates = db.query(TranslationJob.id).filter(_schedulable(now)).order_by(*claim_order(now))
+        if db.get_bind().dialect.name == "postgresql":
+            # Rows other workers are claiming are skipped rather than waited on, so the first one left is ours
+            candidates = candidates.with_for_update(skip_locked=True, of=TranslationJob).limit(1).all()
+        else:
+            candidates = candidates.limit(settings.JOB_CLAIM_BATCH).all()
+        for (job_id,) in candidates:
+            result = db.execute(
+                update(TranslationJob)
+                .where(TranslationJob.id == job_id, _schedulable(now))
+                .values(
+                    status=JobStatus.running,
+                    locked_by=owner,
+                    locked_until=now + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT_SECONDS),
+                    heartbeat_at=now,
+                    attempts=TranslationJob.attempts + 1,
+                    updated_at=now
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                db.rollback()
+                continue
+            job = db.get(TranslationJob, job_id)
+            job.project.status = ProjectStatus.processing
+            job.project.progress = 0
+            db.commit()
+            db.refresh(job)
+            db.expunge(job)
+            return job
+        db.commit()
+        return None
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def user_queue_depths(db: Session, limit: int = 50) -> List[Dict]:
+    """Queued and running jobs per user, deepest queues first."""
+    queued = func.sum(case((TranslationJob.status == JobStatus.queued, 1), else_=0))
+    running = func.sum(case((TranslationJob.status == JobStatus.running, 1), else_=0))
+    rows = db.query(TranslationJob.user_id, queued, running) \
+        .filter(TranslationJob.status.in_([JobStatus.queued, JobStatus.running])) \
+        .group_by(TranslationJob.user_id) \
+        .order_by(queued.desc()).limit(limit).all()
+    return [
+        {"userId": user_id, "queued": queued_count, "running": running_count, "weight": user_weight(user_id)}
+        for user_id, queued_count, running_count in rows
+    ]
+
+
+def _owned_job(db: Session, job_id: int, owner: str) -> Optional[TranslationJob]:
+    # Locked so a concurrent cancel_job can't refund a job that is being completed
+    job = db.get(TranslationJob, job_id, with_for_update=True)
+    if job is None or job.status != JobStatus.running or job.locked_by != owner:
+        # The lease ran out and the job was reaped or taken over; that outcome wins
+        logger.warning(f"Job {job_id} is no longer held by {owner}")
+        return None
+    return job
+
+
+def complete_job(job_id: int, owner: str) -> bool:
+    """
+    Mark a job and its project completed. Returns False, changing nothing, when
+    the job is no longer held by `owner`: it was cancelled after its last stage
+    check, or reaped and handed to another worker.
+    """
+    db = SessionLocal()
+    try:
+        with db.begin():
+            job = _owned_job(db, job_id, owner)
+            if job is None:
+                return False
+            job.status = JobStatus.succeeded
+            job.locked_by = None
+            job.locked_until = None
+            job.project.status = ProjectStatus.completed
+            job.project.progress = 100.0
+            job.project.completed_at = datetime.utcnow()
+            return True
+    finally:
+        db.close()
+
+
+def renew_lease(job_id: int, owner: str) -> bool:
+    """Record a heartbeat and extend the lease on a running job. False when the job is no longer held by `owner`."""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        result = db.execute(
+            update(TranslationJob)
+            .where(TranslationJob.id == job_id, TranslationJob.status == JobStatus.running,
+                   TranslationJob.locked_by == owner)
+            .values(locked_until=now + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT_SECONDS),
+                    heartbeat_at=now, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount == 1
+    finally:
+        db.close()
+
+
+def release_job(job_id: int, owner: str) -> bool:
+    """
+    Hand a running job back to the queue without counting the attempt, e.g.
+    when its worker shuts down. Another worker resumes it from its checkpoint.
+    Returns False when the job is no longer held by `owner`.
+    """
+    db = SessionLocal()
+    try:
+        with db.begin():
+            job = _owned_job(db, job_id, owner)
+            if job is None:
+                return False
+            job.status = JobStatus.queued
+            job.attempts = max(0, job.attempts - 1)
+            job.available_at = available_from(job.tier, datetime.utcnow())
+            job.locked_by = None
+            job.locked_until = None
+            job.project.status = ProjectStatus.awaiting_queue
+            return True
+    finally:
+        db.close()
+
+
+def _fail_for_good(job: TranslationJob) -> float:
+    """Fail a job and its project and give the project's price back to its owner. Returns the refund."""
+    job.status = JobStatus.failed
+    job.project.status = ProjectStatus.failed
+    refunded = job.project.price or 0.0
+    job.project.owner.balance += refunded
+    return refunded
+
+
+def fail_job(job_id: int, owner: str, error: str) -> Optional[JobStatus]:
+    """
+    Schedule a retry with exponential backoff, or fail (and refund) the project once attempts are used up.
+    Returns the job's new status, or None when the job is no longer ours.
+    """
+    db = SessionLocal()
+    try:
+        with db.begin():
+            job = _owned_job(db, job_id, owner)
+            if job is None:
+                return None
+            job.last_error = error[:1000]
+            job.locked_by = None
+            job.locked_until = None
+            if job.attempts < job.max_attempts:
+                delay = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+                job.status = JobStatus.queued
+                job.available_at = available_from(job.tier, datetime.utcnow() + timedelta(seconds=delay))
+                job.project.status = ProjectStatus.awaiting_queue
+                logger.warning(f"Job {job_id} failed (attempt {job.attempts}), retrying in {delay}s: {error}")
+            else:
+                refunded = _fail_for_good(job)
+                logger.error(f"Job {job_id} failed permanently after {job.attempts} attempts "
+                             f"(refunded {refunded}): {error}")
+            return job.status
+    finally:
+        db.close()
+
+
+def cancel_job(db: Session, project_id: int) -> Optional[JobStatus]:
+    """
+    Cancel the queued or running job of a project inside the caller's
+    transaction. A queued job is never claimed again; a running one is
+    stopped by its worker at the next stage boundary (see raise_if_cancelled).
+
+    Returns:
+        The status the job had, or None when it was no longer queued or running
+    """
+    job = db.query(TranslationJob).filter(TranslationJob.project_id == project_id).with_for_update().first()
+    if job is None or job.status not in (JobStatus.queued, JobStatus.running):
+        return None
+    previous = job.status
+    job.status = JobStatus.cancelled
+    job.locked_by = None
+    job.locked_until = None
+    return previous
+
+
+def interrupt_job(project_id: int):
+    """Make the job of a project running in this process stop at its next stage boundary."""
+    _interrupted.add(project_id)
+
+
+def forget_interrupt(project_id: int):
+    _interrupted.discard(project_id)
+
+
+def raise_if_cancelled(project_id: int):
+    db = SessionLocal()
+    try:
+        status = db.query(TranslationJob.status).filter(TranslationJob.project_id == project_id).scalar()
+    finally:
+        db.close()
+    if status == JobStatus.cancelled:
+        raise JobCancelled(f"Job of project {project_id} was cancelled")
+    if project_id in _interrupted:
+        raise JobInterrupted(f"Job of project {project_id} was interrupted")
+
+
+# Jobs settled by reap_stale_jobs in this process
+_reaped = {"requeued": 0, "failed": 0, "refunded": 0.0}
+_reaped_lock = threading.Lock()
+
+
+def reap_stale_jobs() -> List[Dict]:
+    """
+    Settle running jobs whose worker stopped sending heartbeats (killed
+    process, dead thread, lost node) for longer than the lease: they are
+    retried right away while attempts remain, otherwise failed and refunded.
+    Safe to run in several processes at once.
+
+    Returns:
+        A job_failed event per reaped job
+    """
+    db = SessionLocal()
+    events = []
+    try:
+        with db.begin():
+            now = datetime.utcnow()
+            stale = db.query(TranslationJob).filter(
+                TranslationJob.status == JobStatus.running,
+                func.coalesce(TranslationJob.heartbeat_at, TranslationJob.updated_at)
+                < now - timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT_SECONDS)
+            )
+            if db.get_bind().dialect.name == "postgresql":
+                # Jobs another reaper (or a late heartbeat) holds are left to it
+                stale = stale.with_for_update(skip_locked=True, of=TranslationJob)
+            for job in stale.all():
+                error = f"Worker {job.locked_by} stopped sending heartbeats"
+                job.last_error = error
+                job.locked_by = None
+                job.locked_until = None
+                refunded = 0.0
+                if job.attempts < job.max_attempts:
+                    job.status = JobStatus.queued
+                    job.available_at = available_from(job.tier, now)
+                    job.project.status = ProjectStatus.awaiting_queue
+                    logger.warning(f"Requeued stale job {job.id} (attempt {job.attempts}): {error}")
+                else:
+                    refunded = _fail_for_good(job)
+                    logger.error(f"Failed stale job {job.id} after {job.attempts} attempts "
+                                 f"(refunded {refunded}): {error}")
+                events.append({"type": "job_failed", "job_id": job.id, "project_id": job.project_id,
+                               "error": error, "status": job.status.value, "refunded": refunded})
+    finally:
+        db.close()
+    with _reaped_lock:
+        for job_event in events:
+            _reaped["requeued" if job_event["status"] == JobStatus.queued.value else "failed"] += 1
+            _reaped["refunded"] += job_event["refunded"]
+    return events
+
+
+def stuck_job_stats(db: Session) -> Dict:
+    """Running jobs whose heartbeat is overdue, projects left processing without a running job, and reaper totals."""
+    now = datetime.utcnow()
+    threshold = now - timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT_SECONDS)
+    heartbeat = func.coalesce(TranslationJob.heartbeat_at, TranslationJob.updated_at)
+    running, stale, oldest = db.query(
+        func.count(TranslationJob.id),
+        func.coalesce(func.sum(case((heartbeat < threshold, 1), else_=0)), 0),
+        func.min(heartbeat)
+    ).filter(TranslationJob.status == JobStatus.running).one()
+    orphaned = db.query(func.count(Project.id)) \
+        .outerjoin(TranslationJob, TranslationJob.project_id == Project.id) \
+        .filter(Project.status == ProjectStatus.processing,
+                or_(TranslationJob.id.is_(None), TranslationJob.status != JobStatus.running)).scalar()
+    with _reaped_lock:
+        reaped = dict(_reaped)
+    return {
+        "running": running,
+        "staleHeartbeats": stale,
+        "oldestHeartbeatSeconds": max(0, math.ceil((now - oldest).total_seconds())) if oldest else 0,
+        "processingWithoutJob": orphaned,
+        "reapedRequeued": reaped["requeued"],
+        "reapedFailed": reaped["failed"],
+        "reapedRefunded": reaped["refunded"]
+    }
+
+
+def release_worker_jobs(owner_prefix: str, error: str) -> int:
+    """Treat every job held by a crashed worker as a failed attempt, so it is retried right away or failed."""
+    db = SessionLocal()
+    try:
+        held = db.query(TranslationJob.id, TranslationJob.locked_by).filter(
+            TranslationJob.status == JobStatus.running,
+            TranslationJob.locked_by.like(f"{owner_prefix}%")
+        ).all()
+    finally:
+        db.close()
+    for job_id, owner in held:
+        fail_job(job_id, owner, error)
+    return len(held)
+
+
+def recover_jobs() -> int:
+    """
+    Re-enqueue work lost by a restart: awaiting_queue or processing projects
+    without a live job. Jobs still marked running are left to reap_stale_jobs,
+    which only takes them once their heartbeat stops, since the process
+    holding one may be a live sibling on this host.
+    """
+    db = SessionLocal()
+    recovered = 0
+    try:
+        with db.begin():
+            orphans = db.query(Project).outerjoin(TranslationJob, TranslationJob.project_id == Project.id).filter(
+                Project.status.in_([ProjectStatus.awaiting_queue, ProjectStatus.processing]),
+                or_(TranslationJob.id.is_(None), TranslationJob.status.in_([JobStatus.succeeded, JobStatus.failed]))
+            ).all()
+            for project in orphans:
+                enqueue_job(db, project.id)
+                project.status = ProjectStatus.awaiting_queue
+                recovered += 1
+        if recovered:
+            logger.warning(f"Recovered {recovered} translation jobs after restart")
+        return recovered
+    finally:
+        db.close()
+
+
+def poll_job_events(seen: Dict[int, tuple], window_seconds: float) -> List[Dict]:
+    """
+    Job events of workers in other processes (app.worker), derived from the
+    jobs table: running jobs and jobs updated in the last `window_seconds`
+    are compared to the state they had at the previous poll.
+
+    Args:
+        seen: job_id -> (status, attempts, progress) of the previous poll, updated in place
+        window_seconds: How far back finished jobs are looked for; covers the poll interval and clock skew
+
+    Returns:
+        Events shaped like the ones workers report
+    """
+    db = SessionLocal()
+    try:
+        since = datetime.utcnow() - timedelta(seconds=window_seconds)
+        rows = db.query(TranslationJob.id, TranslationJob.project_id, TranslationJob.status,
+                        TranslationJob.attempts, TranslationJob.last_error, Project.progress) \
+            .join(Project, TranslationJob.project_id == Project.id) \
+            .filter(or_(TranslationJob.status == JobStatus.running, TranslationJob.updated_at >= since)).all()
+    finally:
+        db.close()
+    events = []
+    for job_id, project_id, status, attempts, error, progress in rows:
+        state = (status, attempts, progress)
+        previous = seen.get(job_id)
+        seen[job_id] = state
+        if previous == state or (previous is None and status == JobStatus.queued):
+            continue
+        if status == JobStatus.running:
+            if previous is None or previous[0] != JobStatus.running or previous[1] != attempts:
+                events.append({"type": "job_started", "job_id": job_id, "project_id": project_id})
+            if progress:
+                events.append({"type": "job_progress", "project_id": project_id, "stage": None,
+                               "progress": progress})
+        elif status == JobStatus.succeeded:
+            events.append({"type": "job_succeeded", "job_id": job_id, "project_id": project_id})
+        elif status == JobStatus.queued and previous[0] == JobStatus.running and attempts < previous[1]:
+            # release_job gives the attempt back, fail_job doesn't
+            events.append({"type": "job_released", "job_id": job_id, "project_id": project_id})
+        elif status == JobStatus.failed or (status == JobStatus.queued and previous[0] == JobStatus.running):
+            events.append({"type": "job_failed", "job_id": job_id, "project_id": project_id, "error": error,
+                           "status": status.value})
+    # Jobs that left the window won't show up again unless they change
+    returned = {row[0] for row in rows}
+    for job_id in list(seen):
+        if job_id not in returned:
+            del seen[job_id]
+    return events
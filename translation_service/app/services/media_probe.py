@@ -0,0 +1,189 @@
+import mmap
+import struct
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+# Reads container metadata straight from the file's bytes (memory-mapped, never loaded whole)
+# so the server can check the duration and resolution the client priced the project with.
+
+MP4_CONTAINERS = (b"moov", b"trak", b"mdia", b"minf", b"mvex", b"edts")
+
+EBML_HEADER = 0x1A45DFA3
+MKV_SEGMENT = 0x18538067
+MKV_INFO = 0x1549A966
+MKV_TIMECODE_SCALE = 0x2AD7B1
+MKV_DURATION = 0x4489
+MKV_TRACKS = 0x1654AE6B
+MKV_TRACK_ENTRY = 0xAE
+MKV_VIDEO = 0xE0
+MKV_PIXEL_WIDTH = 0xB0
+MKV_PIXEL_HEIGHT = 0xBA
+MKV_CLUSTER = 0x1F43B675
+MKV_UNKNOWN_SIZE = -1
+
+
+@dataclass
+class MediaInfo:
+    duration: Optional[float] = None  # Seconds
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+    @property
+    def resolution(self) -> Optional[str]:
+        return f"{self.width}x{self.height}" if self.width and self.height else None
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.duration and self.width and self.height)
+
+
+def _mp4_boxes(data, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (type, payload start, payload end) of the boxes in data[start:end], stopping at a truncated one."""
+    position = start
+    while position + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, position)
+        header = 8
+        if size == 1:
+            if position + 16 > end:
+                return
+            size = struct.unpack_from(">Q", data, position + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - position
+        if size < header or position + size > end:
+            return
+        yield box_type, position + header, position + size
+        position += size
+
+
+def _parse_mp4(data, start: int, end: int, info: MediaInfo, movie: dict):
+    for box_type, payload, box_end in _mp4_boxes(data, start, end):
+        if box_type in MP4_CONTAINERS:
+            _parse_mp4(data, payload, box_end, info, movie)
+        elif box_type == b"mvhd":
+            if data[payload] == 1:
+                timescale, duration = struct.unpack_from(">IQ", data, payload + 20)
+            else:
+                timescale, duration = struct.unpack_from(">II", data, payload + 12)
+            if timescale and duration and duration != 0xFFFFFFFF:
+                info.duration = duration / timescale
+            movie["timescale"] = timescale
+        elif box_type == b"mehd" and not info.duration and movie.get("timescale"):
+            # Fragmented files keep their total duration in the movie extends header
+            fragment_duration = struct.unpack_from(">Q" if data[payload] == 1 else ">I", data, payload + 4)[0]
+            info.duration = fragment_duration / movie["timescale"] or None
+        elif box_type == b"tkhd" and not info.width:
+            # Width and height are 16.16 fixed point at the end of the box; audio tracks have zeros
+            width, height = struct.unpack_from(">II", data, box_end - 8)
+            if width and height:
+                info.width, info.height = width >> 16, height >> 16
+
+
+def probe_mp4(data, length: int) -> Optional[MediaInfo]:
+    """Duration and resolution from the moov box of an MP4/MOV, or None if it isn't in data[:length] yet."""
+    for box_type, payload, box_end in _mp4_boxes(data, 0, length):
+        if box_type == b"moov":
+            info = MediaInfo()
+            _parse_mp4(data, payload, box_end, info, {})
+            return info
+    return None
+
+
+def _ebml_vint(data, position: int, end: int, keep_marker: bool) -> Tuple[int, int]:
+    """Read an EBML variable-length integer; element IDs keep their length marker, sizes don't."""
+    if position >= end:
+        raise IndexError("Truncated element")
+    first = data[position]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8 or position + length > end:
+        raise IndexError("Invalid or truncated element")
+    value = first if keep_marker else first & (0xFF >> length)
+    for index in range(1, length):
+        value = (value << 8) | data[position + index]
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        value = MKV_UNKNOWN_SIZE
+    return value, position + length
+
+
+def _ebml_elements(data, start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+    """Yield (id, payload start, payload end) of the elements in data[start:end]."""
+    position = start
+    while position < end:
+        try:
+            element_id, position = _ebml_vint(data, position, end, keep_marker=True)
+            size, position = _ebml_vint(data, position, end, keep_marker=False)
+        except IndexError:
+            return
+        element_end = end if size == MKV_UNKNOWN_SIZE else position + size
+        yield element_id, position, min(element_end, end)
+        position = element_end
+
+
+def _ebml_uint(data, start: int, end: int) -> int:
+    return int.from_bytes(data[start:end], "big")
+
+
+def probe_matroska(data, length: int) -> Optional[MediaInfo]:
+    """Duration and resolution from the Info and Tracks elements of a Matroska/WebM file."""
+    segment = next(((start, end) for element_id, start, end in _ebml_elements(data, 0, length)
+                    if element_id == MKV_SEGMENT), None)
+    if segment is None:
+        return None
+    info = MediaInfo()
+    scale, duration, seen = 1000000, None, set()
+    for element_id, start, end in _ebml_elements(data, *segment):
+        if element_id == MKV_CLUSTER:
+            break
+        if element_id == MKV_INFO:
+            seen.add(element_id)
+            for child_id, child_start, child_end in _ebml_elements(data, start, end):
+                if child_id == MKV_TIMECODE_SCALE:
+                    scale = _ebml_uint(data, child_start, child_end)
+                elif child_id == MKV_DURATION:
+                    duration = struct.unpack(">f" if child_end - child_start == 4 else ">d", data[child_start:child_end])[0]
+        elif element_id == MKV_TRACKS:
+            seen.add(element_id)
+            for entry_id, entry_start, entry_end in _ebml_elements(data, start, end):
+                if entry_id != MKV_TRACK_ENTRY or info.width:
+                    continue
+                for child_id, child_start, child_end in _ebml_elements(data, entry_start, entry_end):
+                    if child_id != MKV_VIDEO:
+                        continue
+                    for video_id, video_start, video_end in _ebml_elements(data, child_start, child_end):
+                        if video_id == MKV_PIXEL_WIDTH:
+                            info.width = _ebml_uint(data, video_start, video_end)
+                        elif video_id == MKV_PIXEL_HEIGHT:
+                            info.height = _ebml_uint(data, video_start, video_end)
+    if not seen:
+        return None
+    if duration:
+        info.duration = duration * scale / 1e9
+    return info
+
+
+def probe_file(file_path: str, length: Optional[int] = None) -> Optional[MediaInfo]:
+    """
+    Read the duration and resolution of an MP4/MOV or Matroska/WebM file.
+
+    Args:
+        file_path: The (possibly still uploading) file
+        length: Bytes of the file that can be trusted so far, or None for all of it
+
+    Returns:
+        MediaInfo, or None when the format isn't recognised or its header isn't in yet
+    """
+    with open(file_path, "rb") as f:
+        size = f.seek(0, 2)
+        length = size if length is None else min(length, size)
+        if length < 8:
+            return None
+        with mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ) as data:
+            try:
+                if struct.unpack_from(">I", data, 0)[0] == EBML_HEADER:
+                    return probe_matroska(data, length)
+                return probe_mp4(data, length)
+            except (struct.error, IndexError, ValueError):
+                # A box or element that claims more bytes than it has
+                return None
@@ -0,0 +1,134 @@
+import os
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.content_store import link_or_copy
+from app.models.job import OutputCacheEntry
+from app.services.pipeline import PIPELINE_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Lookups happen in the API process when an upload is finalized
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _type_value(project_type) -> str:
+    return getattr(project_type, "value", project_type)
+
+
+def _count(name: str):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def output_cache_path(content_hash: str, project_type, extension: str) -> str:
+    return os.path.join(settings.OUTPUT_CACHE_DIR, f"v{PIPELINE_VERSION}", content_hash[:2],
+                        f"{content_hash}.{_type_value(project_type)}.{extension}")
+
+
+def cached_output(db: Session, content_hash: str, project_type) -> Optional[str]:
+    """
+    Find the translated output of an earlier project on the same video, inside
+    the caller's transaction. A hit is marked as recently used.
+
+    Args:
+        db: Database session
+        content_hash: SHA-256 of the source video
+        project_type: ProjectType (or its value) wanted
+
+    Returns:
+        Path of the cached output, or None on a miss
+    """
+    if settings.OUTPUT_CACHE_MAX_BYTES <= 0:
+        return None
+    entry = db.query(OutputCacheEntry).filter(
+        OutputCacheEntry.content_hash == content_hash,
+        OutputCacheEntry.project_type == _type_value(project_type),
+        OutputCacheEntry.pipeline_version == PIPELINE_VERSION
+    ).first()
+    if entry is not None and not os.path.exists(entry.path):
+        logger.warning(f"Cached output {entry.path} is gone, dropping its entry")
+        db.delete(entry)
+        entry = None
+    if entry is None:
+        _count("misses")
+        return None
+    entry.hits += 1
+    entry.last_used_at = datetime.utcnow()
+    _count("hits")
+    return entry.path
+
+
+def store_output(content_hash: str, project_type, output_path: str):
+    """Keep a finished output for later projects on the same video, then evict down to OUTPUT_CACHE_MAX_BYTES."""
+    if settings.OUTPUT_CACHE_MAX_BYTES <= 0:
+        return
+    path = output_cache_path(content_hash, project_type, output_path.split(".")[-1])
+    db = SessionLocal()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Outputs are only ever replaced, never rewritten in place, so a hardlink is a safe copy
+        link_or_copy(output_path, path)
+        with db.begin():
+            entry = db.query(OutputCacheEntry).filter(
+                OutputCacheEntry.content_hash == content_hash,
+                OutputCacheEntry.project_type == _type_value(project_type),
+                OutputCacheEntry.pipeline_version == PIPELINE_VERSION
+            ).first()
+            if entry is None:
+                entry = OutputCacheEntry(
+                    content_hash=content_hash,
+                    project_type=_type_value(project_type),
+                    pipeline_version=PIPELINE_VERSION,
+                    path=path
+                )
+                db.add(entry)
+            entry.size = os.path.getsize(path)
+            entry.last_used_at = datetime.utcnow()
+        evict_outputs(db)
+    except Exception as e:
+        logger.error(f"Could not cache output {output_path}: {e}")
+    finally:
+        db.close()
+
+
+def evict_outputs(db: Session) -> int:
+    """Drop least recently used outputs until the cache fits OUTPUT_CACHE_MAX_BYTES. Returns how many went."""
+    evicted = []
+    with db.begin():
+        total = db.query(func.coalesce(func.sum(OutputCacheEntry.size), 0)).scalar()
+        if total > settings.OUTPUT_CACHE_MAX_BYTES:
+            for entry in db.query(OutputCacheEntry).order_by(OutputCacheEntry.last_used_at).all():
+                if total <= settings.OUTPUT_CACHE_MAX_BYTES:
+                    break
+                db.delete(entry)
+                total -= entry.size
+                evicted.append(entry.path)
+    # Files go only once their entries are gone, so a lookup never returns a deleted path
+    for path in evicted:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        logger.info(f"Evicted cached output {path}")
+    return len(evicted)
+
+
+def output_cache_stats(db: Session) -> Dict:
+    entries, size = db.query(func.count(OutputCacheEntry.id), func.coalesce(func.sum(OutputCacheEntry.size), 0)).one()
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    return {
+        "entries": entries,
+        "bytes": size,
+        "maxBytes": settings.OUTPUT_CACHE_MAX_BYTES,
+        "hits": hits,
+        "misses": misses,
+        "hitRate": round(hits / (hits + misses), 3) if hits + misses else None
+    }
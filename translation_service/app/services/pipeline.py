@@ -0,0 +1,449 @@
+import os
+import glob
+import json
+import time
+import uuid
+import shutil
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import AbstractSet, Callable, Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.models.project import ProjectType
+from app.services import translation
+from app.services import segmenter
+
+logger = logging.getLogger(__name__)
+
+# Bump when a stage implementation changes so stale artifacts are not reused
+PIPELINE_VERSION = "1"
+
+SOURCE = "video"
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    inputs: Tuple[str, ...]
+    extension: str
+    run: Callable[..., str]
+    shared: bool = True  # Output depends only on the source video and is reused across projects
+    segmented: bool = False  # Runs per time segment of long videos, then the segments are stitched
+
+
+STAGES: Dict[str, Stage] = {stage.name: stage for stage in (
+    Stage("extract_audio", (SOURCE,), "wav", translation.extract_audio),
+    Stage("transcribe", ("extract_audio",), "en.srt", translation.transcribe_audio, segmented=True),
+    Stage("translate", ("transcribe",), "fa.srt", translation.translate_subtitle, segmented=True),
+    Stage("synthesize", ("translate",), "fa.wav", translation.synthesize_speech, segmented=True),
+    Stage("english_subtitle", (SOURCE, "transcribe"), "mp4", translation.add_english_subtitle, shared=False),
+    Stage("persian_subtitle", (SOURCE, "translate"), "mp4", translation.add_persian_subtitle, shared=False),
+    Stage("persian_dubbing", (SOURCE, "synthesize"), "mp4", translation.dub_to_persian, shared=False),
+    Stage("persian_dubbing_english_subtitle", (SOURCE, "synthesize", "transcribe"), "mp4",
+          translation.dub_with_english_subtitle, shared=False),
+    Stage("persian_dubbing_persian_subtitle", (SOURCE, "synthesize", "translate"), "mp4",
+          translation.dub_with_persian_subtitle, shared=False),
+)}
+
+# Final stage producing each project type
+TARGETS = {
+    ProjectType.english_subtitle: "english_subtitle",
+    ProjectType.persian_subtitle: "persian_subtitle",
+    ProjectType.persian_dubbing: "persian_dubbing",
+    ProjectType.persian_dubbing_english_subtitle: "persian_dubbing_english_subtitle",
+    ProjectType.persian_dubbing_persian_subtitle: "persian_dubbing_persian_subtitle",
+}
+
+
+def plan_stages(target: str) -> List[Stage]:
+    """
+    Order the stages needed for `target` so that every stage comes after its inputs.
+
+    Args:
+        target: Name of the final stage
+
+    Returns:
+        Stages in execution order, ending with the target
+    """
+    ordered: List[Stage] = []
+    seen = set()
+
+    def visit(name):
+        if name == SOURCE or name in seen:
+            return
+        stage = STAGES[name]
+        for dependency in stage.inputs:
+            visit(dependency)
+        seen.add(name)
+        ordered.append(stage)
+
+    visit(target)
+    return ordered
+
+
+def artifact_dir(source_key: str) -> str:
+    return os.path.join(settings.ARTIFACTS_DIR, f"v{PIPELINE_VERSION}", source_key[:2], source_key)
+
+
+def artifact_path(source_key: str, stage: Stage) -> str:
+    return os.path.join(artifact_dir(source_key), f"{stage.name}.{stage.extension}")
+
+
+def checkpoint_path(project) -> str:
+    return os.path.join(settings.ARTIFACTS_DIR, f"v{PIPELINE_VERSION}", "checkpoints", f"{project}.json")
+
+
+def _promote(temp_path: str, output_path: str):
+    """Flush a finished temporary file to disk, then rename it over its final name and persist the rename."""
+    descriptor = os.open(temp_path, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+    os.replace(temp_path, output_path)
+    if hasattr(os, "O_DIRECTORY"):
+        directory = os.open(os.path.dirname(output_path) or ".", os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+
+def _sweep_temp(pattern: str):
+    """Remove the temporary files of writers that died, i.e. untouched for ARTIFACT_TEMP_MAX_AGE_SECONDS."""
+    cutoff = time.time() - settings.ARTIFACT_TEMP_MAX_AGE_SECONDS
+    for path in glob.glob(pattern, recursive=True):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                logger.info(f"Removed abandoned temporary file {path}")
+        except FileNotFoundError:
+            pass
+
+
+def _run_stage(stage: Stage, input_paths: List[str], output_path: str):
+    # Write under a temporary name so a crash never leaves a half-written artifact behind
+    temp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        stage.run(*input_paths, temp_path)
+        _promote(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _window_key(window: Tuple[float, float]) -> str:
+    return f"{int(window[0] * 1000)}-{int(window[1] * 1000)}"
+
+
+class Checkpoint:
+    """
+    Manifest of the stages and segments one job has completed, so a retried
+    job resumes after them instead of starting over. It is rewritten
+    atomically after every step and records the size of each file; entries
+    whose file is gone or has another size are dropped when the manifest is
+    loaded, and a file with another size is redone (overwritten in place, as
+    shared artifacts may be in use by other jobs) instead of reused.
+    """
+
+    def __init__(self, path: Optional[str], source_key: str, operation_type: str):
+        self.path = path
+        self.header = {"version": PIPELINE_VERSION, "source_key": source_key, "operation_type": operation_type}
+        self.windows: Optional[List[Tuple[float, float]]] = None
+        self.stages: Dict[str, Dict] = {}
+        self.segments: Dict[str, Dict[str, Dict]] = {}
+        self.stale: Set[str] = set()
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return
+        if any(saved.get(key) != value for key, value in self.header.items()):
+            logger.info(f"Checkpoint {self.path} belongs to another pipeline run, starting over")
+            return
+        self.windows = [tuple(window) for window in saved["windows"]] if saved.get("windows") else None
+        self.stages = {name: entry for name, entry in saved.get("stages", {}).items() if self._intact(entry)}
+        for key, files in saved.get("segments", {}).items():
+            intact = {name: entry for name, entry in files.items() if self._intact(entry)}
+            if intact:
+                self.segments[key] = intact
+        if self.stages or self.segments:
+            logger.info(f"Resuming from checkpoint {self.path}: stages {list(self.stages)}, "
+                        f"{len(self.segments)} segments")
+
+    def _intact(self, entry: Dict) -> bool:
+        try:
+            size = os.path.getsize(entry["path"])
+        except (OSError, KeyError, TypeError):
+            return False
+        if size != entry.get("size"):
+            logger.warning(f"Artifact {entry['path']} is {size} bytes instead of {entry.get('size')}, redoing it")
+            self.stale.add(entry["path"])
+            return False
+        return True
+
+    def has_stage(self, name: str) -> bool:
+        return name in self.stages
+
+    def reusable(self, path: str) -> bool:
+        """Whether a file already on disk can be kept rather than made again."""
+        return os.path.exists(path) and path not in self.stale
+
+    def record_windows(self, windows: List[Tuple[float, float]]):
+        self.windows = list(windows)
+        self.save()
+
+    def record_stage(self, name: str, path: str):
+        self.stale.discard(path)
+        self.stages[name] = {"path": path, "size": os.path.getsize(path)}
+        self.save()
+
+    def record_segment(self, window: Tuple[float, float], paths: Dict[str, str]):
+        self.stale.difference_update(paths.values())
+        self.segments[_window_key(window)] = {name: {"path": path, "size": os.path.getsize(path)}
+                                             for name, path in paths.items()}
+        self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump({**self.header, "windows": self.windows, "stages": self.stages,
+                           "segments": self.segments}, f)
+            _promote(temp_path, self.path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def discard_checkpoint(project):
+    """Forget the progress of a job that finished, failed for good or was cancelled."""
+    try:
+        os.remove(checkpoint_path(project))
+    except FileNotFoundError:
+        pass
+
+
+def segment_dir(source_key: str, start: float, end: float) -> str:
+    return os.path.join(artifact_dir(source_key), "segments", _window_key((start, end)))
+
+
+def _stitch(stage: Stage, parts: List[Tuple[str, float]], output_path: str):
+    stitch = segmenter.stitch_audio if stage.extension.endswith("wav") else segmenter.stitch_subtitles
+    _run_stage(Stage(stage.name, (), stage.extension, lambda path: stitch(parts, path)), [], output_path)
+
+
+def run_segment(source_key: str, stages: List[Stage], audio_path: str, window: Tuple[float, float],
+                stale: AbstractSet[str] = frozenset()) -> Dict[str, str]:
+    """Run the segmented stages of one time window, skipping the ones already on disk unless stale."""
+    start, end = window
+    directory = segment_dir(source_key, start, end)
+    os.makedirs(directory, exist_ok=True)
+    paths = {"extract_audio": os.path.join(directory, "extract_audio.wav")}
+    if not os.path.exists(paths["extract_audio"]) or paths["extract_audio"] in stale:
+        _run_stage(Stage("cut", (), "wav", lambda path: segmenter.cut_audio(audio_path, start, end, path)),
+                   [], paths["extract_audio"])
+    for stage in stages:
+        path = os.path.join(directory, f"{stage.name}.{stage.extension}")
+        if not os.path.exists(path) or path in stale:
+            _run_stage(stage, [paths[name] for name in stage.inputs], path)
+        paths[stage.name] = path
+    return paths
+
+
+def _run_segmented(source_key: str, stages: List[Stage], paths: Dict[str, str], windows: List[Tuple[float, float]],
+                   checkpoint: Checkpoint, on_segment: Callable[[int], None]):
+    """
+    Fan the segmented stages out over SEGMENT_WORKERS threads, checkpointing
+    each finished window, then stitch each stage's outputs in order.
+    """
+    logger.info(f"Running {[stage.name for stage in stages]} for {source_key} in {len(windows)} segments")
+    results: List[Optional[Dict[str, str]]] = [None] * len(windows)
+    with ThreadPoolExecutor(max_workers=settings.SEGMENT_WORKERS, thread_name_prefix="segment") as executor:
+        futures = {
+            executor.submit(run_segment, source_key, stages, paths["extract_audio"], window,
+                            frozenset(checkpoint.stale)): index
+            for index, window in enumerate(windows)
+        }
+        try:
+            for done, future in enumerate(as_completed(futures), start=1):
+                results[futures[future]] = future.result()
+                checkpoint.record_segment(windows[futures[future]], results[futures[future]])
+                on_segment(done)
+        except BaseException:
+            # A failed segment or a cancelled job: don't start the segments still waiting,
+            # but keep the ones that made it for the retry
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+            for future, index in futures.items():
+                if future.done() and not future.cancelled() and future.exception() is None \
+                        and results[index] is None:
+                    checkpoint.record_segment(windows[index], future.result())
+            raise
+    for stage in stages:
+        output = artifact_path(source_key, stage)
+        if not checkpoint.reusable(output):
+            _stitch(stage, [(result[stage.name], start) for result, (start, _) in zip(results, windows)], output)
+        checkpoint.record_stage(stage.name, output)
+        paths[stage.name] = output
+
+
+def discard_partial(source_key: str, output_path: str):
+    """Remove the unfinished output of a stopped run and the per-segment work on its source."""
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    shutil.rmtree(os.path.join(artifact_dir(source_key), "segments"), ignore_errors=True)
+
+
+def plan_windows(audio_path: str, operation_type: str, duration: Optional[float],
+                 resolution: Optional[str]) -> List[Tuple[float, float]]:
+    duration = segmenter.audio_duration(audio_path) or duration or 0.0
+    width, height = map(int, resolution.split("x")) if resolution else (None, None)
+    target = segmenter.segment_length(operation_type, width, height)
+    if duration <= max(target, settings.SEGMENT_MIN_VIDEO_SECONDS):
+        return [(0.0, duration)]
+    return segmenter.plan_segments(duration, target, segmenter.detect_silences(audio_path))
+
+
+def run_prefix(staging_key: str, video_path: str, received: int, file_size: int, operation_type,
+               duration: float, resolution: Optional[str], done: Set[Tuple[float, float]],
+               should_stop: Callable[[], bool]) -> int:
+    """
+    Run the segmented stages on the time windows that the first `received`
+    bytes of a still uploading video fully cover. Windows are planned the way
+    run_pipeline plans them for the whole file, so once the segment outputs
+    are moved under the verified source key the final run skips them.
+
+    Args:
+        staging_key: Key the outputs are written under until the upload is verified
+        video_path: The partially written upload
+        received: Bytes of the upload on disk so far
+        file_size: Size of the complete upload
+        operation_type: ProjectType to produce
+        duration: Duration of the whole video in seconds
+        resolution: "WIDTHxHEIGHT" of the video
+        done: Windows already processed, updated in place
+        should_stop: Checked between windows
+
+    Returns:
+        Number of windows processed by this call
+    """
+    project_type = ProjectType(operation_type)
+    stages = [stage for stage in plan_stages(TARGETS[project_type]) if stage.segmented]
+    width, height = map(int, resolution.split("x")) if resolution else (None, None)
+    target = segmenter.segment_length(project_type.value, width, height)
+    if not stages or duration <= max(target, settings.SEGMENT_MIN_VIDEO_SECONDS):
+        return 0
+
+    os.makedirs(artifact_dir(staging_key), exist_ok=True)
+    audio_path = os.path.join(artifact_dir(staging_key), "prefix_audio.wav")
+    _run_stage(Stage("extract_audio_prefix", (), "wav",
+                     lambda path: translation.extract_audio_prefix(video_path, received, path)), [], audio_path)
+    covered = segmenter.audio_duration(audio_path) or duration * received / max(1, file_size)
+    windows = segmenter.plan_segments(duration, target, segmenter.detect_silences(audio_path))
+    processed = 0
+    # The last window's end depends on the final duration, so it waits for the whole file
+    for window in windows[:-1]:
+        # A cut may move by the boundary tolerance, and silences near the end of the prefix aren't final yet
+        if window[0] + target + 2 * settings.SEGMENT_BOUNDARY_TOLERANCE_SECONDS > covered or should_stop():
+            break
+        if window in done:
+            continue
+        run_segment(staging_key, stages, audio_path, window)
+        done.add(window)
+        processed += 1
+    return processed
+
+
+def adopt_segments(staging_key: str, source_key: str):
+    """Move the segment outputs made under a staging key to the source key, keeping any already there."""
+    staged = os.path.join(artifact_dir(staging_key), "segments")
+    if os.path.isdir(staged):
+        segments = os.path.join(artifact_dir(source_key), "segments")
+        os.makedirs(segments, exist_ok=True)
+        for name in os.listdir(staged):
+            destination = os.path.join(segments, name)
+            if not os.path.exists(destination):
+                os.replace(os.path.join(staged, name), destination)
+    shutil.rmtree(artifact_dir(staging_key), ignore_errors=True)
+
+
+def run_pipeline(source_key: str, video_path: str, operation_type, output_path: str,
+                 duration: Optional[float] = None, resolution: Optional[str] = None,
+                 on_progress: Optional[Callable[[str, float], None]] = None,
+                 on_stage: Optional[Callable[[str, float], None]] = None,
+                 checkpoint: Optional[str] = None) -> str:
+    """
+    Run the stages needed for a project type, reusing the shared artifacts
+    already produced for the same source video. Long videos are split into
+    time segments whose ASR, translation and TTS run in parallel.
+
+    Args:
+        source_key: Key identifying the source video (its content hash)
+        video_path: Path of the source video
+        operation_type: ProjectType to produce
+        output_path: Where the final output is written
+        duration: Duration in seconds, used when the extracted audio doesn't tell
+        resolution: "WIDTHxHEIGHT", picks the segment length with the project type
+        on_progress: Called with (stage name, percent done) as stages and segments finish;
+            raising from it stops the run at that stage boundary
+        on_stage: Called with (stage name, seconds taken) for every stage that actually ran
+        checkpoint: Path of the job's checkpoint manifest; a run that was interrupted
+            resumes after the stages and segments it records
+
+    Returns:
+        output_path
+    """
+    project_type = ProjectType(operation_type)
+    target = TARGETS[project_type]
+    os.makedirs(artifact_dir(source_key), exist_ok=True)
+    _sweep_temp(os.path.join(artifact_dir(source_key), "**", "*.tmp"))
+    _sweep_temp(f"{glob.escape(output_path)}.*.tmp")
+    progress = Checkpoint(checkpoint, source_key, project_type.value)
+
+    plan = plan_stages(target)
+    report = on_progress or (lambda stage, percent: None)
+    timed = on_stage or (lambda stage, elapsed: None)
+    paths = {SOURCE: video_path}
+    for index, stage in enumerate(plan):
+        path = artifact_path(source_key, stage) if stage.shared else output_path
+        if (stage.shared and progress.reusable(path)) or progress.has_stage(stage.name):
+            logger.info(f"Reusing {stage.name} artifact for {source_key}")
+            if not progress.has_stage(stage.name):
+                progress.record_stage(stage.name, path)
+            paths[stage.name] = path
+            report(stage.name, (index + 1) / len(plan) * 100)
+            continue
+        if stage.segmented:
+            windows = progress.windows
+            if windows is None:
+                windows = plan_windows(paths["extract_audio"], project_type.value, duration, resolution)
+                progress.record_windows(windows)
+            if len(windows) > 1:
+                # One fan-out covers every segmented stage; segment outputs already on disk are kept
+                remaining = len([s for s in plan[index:] if s.segmented])
+                started = time.monotonic()
+                _run_segmented(
+                    source_key, [s for s in plan if s.segmented], paths, windows, progress,
+                    lambda done: report(stage.name, (index + remaining * done / len(windows)) / len(plan) * 100)
+                )
+                timed("+".join(s.name for s in plan[index:] if s.segmented), time.monotonic() - started)
+                continue
+        logger.info(f"Running stage {stage.name} for {source_key}")
+        report(stage.name, index / len(plan) * 100)
+        started = time.monotonic()
+        _run_stage(stage, [paths[name] for name in stage.inputs], path)
+        timed(stage.name, time.monotonic() - started)
+        progress.record_stage(stage.name, path)
+        paths[stage.name] = path
+        report(stage.name, (index + 1) / len(plan) * 100)
+    return output_path
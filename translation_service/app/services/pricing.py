@@ -13,8 +13,17 @@ def initiate_prices():
 
 initiate_prices()
 
-def calculate_price(option_id, width, height, duration):
-    minutes = max(1, math.ceil(duration / 60))  # Convert to minutes
+# Processing tiers: rank orders the job queue, multiplier scales the price
+TIERS = {}
+
+def initiate_tiers():
+    TIERS["express"] = {"rank": 0, "multiplier": 1.5}
+    TIERS["standard"] = {"rank": 1, "multiplier": 1.0}
+    TIERS["off_peak"] = {"rank": 2, "multiplier": 0.7}
+
+initiate_tiers()
+
+def resolution_class(width, height):
     multiplier = 1.0
     if height * width > (3840 * 2160):  # 4K
         multiplier = 4.0
@@ -30,8 +39,13 @@ def calculate_price(option_id, width, height, duration):
         video_type = 'HD'
     else:
         video_type = 'SD'  # Standard Definition for lower resolutions
+    return multiplier, video_type
+
+def calculate_price(option_id, width, height, duration, tier="standard"):
+    minutes = max(1, math.ceil(duration / 60))  # Convert to minutes
+    multiplier, video_type = resolution_class(width, height)
 
-    price = math.ceil(minutes * PRICING[option_id] * multiplier)
+    price = math.ceil(minutes * PRICING[option_id] * multiplier * TIERS[tier]["multiplier"])
     return price, multiplier, video_type
 
 def calculate_prices(width, height, duration):
@@ -40,7 +54,8 @@ def calculate_prices(width, height, duration):
             'price': calculate_price(op, width, height, duration)[0],
             'multiplier': calculate_price(op, width, height, duration)[1],
             'cost_per_minute': calculate_price(op, width, height, duration)[0] / max(1, math.ceil(duration / 60)),
-            'video_type': calculate_price(op, width, height, duration)[2]
+            'video_type': calculate_price(op, width, height, duration)[2],
+            'tiers': {tier: calculate_price(op, width, height, duration, tier)[0] for tier in TIERS}
         }
         for op in PRICING
     }
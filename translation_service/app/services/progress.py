@@ -0,0 +1,53 @@
+import time
+import logging
+import threading
+from typing import Callable, Dict, Optional
+from sqlalchemy import update
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.project import Project
+
+logger = logging.getLogger(__name__)
+
+# Where workers publish job events; the worker pool points it at its relay to the API process
+_reporter: Optional[Callable[[Dict], None]] = None
+# project_id -> (monotonic time of the last DB write, progress written)
+_last_writes: Dict[int, tuple] = {}
+_lock = threading.Lock()
+
+
+def use_reporter(report: Callable[[Dict], None]):
+    global _reporter
+    _reporter = report
+
+
+def report_progress(project_id: int, stage: str, progress: float):
+    """
+    Publish a worker's progress on a project. Every call goes to the progress
+    channel (relayed to the logs WebSocket); the projects table is only
+    written once per PROGRESS_DB_WRITE_INTERVAL seconds per project.
+    """
+    progress = round(min(100.0, max(0.0, progress)), 1)
+    if _reporter is not None:
+        _reporter({"type": "job_progress", "project_id": project_id, "stage": stage, "progress": progress})
+
+    now = time.monotonic()
+    with _lock:
+        last = _last_writes.get(project_id)
+        if last is not None and (now - last[0] < settings.PROGRESS_DB_WRITE_INTERVAL or progress <= last[1]):
+            return
+        _last_writes[project_id] = (now, progress)
+    db = SessionLocal()
+    try:
+        db.execute(update(Project).where(Project.id == project_id).values(progress=progress))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Could not store progress of project {project_id}: {e}")
+    finally:
+        db.close()
+
+
+def forget_progress(project_id: int):
+    with _lock:
+        _last_writes.pop(project_id, None)
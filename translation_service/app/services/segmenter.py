@@ -0,0 +1,153 @@
+import re
+import wave
+from array import array
+from typing import List, Optional, Tuple
+from app.core.config import settings
+from app.services.pricing import resolution_class
+
+SRT_TIMESTAMP = re.compile(r"(\d{2}):(\d{2}):(\d{2}),(\d{3})")
+
+
+def segment_length(project_type: str, width: Optional[int], height: Optional[int]) -> float:
+    """
+    Target segment length for a project, from SEGMENT_SECONDS (per project type)
+    scaled by SEGMENT_RESOLUTION_FACTORS (per resolution class of calculate_price).
+    """
+    seconds = settings.SEGMENT_SECONDS.get(project_type, settings.SEGMENT_DEFAULT_SECONDS)
+    if width and height:
+        _, video_type = resolution_class(width, height)
+        seconds *= settings.SEGMENT_RESOLUTION_FACTORS.get(video_type, 1.0)
+    return max(seconds, 1.0)
+
+
+def plan_segments(duration: float, target: float, boundaries: List[float]) -> List[Tuple[float, float]]:
+    """
+    Split [0, duration] into windows of about `target` seconds, cutting on the
+    safe boundary closest to each ideal cut point when one is within
+    SEGMENT_BOUNDARY_TOLERANCE_SECONDS.
+
+    Args:
+        duration: Length of the media in seconds
+        target: Desired segment length in seconds
+        boundaries: Sorted timestamps where cutting is safe (silences)
+
+    Returns:
+        List of (start, end) windows covering the whole media
+    """
+    if duration <= max(target, settings.SEGMENT_MIN_VIDEO_SECONDS):
+        return [(0.0, duration)]
+
+    cuts = []
+    position = 0.0
+    # Let the last window grow up to 1.5x the target rather than leaving a tiny tail
+    while duration - position > target * 1.5:
+        ideal = position + target
+        near = [b for b in boundaries
+                if position < b < duration and abs(b - ideal) <= settings.SEGMENT_BOUNDARY_TOLERANCE_SECONDS]
+        cut = min(near, key=lambda b: abs(b - ideal)) if near else ideal
+        cuts.append(cut)
+        position = cut
+    return list(zip([0.0] + cuts, cuts + [duration]))
+
+
+def audio_duration(audio_path: str) -> Optional[float]:
+    try:
+        with wave.open(audio_path, "rb") as audio:
+            return audio.getnframes() / audio.getframerate()
+    except (wave.Error, EOFError):
+        return None
+
+
+def detect_silences(audio_path: str, window: float = 0.1, min_silence: float = 0.3) -> List[float]:
+    """
+    Find the midpoints of silent stretches in a 16-bit PCM WAV, used as safe cut points.
+
+    Args:
+        audio_path: Path of the extracted audio
+        window: Analysis window in seconds
+        min_silence: Minimum silence length in seconds
+
+    Returns:
+        Sorted list of timestamps in seconds
+    """
+    try:
+        audio = wave.open(audio_path, "rb")
+    except (wave.Error, EOFError):
+        return []
+    with audio:
+        if audio.getsampwidth() != 2:
+            return []
+        frames_per_window = max(1, int(audio.getframerate() * window))
+        threshold = settings.SEGMENT_SILENCE_THRESHOLD
+        silences = []
+        run_start = None
+        index = 0
+        while True:
+            data = audio.readframes(frames_per_window)
+            if not data:
+                break
+            samples = array("h", data)
+            quiet = max(samples) < threshold and -min(samples) < threshold
+            if quiet and run_start is None:
+                run_start = index
+            elif not quiet and run_start is not None:
+                if (index - run_start) * window >= min_silence:
+                    silences.append((run_start + index) / 2 * window)
+                run_start = None
+            index += 1
+        return silences
+
+
+def cut_audio(audio_path: str, start: float, end: float, output_path: str):
+    with wave.open(audio_path, "rb") as source, wave.open(output_path, "wb") as target:
+        target.setparams(source.getparams())
+        rate = source.getframerate()
+        first = min(int(start * rate), source.getnframes())
+        source.setpos(first)
+        target.writeframes(source.readframes(max(0, int(end * rate) - first)))
+
+
+def stitch_audio(parts: List[Tuple[str, float]], output_path: str):
+    """Concatenate per-segment WAVs, padding with silence so each one starts at its segment offset."""
+    with wave.open(parts[0][0], "rb") as first:
+        params = first.getparams()
+    frame_size = params.sampwidth * params.nchannels
+    with wave.open(output_path, "wb") as target:
+        target.setparams(params)
+        written = 0
+        for path, offset in parts:
+            gap = int(offset * params.framerate) - written
+            if gap > 0:
+                target.writeframes(b"\0" * gap * frame_size)
+                written += gap
+            with wave.open(path, "rb") as source:
+                frames = source.readframes(source.getnframes())
+            target.writeframes(frames)
+            written += len(frames) // frame_size
+
+
+def _shift_timestamp(match, offset_ms: int) -> str:
+    hours, minutes, seconds, millis = map(int, match.groups())
+    total = ((hours * 60 + minutes) * 60 + seconds) * 1000 + millis + offset_ms
+    hours, total = divmod(total, 3600000)
+    minutes, total = divmod(total, 60000)
+    seconds, millis = divmod(total, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{millis:03d}"
+
+
+def stitch_subtitles(parts: List[Tuple[str, float]], output_path: str):
+    """Merge per-segment SRT files into one, shifting cue times by each segment's offset and renumbering."""
+    cues = []
+    for path, offset in parts:
+        offset_ms = int(round(offset * 1000))
+        with open(path, encoding="utf-8") as f:
+            blocks = re.split(r"\n\s*\n", f.read().strip())
+        for block in blocks:
+            lines = block.strip().splitlines()
+            if len(lines) < 2 or "-->" not in lines[1]:
+                continue
+            timing = SRT_TIMESTAMP.sub(lambda m: _shift_timestamp(m, offset_ms), lines[1])
+            cues.append([timing] + lines[2:])
+    with open(output_path, "w", encoding="utf-8") as f:
+        for number, cue in enumerate(cues, start=1):
+            f.write(f"{number}\n" + "\n".join(cue) + "\n\n")
@@ -1,73 +1,139 @@
-import asyncio
 import os
-from datetime import datetime
-import uuid
-from fastapi import Depends
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 import logging
 from app.models.project import Project, ProjectStatus
-from app.core.database import get_db, SessionLocal
-from app.services.translation import translate_video
+from app.models.job import TranslationJob, JobStatus
+from app.core.database import SessionLocal
+from app.services.translation import translate_video, translated_path
+from app.services.pipeline import discard_partial, discard_checkpoint
+from app.services.job_queue import enqueue_job, notify_workers, raise_if_cancelled, JobCancelled, JobInterrupted
+from app.services.progress import report_progress, forget_progress
+from app.services.eta import record_stage_timings
+from app.services.output_cache import store_output
+from app.core.content_store import prune_store
 from app.core.config import settings
-from concurrent.futures import ThreadPoolExecutor
 
-executor = ThreadPoolExecutor(max_workers=1)
+logger = logging.getLogger(__name__)
 
 
-def process_video_translation(project_id: int):
+def process_video_translation(project_id: int) -> str:
+    """
+    Run the translation of one project and return the path of its output.
+    Status transitions are driven by the job queue; the output is only
+    cached (see cache_translation) once the job is confirmed completed.
+    """
     db = SessionLocal()
     try:
         with db.begin():
             print(f"Starting video translation process for project_id: {project_id}")
             project = db.query(Project).filter(Project.id == project_id).first()
             if not project:
-                logging.error(f"Project {project_id} not found")
-                print(f"Error: Project {project_id} not found in database")
-                return
+                raise ValueError(f"Project {project_id} not found")
             print(f"Found project: ID={project.id}, Type={project.type}, Video_ID={project.video_id}")
 
-            project.status = ProjectStatus.processing
-            project.progress = 10.0
-            print(f"Updated project status to {project.status}, progress to {project.progress}%")
-
-            print("Committed initial project status to database")
-
             video_path = os.path.join(settings.UPLOAD_DIR, project.video_id)
             print(f"Constructed video path: {video_path}")
             project_type = project.type
+            content_hash = project.content_hash
+            source_key = content_hash or f"video-{project.video_id}"
+            duration = project.duration
+            resolution = project.resolution
             print(f"Project type: {project_type}")
 
-            result_path = translate_video(
-                project=project,
-                video_path=video_path,
-                operation_type=project_type,
-            )
-            print(f"Video translation completed, result path: {result_path}")
-
-            project.status = ProjectStatus.completed
-            project.progress = 100.0
-            project.completed_at = datetime.utcnow()
-            project.download_token = str(uuid.uuid4())
-            print(f"Updated project: status={project.status}, progress={project.progress}%, "
-                  f"completed_at={project.completed_at}, download_token={project.download_token}")
+        forget_progress(project_id)
+        timings = []
 
-            translated_path = os.path.join(settings.TRANSLATED_DIR, f"{project.id}_translated.{video_path.split('.')[-1]}")
-            print(f"Creating translated file at: {translated_path}")
-            open(translated_path, "a").close()  # Placeholder, replace with actual translation output
-            print(f"Created placeholder file at: {translated_path}")
+        def on_progress(stage, progress):
+            # Stage boundaries are where a cancelled or interrupted job stops
+            raise_if_cancelled(project_id)
+            report_progress(project_id, stage, progress)
 
-            print("Committed final project status to database")
+        result_path = translate_video(
+            project=project_id,
+            video_path=video_path,
+            operation_type=project_type,
+            source_key=source_key,
+            duration=duration,
+            resolution=resolution,
+            on_progress=on_progress,
+            on_stage=lambda stage, elapsed: timings.append((stage, elapsed)),
+        )
+        record_stage_timings(project_id, project_type, duration, resolution, timings)
+        print(f"Video translation completed, result path: {result_path}")
+        return result_path
 
+    except JobCancelled:
+        logger.info(f"Translation of project {project_id} was cancelled, discarding its partial output")
+        discard_cancelled_output(project_id)
+        raise
+    except JobInterrupted:
+        logger.info(f"Translation of project {project_id} was interrupted, keeping its checkpoint")
+        raise
     except Exception as e:
         print(f"Error occurred during video translation: {str(e)}")
         logging.error(f"Error in process_video_translation for project {project_id}: {str(e)}")
         raise
+    finally:
+        db.close()
+
+
+def cache_translation(project_id: int, result_path: str):
+    """Keep the output of a completed project for later projects on the same video."""
+    db = SessionLocal()
+    try:
+        content_hash, project_type = db.query(Project.content_hash, Project.type) \
+            .filter(Project.id == project_id).one()
+    finally:
+        db.close()
+    if content_hash:
+        store_output(content_hash, project_type, result_path)
 
-def add_to_executor(project_id: int):
-    future = executor.submit(process_video_translation , project_id)
-    if future.running():
-        return {"status": "Task is being processed"}
-    elif future._state == 'PENDING':
-        return {"status": "Task is in the queue"}
+
+def prune_content_store() -> int:
+    """Remove the stored uploads of videos no project refers to any more. Returns how many went."""
+    db = SessionLocal()
+    try:
+        referenced = {content_hash for (content_hash,) in
+                      db.query(Project.content_hash).filter(Project.content_hash.isnot(None)).distinct()}
+    finally:
+        db.close()
+    return prune_store(referenced)
+
+
+def discard_cancelled_output(project_id: int):
+    """
+    Delete what a cancelled job produced, keeping segment work another live job
+    on the same video still uses. Does nothing unless the job is cancelled: a
+    job that was reaped belongs to the worker that took it over, files included.
+    """
+    db = SessionLocal()
+    try:
+        project, status = db.query(Project, TranslationJob.status) \
+            .join(TranslationJob, TranslationJob.project_id == Project.id) \
+            .filter(Project.id == project_id).one()
+        if status != JobStatus.cancelled:
+            return
+        video_path = os.path.join(settings.UPLOAD_DIR, project.video_id)
+        source_key = project.content_hash or f"video-{project.video_id}"
+        shared = db.query(TranslationJob.id).join(Project, TranslationJob.project_id == Project.id).filter(
+            Project.content_hash == source_key,
+            Project.id != project_id,
+            TranslationJob.status.in_([JobStatus.queued, JobStatus.running])
+        ).first()
+    finally:
+        db.close()
+    discard_checkpoint(project_id)
+    output_path = translated_path(project_id, video_path)
+    if shared:
+        if os.path.exists(output_path):
+            os.remove(output_path)
     else:
-        return {"status": "Task status unknown"}
\ No newline at end of file
+        discard_partial(source_key, output_path)
+
+
+def add_to_executor(project_id: int, db: Session):
+    """Queue the project's job in the caller's transaction; workers are woken once it commits."""
+    enqueue_job(db, project_id)
+    event.listen(db, "after_commit", lambda session: notify_workers(), once=True)
+    return {"status": "Task is in the queue"}
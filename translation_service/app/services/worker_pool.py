@@ -0,0 +1,285 @@
+import time
+import signal
+import logging
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+from app.core.config import settings
+from app.models.job import JobStatus
+from app.services.progress import use_reporter, forget_progress
+from app.services.pipeline import discard_checkpoint
+from app.services.job_queue import (
+    claim_job, complete_job, fail_job, release_job, renew_lease, recover_jobs, release_worker_jobs,
+    interrupt_job, forget_interrupt, poll_job_events, reap_stale_jobs, worker_id, wait_for_jobs, use_wake_event,
+    notify_workers, HOSTNAME, JobCancelled, JobInterrupted
+)
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_BACKENDS = ("thread", "process", "external")
+
+# Callbacks run in the API process for every job event, whichever backend produced it
+_job_listeners: List[Callable[[Dict], None]] = []
+
+
+def add_job_listener(listener: Callable[[Dict], None]):
+    _job_listeners.append(listener)
+
+
+def dispatch_job_event(job_event: Dict):
+    for listener in _job_listeners:
+        try:
+            listener(job_event)
+        except Exception as e:
+            logger.error(f"Job listener failed for {job_event}: {e}")
+
+
+@contextmanager
+def _holding_lease(job, owner: str, stop_event):
+    """
+    Renew the lease on a running job every JOB_HEARTBEAT_SECONDS. The job is
+    interrupted at its next stage boundary when the lease is lost or the
+    worker is asked to stop.
+    """
+    finished = threading.Event()
+
+    def heartbeat():
+        renewed = time.monotonic()
+        while not finished.wait(1):
+            if stop_event.is_set():
+                interrupt_job(job.project_id)
+                return
+            if time.monotonic() - renewed < settings.JOB_HEARTBEAT_SECONDS:
+                continue
+            renewed = time.monotonic()
+            try:
+                held = renew_lease(job.id, owner)
+            except Exception as e:
+                # The lease is long enough to survive a missed beat or two
+                logger.error(f"Could not renew the lease on job {job.id}: {e}")
+                continue
+            if not held:
+                logger.warning(f"Worker {owner} lost its lease on job {job.id}")
+                interrupt_job(job.project_id)
+                return
+
+    thread = threading.Thread(target=heartbeat, name=f"heartbeat-{job.id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        finished.set()
+        thread.join()
+        forget_interrupt(job.project_id)
+
+
+def run_worker(name: str, stop_event, report: Callable[[Dict], None]):
+    """Claim and run jobs until `stop_event` is set. Used by every backend, including app.worker."""
+    from app.services.videos import process_video_translation, cache_translation, discard_cancelled_output
+
+    owner = worker_id(name)
+    use_reporter(report)
+    while not stop_event.is_set():
+        try:
+            job = claim_job(owner)
+        except Exception as e:
+            logger.error(f"Worker {owner} could not claim a job: {e}")
+            job = None
+        if job is None:
+            wait_for_jobs(settings.JOB_POLL_INTERVAL_SECONDS)
+            continue
+        report({"type": "job_started", "job_id": job.id, "project_id": job.project_id, "worker": owner})
+        try:
+            with _holding_lease(job, owner, stop_event):
+                result_path = process_video_translation(job.project_id)
+        except JobCancelled:
+            # Already settled and announced by the cancel request
+            logger.info(f"Worker {owner} stopped cancelled job {job.id}")
+        except JobInterrupted:
+            # Not the job's fault: hand it back (unless someone else holds it now) with its checkpoint intact
+            if release_job(job.id, owner):
+                logger.info(f"Worker {owner} released job {job.id}")
+                report({"type": "job_released", "job_id": job.id, "project_id": job.project_id})
+        except Exception as e:
+            status = fail_job(job.id, owner, str(e))
+            if status == JobStatus.failed:
+                discard_checkpoint(job.project_id)
+            report({"type": "job_failed", "job_id": job.id, "project_id": job.project_id, "error": str(e),
+                    "status": status.value if status else None})
+        else:
+            if complete_job(job.id, owner):
+                discard_checkpoint(job.project_id)
+                cache_translation(job.project_id, result_path)
+                report({"type": "job_succeeded", "job_id": job.id, "project_id": job.project_id})
+            else:
+                # Cancelled (and refunded) after the last stage check, or reaped and taken over
+                logger.warning(f"Worker {owner} finished job {job.id} after losing it, not reporting success")
+                discard_cancelled_output(job.project_id)
+        forget_progress(job.project_id)
+
+
+def _process_worker_main(name: str, wake_event, stop_event, events):
+    # The parent handles Ctrl+C and asks workers to stop through stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from app.core.database import engine
+
+    use_wake_event(wake_event)
+    try:
+        run_worker(name, stop_event, events.put)
+    finally:
+        engine.dispose()
+
+
+class WorkerPool:
+    """
+    Runs TRANSLATION_WORKERS job workers with the configured backend:
+    threads inside the API process, separate processes (each with its
+    own database engine, supervised and restarted if they crash), or
+    nothing at all when workers run externally via app.worker. With every
+    backend a reaper settles jobs whose worker stopped sending heartbeats,
+    and a pruner drops stored uploads no project refers to.
+    """
+
+    def __init__(self, backend: str, workers: int):
+        if backend not in EXECUTION_BACKENDS:
+            raise ValueError(f"Invalid execution backend: {backend}")
+        self.backend = backend
+        self.workers = max(1, workers)
+        self._context = multiprocessing.get_context("spawn")
+        self._threads: List[threading.Thread] = []
+        self._processes: Dict[str, multiprocessing.Process] = {}
+        self._stop_event = None
+        self._events = None
+
+    def start(self):
+        if self.backend == "external":
+            logger.info("Translation workers run externally, none started in the API process")
+            self._stop_event = threading.Event()
+            self._start_thread("watcher", self._watch_external)
+            self._start_thread("reaper", self._reap)
+            self._start_thread("store-pruner", self._prune_store)
+            return
+        recover_jobs()
+        if self.backend == "thread":
+            self._stop_event = threading.Event()
+            for index in range(self.workers):
+                self._start_thread(f"thread-{index}", self._run_thread_worker)
+            self._start_thread("reaper", self._reap)
+            self._start_thread("store-pruner", self._prune_store)
+        else:
+            self._stop_event = self._context.Event()
+            wake_event = self._context.Event()
+            use_wake_event(wake_event)
+            self._events = self._context.Queue()
+            for index in range(self.workers):
+                self._spawn(f"process-{index}", wake_event)
+            self._start_thread("relay", self._relay_events)
+            self._start_thread("supervisor", self._supervise, wake_event)
+            self._start_thread("reaper", self._reap)
+            self._start_thread("store-pruner", self._prune_store)
+
+    def _start_thread(self, name: str, target, *args):
+        thread = threading.Thread(target=target, args=(name, *args), name=f"translation-{name}", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _run_thread_worker(self, name: str):
+        run_worker(name, self._stop_event, dispatch_job_event)
+
+    def _spawn(self, name: str, wake_event):
+        process = self._context.Process(
+            target=_process_worker_main,
+            args=(name, wake_event, self._stop_event, self._events),
+            name=f"translation-{name}",
+            daemon=True
+        )
+        process.start()
+        self._processes[name] = process
+
+    def _relay_events(self, name: str):
+        while not self._stop_event.is_set():
+            try:
+                job_event = self._events.get(timeout=1)
+            except Exception:
+                continue
+            dispatch_job_event(job_event)
+
+    def _watch_external(self, name: str):
+        # app.worker processes can't reach this one, so their job events are read back from the database
+        seen: Dict[int, tuple] = {}
+        window = settings.JOB_POLL_INTERVAL_SECONDS + settings.JOB_HEARTBEAT_SECONDS
+        while not self._stop_event.wait(settings.JOB_POLL_INTERVAL_SECONDS):
+            try:
+                for job_event in poll_job_events(seen, window):
+                    dispatch_job_event(job_event)
+            except Exception as e:
+                logger.error(f"Could not poll job events: {e}")
+
+    def _reap(self, name: str):
+        # Catches what the supervisor can't see: dead threads, workers on other hosts, a killed API process
+        while not self._stop_event.wait(settings.JOB_REAPER_INTERVAL_SECONDS):
+            try:
+                reaped = reap_stale_jobs()
+            except Exception as e:
+                logger.error(f"Could not reap stale jobs: {e}")
+                continue
+            if reaped:
+                notify_workers()
+            if self.backend != "external":
+                # External mode picks these up through _watch_external
+                for job_event in reaped:
+                    dispatch_job_event(job_event)
+
+    def _prune_store(self, name: str):
+        from app.services.videos import prune_content_store
+        while not self._stop_event.wait(settings.CONTENT_STORE_PRUNE_INTERVAL_SECONDS):
+            try:
+                removed = prune_content_store()
+            except Exception as e:
+                logger.error(f"Could not prune the content store: {e}")
+                continue
+            if removed:
+                logger.info(f"Removed {removed} unreferenced uploads from the content store")
+
+    def _supervise(self, name: str, wake_event):
+        while not self._stop_event.wait(1):
+            for worker_name, process in list(self._processes.items()):
+                if process.is_alive():
+                    continue
+                logger.error(f"Worker process {worker_name} (pid {process.pid}) died with exit code {process.exitcode}")
+                released = release_worker_jobs(
+                    f"{HOSTNAME}:{process.pid}:",
+                    f"Worker process exited with code {process.exitcode}"
+                )
+                if released:
+                    notify_workers()
+                self._spawn(worker_name, wake_event)
+
+    def stop(self, timeout: float = 10.0):
+        if self._stop_event is None:
+            return
+        self._stop_event.set()
+        notify_workers()
+        for process in self._processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._processes.clear()
+        self._threads.clear()
+
+
+pool: Optional[WorkerPool] = None
+
+
+def start_workers():
+    global pool
+    pool = WorkerPool(settings.EXECUTION_BACKEND, settings.TRANSLATION_WORKERS)
+    pool.start()
+
+
+def stop_workers(timeout: float = 10.0):
+    if pool is not None:
+        pool.stop(timeout)
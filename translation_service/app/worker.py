@@ -0,0 +1,74 @@
+"""
+Standalone translation worker, so processing scales apart from the API:
+
+    python -m app.worker --workers 4
+
+Run the API nodes with EXECUTION_BACKEND=external so they only enqueue jobs.
+Any number of worker nodes can share the database: each job is claimed under
+a lease that its worker renews every JOB_HEARTBEAT_SECONDS. When the
+heartbeats stop (the node died), the API's reaper requeues the job and
+another worker resumes it from its checkpoint. SIGINT or SIGTERM stops
+claiming and hands running jobs back at their next stage boundary; a
+second signal exits at once.
+"""
+import os
+import signal
+import logging
+import argparse
+import threading
+from typing import Dict
+from app.core.config import settings
+from app.core.database import engine
+from app.services.worker_pool import run_worker
+from app.services.job_queue import notify_workers, worker_id
+
+logger = logging.getLogger("app.worker")
+
+
+def _log_event(job_event: Dict):
+    # The API nodes read job events back from the database (see WorkerPool._watch_external)
+    logger.info(f"{job_event['type']} project={job_event['project_id']}"
+                + (f" progress={job_event['progress']}" if "progress" in job_event else "")
+                + (f" error={job_event['error']}" if job_event.get("error") else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run translation workers against the shared database.")
+    parser.add_argument("--workers", type=int, default=settings.TRANSLATION_WORKERS,
+                        help="Jobs to run at once (default: TRANSLATION_WORKERS)")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+                        force=True)
+
+    stop_event = threading.Event()
+
+    def stop(signum, frame):
+        if stop_event.is_set():
+            logger.warning("Exiting without waiting for running jobs; their leases will expire")
+            os._exit(1)
+        logger.info("Stopping: releasing running jobs at their next stage boundary")
+        stop_event.set()
+        notify_workers()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    threads = [
+        threading.Thread(target=run_worker, args=(f"worker-{index}", stop_event, _log_event),
+                         name=f"translation-worker-{index}")
+        for index in range(max(1, args.workers))
+    ]
+    logger.info(f"Starting {len(threads)} translation workers as {worker_id('*')}")
+    for thread in threads:
+        thread.start()
+    # Joining with a timeout keeps the main thread responsive to signals
+    while any(thread.is_alive() for thread in threads):
+        for thread in threads:
+            thread.join(1)
+    engine.dispose()
+    logger.info("All translation workers stopped")
+
+
+if __name__ == "__main__":
+    main()
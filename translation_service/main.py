@@ -1,7 +1,12 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.database import engine, Base
+from app.core.schema import upgrade_schema
 from app.api.v1.api import api_router
+from app.services.worker_pool import start_workers, stop_workers, add_job_listener
+from app.core.websocket_manager import manager
 from app.middlewares.ws_middleware import WSMiddleware
 from app.services.error_handlers import (
     validation_exception_handler,
@@ -15,11 +20,24 @@ from sqlalchemy.exc import SQLAlchemyError
 
 # ایجاد جداول دیتابیس در صورت عدم وجود
 Base.metadata.create_all(bind=engine)
+# افزودن ستون‌ها و ایندکس‌های جدید به جداول موجود
+upgrade_schema(engine, Base.metadata)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ارسال پیشرفت ورکرها به سوکت‌های لاگ
+    manager.bind_loop(asyncio.get_running_loop())
+    add_job_listener(manager.relay_job_event)
+    # بازیابی کارهای صف‌شده پس از ری‌استارت و راه‌اندازی ورکرها
+    start_workers()
+    yield
+    stop_workers()
 
 app = FastAPI(
     title="Translation Service API",
     description="API for a video Capati service platform.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # تنظیمات CORS برای اتصال از فرانت‌اند
@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+# Settings are read at import time, so point every directory and the database
+# at a scratch location before any test module imports app.*
+_scratch = tempfile.mkdtemp(prefix="translation-service-tests-")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_scratch, 'test.db')}")
+os.environ.setdefault("SMTP_PORT", "587")
+for name in ("SESSIONS_DIR", "WS_LOG_DIR", "UPLOAD_DIR", "URL_STORAGE_DIR", "TRANSLATED_DIR",
+             "CONTENT_STORE_DIR", "ARTIFACTS_DIR", "OUTPUT_CACHE_DIR"):
+    os.environ.setdefault(name, os.path.join(_scratch, name.lower()))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,118 @@
+import os
+import errno
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from app.core.config import settings
+from app.core.content_store import link_or_copy, prune_store
+
+
+class TestLinkOrCopy(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.destination = os.path.join(self.directory, "destination")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _source(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def _leftovers(self):
+        return [name for name in os.listdir(self.directory) if name.endswith(".tmp")]
+
+    def test_hardlinks_when_possible(self):
+        source = self._source("source", b"video")
+        link_or_copy(source, self.destination)
+        self.assertTrue(os.path.samefile(source, self.destination))
+
+    def test_copies_across_filesystems(self):
+        source = self._source("source", b"video")
+        with patch("os.link", side_effect=OSError(errno.EXDEV, "cross-device link")):
+            link_or_copy(source, self.destination)
+        self.assertFalse(os.path.samefile(source, self.destination))
+        with open(self.destination, "rb") as f:
+            self.assertEqual(f.read(), b"video")
+
+    def test_other_link_errors_propagate_without_leftovers(self):
+        source = self._source("source", b"video")
+        with patch("os.link", side_effect=OSError(errno.EIO, "I/O error")):
+            with self.assertRaises(OSError):
+                link_or_copy(source, self.destination)
+        self.assertFalse(os.path.exists(self.destination))
+        self.assertEqual(self._leftovers(), [])
+
+    def test_concurrent_calls_never_rewrite_a_source(self):
+        """Racing links to one destination must each replace it, never write into another call's file."""
+        contents = {f"source-{index}": bytes([index]) * 4096 for index in range(8)}
+        sources = {name: self._source(name, content) for name, content in contents.items()}
+        errors = []
+
+        def link_repeatedly(source):
+            try:
+                for _ in range(50):
+                    link_or_copy(source, self.destination)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=link_repeatedly, args=(path,)) for path in sources.values()]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        for name, path in sources.items():
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), contents[name])
+        with open(self.destination, "rb") as f:
+            self.assertIn(f.read(), contents.values())
+        self.assertEqual(self._leftovers(), [])
+
+
+class TestPruneStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        patcher = patch.object(settings, "CONTENT_STORE_DIR", self.directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _store(self, content_hash, age):
+        path = os.path.join(self.directory, content_hash[:2], content_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"video")
+        mtime = os.path.getmtime(path) - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_removes_only_old_unreferenced_entries(self):
+        old_age = settings.CONTENT_STORE_MIN_AGE_SECONDS + 60
+        referenced = self._store("a" * 64, old_age)
+        orphaned = self._store("b" * 64, old_age)
+        finalizing = self._store("c" * 64, 0)
+        self.assertEqual(prune_store({"a" * 64}), 1)
+        self.assertTrue(os.path.exists(referenced))
+        self.assertFalse(os.path.exists(orphaned))
+        self.assertTrue(os.path.exists(finalizing))
+
+    def test_ignores_files_that_are_not_entries(self):
+        path = os.path.join(self.directory, "aa", "aa.tmp")
+        os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as f:
+            f.write(b"partial")
+        os.utime(path, (0, 0))
+        self.assertEqual(prune_store(set()), 0)
+        self.assertTrue(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
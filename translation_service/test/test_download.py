@@ -0,0 +1,36 @@
+import unittest
+from app.services.download import parse_byte_range
+
+
+class TestParseByteRange(unittest.TestCase):
+    def test_closed_range(self):
+        self.assertEqual(parse_byte_range("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(parse_byte_range("bytes=900-2000", 1000), (900, 999))
+
+    def test_open_ended_range(self):
+        self.assertEqual(parse_byte_range("bytes=500-", 1000), (500, 999))
+        self.assertEqual(parse_byte_range("bytes=999-", 1000), (999, 999))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_byte_range("bytes=-100", 1000), (900, 999))
+        self.assertEqual(parse_byte_range("bytes=-5000", 1000), (0, 999))
+
+    def test_multi_range_is_ignored(self):
+        self.assertIsNone(parse_byte_range("bytes=0-99,200-299", 1000))
+
+    def test_malformed_headers_are_ignored(self):
+        for header in ("items=0-99", "bytes=", "bytes=100", "bytes=a-b", "bytes=200-100"):
+            self.assertIsNone(parse_byte_range(header, 1000), header)
+
+    def test_unsatisfiable_ranges(self):
+        self.assertEqual(parse_byte_range("bytes=1000-", 1000), "unsatisfiable")
+        self.assertEqual(parse_byte_range("bytes=1000-1999", 1000), "unsatisfiable")
+        self.assertEqual(parse_byte_range("bytes=-0", 1000), "unsatisfiable")
+
+    def test_every_range_of_an_empty_file_is_unsatisfiable(self):
+        for header in ("bytes=0-", "bytes=0-0", "bytes=-1", "bytes=-100"):
+            self.assertEqual(parse_byte_range(header, 0), "unsatisfiable", header)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import threading
+import unittest
+from unittest.mock import patch
+from app.core.config import settings
+from app.services import early_start
+
+
+class TestAdopt(unittest.TestCase):
+    def setUp(self):
+        self.session = {"project_id": 1, "file_path": "/nonexistent.mp4", "file_size": 10 * settings.EARLY_START_STEP_BYTES,
+                        "file_extension": "mp4", "streams": 1}
+        self.release = threading.Event()
+        self.scanning = threading.Event()
+        self.adopted = []
+
+    def _scan(self, upload_id, upload, received):
+        self.scanning.set()
+        self.release.wait(5)
+
+    def _adopt_segments(self, staging_key, source_key):
+        self.adopted.append((staging_key, source_key, threading.current_thread().name))
+
+    def test_returns_at_once_while_a_pass_runs(self):
+        with patch.object(early_start, "_scan", self._scan), \
+                patch.object(early_start, "adopt_segments", self._adopt_segments):
+            early_start.advance("running", self.session, settings.EARLY_START_STEP_BYTES)
+            self.assertTrue(self.scanning.wait(5))
+            adoption = early_start.adopt("running", "hash")
+            self.assertFalse(adoption.done())
+            self.release.set()
+            adoption.result(5)
+        self.assertEqual(len(self.adopted), 1)
+        staging_key, source_key, thread = self.adopted[0]
+        self.assertEqual((staging_key, source_key), (early_start.staging_key("running"), "hash"))
+        self.assertTrue(thread.startswith("early-start"))
+
+    def test_adopts_right_away_without_a_pass(self):
+        with patch.object(early_start, "adopt_segments", self._adopt_segments):
+            adoption = early_start.adopt("idle", "hash")
+        self.assertTrue(adoption.done())
+        self.assertIsNone(adoption.result())
+        self.assertEqual(len(self.adopted), 1)
+
+    def test_failures_reach_the_future(self):
+        with patch.object(early_start, "adopt_segments", side_effect=OSError("disk full")):
+            adoption = early_start.adopt("failing", "hash")
+        self.assertIsInstance(adoption.exception(), OSError)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import uuid
+import unittest
+from unittest.mock import patch
+from datetime import datetime, timedelta
+from app.core.config import settings
+from app.core.database import Base, SessionLocal, engine
+from app.models.user import User
+from app.models.project import Project, ProjectStatus, ProjectType
+from app.models.job import TranslationJob, JobStatus
+from app.services.job_queue import (
+    enqueue_job, claim_job, complete_job, cancel_job, release_job, renew_lease, reap_stale_jobs, recover_jobs,
+    HOSTNAME, fail_job, _local_time
+)
+
+OWNER = "host:1:worker-0"
+OTHER = "host:2:worker-0"
+
+
+class TestJobOwnership(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        Base.metadata.create_all(bind=engine)
+
+    def setUp(self):
+        db = SessionLocal()
+        try:
+            db.query(TranslationJob).delete()
+            db.query(Project).delete()
+            user = User(mobile=f"09{uuid.uuid4().int % 10 ** 9:09d}", balance=0.0)
+            db.add(user)
+            db.flush()
+            project = Project(name="test", type=ProjectType.english_subtitle, status=ProjectStatus.awaiting_queue,
+                              user_id=user.id, duration=60.0, resolution="1280x720", price=100.0)
+            db.add(project)
+            db.flush()
+            enqueue_job(db, project.id)
+            db.commit()
+            self.project_id = project.id
+        finally:
+            db.close()
+
+    def _state(self):
+        db = SessionLocal()
+        try:
+            job = db.query(TranslationJob).filter(TranslationJob.project_id == self.project_id).one()
+            return job.status, job.locked_by, job.project.status
+        finally:
+            db.close()
+
+    def _cancel(self):
+        db = SessionLocal()
+        try:
+            with db.begin():
+                return cancel_job(db, self.project_id)
+        finally:
+            db.close()
+
+    def test_claim_leases_the_job_to_one_owner(self):
+        job = claim_job(OWNER)
+        self.assertIsNotNone(job)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNone(claim_job(OTHER))
+        status, locked_by, project_status = self._state()
+        self.assertEqual((status, locked_by, project_status), (JobStatus.running, OWNER, ProjectStatus.processing))
+
+    def test_only_the_owner_completes(self):
+        job = claim_job(OWNER)
+        self.assertFalse(complete_job(job.id, OTHER))
+        self.assertEqual(self._state()[0], JobStatus.running)
+        self.assertTrue(complete_job(job.id, OWNER))
+        self.assertEqual(self._state(), (JobStatus.succeeded, None, ProjectStatus.completed))
+        self.assertFalse(complete_job(job.id, OWNER))
+
+    def test_cancelled_job_cannot_be_completed(self):
+        job = claim_job(OWNER)
+        self.assertEqual(self._cancel(), JobStatus.running)
+        self.assertFalse(complete_job(job.id, OWNER))
+        self.assertFalse(renew_lease(job.id, OWNER))
+        self.assertFalse(release_job(job.id, OWNER))
+        self.assertEqual(self._state()[:2], (JobStatus.cancelled, None))
+        self.assertIsNone(self._cancel())
+
+    def test_cancelled_queued_job_is_never_claimed(self):
+        self.assertEqual(self._cancel(), JobStatus.queued)
+        self.assertIsNone(claim_job(OWNER))
+
+    def test_released_job_is_claimed_again_without_using_an_attempt(self):
+        job = claim_job(OWNER)
+        self.assertTrue(release_job(job.id, OWNER))
+        self.assertEqual(self._state(), (JobStatus.queued, None, ProjectStatus.awaiting_queue))
+        claimed = claim_job(OTHER)
+        self.assertEqual((claimed.id, claimed.attempts), (job.id, 1))
+        self.assertFalse(complete_job(job.id, OWNER))
+
+    def test_reaped_job_belongs_to_its_next_owner(self):
+        job = claim_job(OWNER)
+        db = SessionLocal()
+        try:
+            with db.begin():
+                stale = db.get(TranslationJob, job.id)
+                stale.heartbeat_at = datetime.utcnow() - timedelta(days=1)
+        finally:
+            db.close()
+        events = reap_stale_jobs()
+        self.assertEqual([event["job_id"] for event in events], [job.id])
+        self.assertFalse(renew_lease(job.id, OWNER))
+        self.assertEqual(claim_job(OTHER).id, job.id)
+        self.assertFalse(complete_job(job.id, OWNER))
+        self.assertTrue(complete_job(job.id, OTHER))
+
+    def test_recovery_leaves_jobs_of_live_siblings_alone(self):
+        sibling = f"{HOSTNAME}:1:worker-0"
+        job = claim_job(sibling)
+        recover_jobs()
+        self.assertEqual(self._state()[:2], (JobStatus.running, sibling))
+        self.assertTrue(complete_job(job.id, sibling))
+
+    def _off_peak_job(self):
+        db = SessionLocal()
+        try:
+            with db.begin():
+                job = db.query(TranslationJob).filter(TranslationJob.project_id == self.project_id).one()
+                job.tier = "off_peak"
+        finally:
+            db.close()
+        # Off-peak around the clock for the claim, then closed for the next two hours
+        with patch.object(settings, "OFF_PEAK_START_HOUR", 0), patch.object(settings, "OFF_PEAK_END_HOUR", 24):
+            job = claim_job(OWNER)
+        hour = _local_time(datetime.utcnow()).hour
+        closed = (patch.object(settings, "OFF_PEAK_START_HOUR", (hour + 2) % 24),
+                  patch.object(settings, "OFF_PEAK_END_HOUR", (hour + 3) % 24))
+        return job, closed
+
+    def _available_at(self):
+        db = SessionLocal()
+        try:
+            return db.query(TranslationJob.available_at).filter(TranslationJob.project_id == self.project_id).scalar()
+        finally:
+            db.close()
+
+    def test_released_off_peak_job_waits_for_its_window(self):
+        job, (start_hour, end_hour) = self._off_peak_job()
+        with start_hour, end_hour:
+            self.assertTrue(release_job(job.id, OWNER))
+            self.assertGreater(self._available_at(), datetime.utcnow() + timedelta(minutes=59))
+            self.assertIsNone(claim_job(OTHER))
+
+    def test_retried_off_peak_job_waits_for_its_window(self):
+        job, (start_hour, end_hour) = self._off_peak_job()
+        with start_hour, end_hour:
+            self.assertEqual(fail_job(job.id, OWNER, "boom"), JobStatus.queued)
+            self.assertGreater(self._available_at(), datetime.utcnow() + timedelta(minutes=59))
+
+
+if __name__ == "__main__":
+    unittest.main()
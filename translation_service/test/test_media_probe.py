@@ -0,0 +1,115 @@
+import os
+import struct
+import shutil
+import tempfile
+import unittest
+from app.services.media_probe import probe_file
+
+
+def box(box_type: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def mvhd(timescale: int, duration: int, version: int = 0) -> bytes:
+    if version == 1:
+        header = struct.pack(">B3xQQIQ", 1, 0, 0, timescale, duration)
+    else:
+        header = struct.pack(">B3xIIII", 0, 0, 0, timescale, duration)
+    return box(b"mvhd", header + bytes(80))
+
+
+def tkhd(width: int, height: int) -> bytes:
+    return box(b"tkhd", bytes(76) + struct.pack(">II", width << 16, height << 16))
+
+
+def mp4(*moov_children: bytes, mdat_first: bool = False) -> bytes:
+    moov = box(b"moov", b"".join(moov_children))
+    mdat = box(b"mdat", bytes(1000))
+    body = mdat + moov if mdat_first else moov + mdat
+    return box(b"ftyp", b"isom" + bytes(4)) + body
+
+
+def element(element_id: int, payload: bytes, unknown_size: bool = False) -> bytes:
+    id_bytes = element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+    if unknown_size:
+        size = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+    elif len(payload) < 127:
+        size = bytes([0x80 | len(payload)])
+    else:
+        size = (0x4000 | len(payload)).to_bytes(2, "big")
+    return id_bytes + size + payload
+
+
+def uint(element_id: int, value: int) -> bytes:
+    return element(element_id, value.to_bytes(max(1, (value.bit_length() + 7) // 8), "big"))
+
+
+def matroska(duration: float, width: int, height: int, scale: int = 1000000) -> bytes:
+    info = element(0x1549A966, uint(0x2AD7B1, scale) + element(0x4489, struct.pack(">d", duration)))
+    audio = element(0xAE, uint(0xD7, 1))
+    video = element(0xAE, uint(0xD7, 2) + element(0xE0, uint(0xB0, width) + uint(0xBA, height)))
+    tracks = element(0x1654AE6B, audio + video)
+    cluster = element(0x1F43B675, bytes(500))
+    header = element(0x1A45DFA3, element(0x4282, b"webm"))
+    return header + element(0x18538067, info + tracks + cluster, unknown_size=True)
+
+
+class TestProbe(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _probe(self, content: bytes, length=None):
+        path = os.path.join(self.directory, "video")
+        with open(path, "wb") as f:
+            f.write(content)
+        return probe_file(path, length)
+
+    def test_mp4(self):
+        info = self._probe(mp4(mvhd(1000, 90500), box(b"trak", tkhd(0, 0)), box(b"trak", tkhd(1280, 720))))
+        self.assertEqual((info.duration, info.resolution), (90.5, "1280x720"))
+        self.assertTrue(info.complete)
+
+    def test_mp4_version_1_header(self):
+        info = self._probe(mp4(mvhd(600, 600 * 3600, version=1), box(b"trak", tkhd(1920, 1080))))
+        self.assertEqual((info.duration, info.resolution), (3600.0, "1920x1080"))
+
+    def test_fragmented_mp4_duration(self):
+        mehd = box(b"mehd", struct.pack(">B3xI", 0, 45000))
+        info = self._probe(mp4(mvhd(1000, 0), box(b"mvex", mehd), box(b"trak", tkhd(640, 360))))
+        self.assertEqual((info.duration, info.resolution), (45.0, "640x360"))
+
+    def test_mp4_prefix(self):
+        content = mp4(mvhd(1000, 60000), box(b"trak", tkhd(1280, 720)))
+        moov_end = content.index(b"mdat") - 4
+        self.assertTrue(self._probe(content, moov_end).complete)
+        self.assertIsNone(self._probe(content, moov_end - 1))
+
+    def test_mp4_index_after_media_data(self):
+        content = mp4(mvhd(1000, 60000), box(b"trak", tkhd(1280, 720)), mdat_first=True)
+        self.assertIsNone(self._probe(content, 500))
+        self.assertEqual(self._probe(content).duration, 60.0)
+
+    def test_matroska(self):
+        info = self._probe(matroska(125000.0, 3840, 2160))
+        self.assertEqual((info.duration, info.resolution), (125.0, "3840x2160"))
+
+    def test_matroska_timecode_scale(self):
+        info = self._probe(matroska(125.0, 1280, 720, scale=10 ** 9))
+        self.assertEqual(info.duration, 125.0)
+
+    def test_matroska_prefix(self):
+        content = matroska(60000.0, 1280, 720)
+        header_end = content.index(bytes.fromhex("1f43b675"))
+        self.assertTrue(self._probe(content, header_end).complete)
+        self.assertFalse(self._probe(content, header_end - 10).complete)
+
+    def test_unrecognised_file(self):
+        self.assertIsNone(self._probe(b"not a video at all"))
+        self.assertIsNone(self._probe(b"tiny"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from app.services import pipeline
+from app.models.project import ProjectType
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.artifact = os.path.join(self.directory, "extract_audio.wav")
+        with open(self.artifact, "wb") as f:
+            f.write(b"audio")
+        self.manifest = os.path.join(self.directory, "checkpoint.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _save(self, size):
+        with open(self.manifest, "w") as f:
+            json.dump({"version": pipeline.PIPELINE_VERSION, "source_key": "key", "operation_type": "english_subtitle",
+                       "windows": None, "stages": {"extract_audio": {"path": self.artifact, "size": size}},
+                       "segments": {}}, f)
+
+    def test_keeps_matching_entries(self):
+        self._save(5)
+        checkpoint = pipeline.Checkpoint(self.manifest, "key", "english_subtitle")
+        self.assertTrue(checkpoint.has_stage("extract_audio"))
+        self.assertTrue(checkpoint.reusable(self.artifact))
+
+    def test_size_mismatch_invalidates_entry_without_deleting_file(self):
+        self._save(99)
+        checkpoint = pipeline.Checkpoint(self.manifest, "key", "english_subtitle")
+        self.assertFalse(checkpoint.has_stage("extract_audio"))
+        self.assertFalse(checkpoint.reusable(self.artifact))
+        # The file may be a shared artifact another job is reading
+        self.assertTrue(os.path.exists(self.artifact))
+
+        checkpoint.record_stage("extract_audio", self.artifact)
+        self.assertTrue(checkpoint.reusable(self.artifact))
+
+    def test_other_run_is_ignored(self):
+        self._save(5)
+        checkpoint = pipeline.Checkpoint(self.manifest, "key", "persian_dubbing")
+        self.assertFalse(checkpoint.has_stage("extract_audio"))
+        self.assertTrue(checkpoint.reusable(self.artifact))
+
+
+class TestRunPipeline(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.calls = []
+        self.stages = {
+            "extract_audio": pipeline.Stage("extract_audio", (pipeline.SOURCE,), "wav", self._writer("audio")),
+            "transcribe": pipeline.Stage("transcribe", ("extract_audio",), "en.srt", self._writer("subtitle"),
+                                         segmented=True),
+            "english_subtitle": pipeline.Stage("english_subtitle", (pipeline.SOURCE, "transcribe"), "mp4",
+                                               self._writer("video"), shared=False),
+        }
+        self.video = os.path.join(self.directory, "source.mp4")
+        with open(self.video, "wb") as f:
+            f.write(b"source")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _writer(self, content):
+        def run(*paths):
+            self.calls.append(content)
+            with open(paths[-1], "w") as f:
+                f.write(content)
+            return paths[-1]
+        return run
+
+    def _run(self, checkpoint):
+        with patch.dict(pipeline.STAGES, self.stages), \
+                patch.object(pipeline.settings, "ARTIFACTS_DIR", self.directory), \
+                patch.object(pipeline, "plan_windows", return_value=[(0.0, 10.0)]):
+            return pipeline.run_pipeline("key", self.video, ProjectType.english_subtitle,
+                                         os.path.join(self.directory, "output.mp4"), checkpoint=checkpoint)
+
+    def test_resumes_after_recorded_stages(self):
+        checkpoint = os.path.join(self.directory, "checkpoint.json")
+        self._run(checkpoint)
+        self.assertEqual(self.calls, ["audio", "subtitle", "video"])
+        self.calls.clear()
+        self._run(checkpoint)
+        self.assertEqual(self.calls, [])
+
+    def test_redoes_shared_artifact_with_wrong_size(self):
+        checkpoint = os.path.join(self.directory, "checkpoint.json")
+        self._run(checkpoint)
+        audio = os.path.join(self.directory, f"v{pipeline.PIPELINE_VERSION}", "ke", "key", "extract_audio.wav")
+        with open(audio, "w") as f:
+            f.write("truncated audio")
+        self.calls.clear()
+        self._run(checkpoint)
+        self.assertIn("audio", self.calls)
+        with open(audio) as f:
+            self.assertEqual(f.read(), "audio")
+
+
+if __name__ == "__main__":
+    unittest.main()
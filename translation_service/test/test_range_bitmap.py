@@ -0,0 +1,30 @@
+import unittest
+from app.core.websocket_manager import RangeBitmap
+
+
+class TestRangeBitmap(unittest.TestCase):
+    def test_received_bytes_counts_each_chunk_once(self):
+        bitmap = RangeBitmap(file_size=2500, chunk_size=1000)
+        bitmap.set(0)
+        bitmap.set(0)
+        self.assertEqual(bitmap.received_bytes(), 1000)
+
+    def test_received_bytes_uses_short_last_chunk(self):
+        bitmap = RangeBitmap(file_size=2500, chunk_size=1000)
+        bitmap.set(2)
+        self.assertEqual(bitmap.received_bytes(), 500)
+        bitmap.set(0)
+        bitmap.set(1)
+        self.assertEqual(bitmap.received_bytes(), 2500)
+        self.assertTrue(bitmap.is_complete())
+
+    def test_decoded_bitmap_keeps_count(self):
+        bitmap = RangeBitmap(file_size=2500, chunk_size=1000)
+        bitmap.set(1)
+        decoded = RangeBitmap.decode(bitmap.encode(), 2500, 1000)
+        self.assertEqual(decoded.missing(), [0, 2])
+        self.assertEqual(decoded.received_bytes(), 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import sys
+import json
+import uuid
+import threading
+import unittest
+from unittest.mock import patch
+from app.core.config import settings
+from app.core.websocket_manager import WebSocketManager
+
+
+class TestCommitUploadRanges(unittest.TestCase):
+    def setUp(self):
+        self.manager = WebSocketManager()
+        self.upload_id = uuid.uuid4().hex
+        self.chunks = 2000
+        with patch.object(settings, "CHUNK_SIZE", 1):
+            self.manager.create_upload_session(self.upload_id, project_id=1, user_id=1, file_size=self.chunks,
+                                               streams=4)
+
+    def tearDown(self):
+        self.manager.remove_upload_session(self.upload_id)
+
+    def test_concurrent_commits_lose_no_chunk(self):
+        errors = []
+
+        def commit(stream):
+            try:
+                for index in range(stream, self.chunks, 4):
+                    self.manager.commit_upload_ranges(self.upload_id, [index])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=commit, args=(stream,)) for stream in range(4)]
+        # Switch threads as often as possible to make interleavings likely
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        self.assertEqual(errors, [])
+        bitmap = self.manager.get_range_bitmap(self.upload_id)
+        self.assertEqual(bitmap.count, self.chunks)
+        self.assertTrue(bitmap.is_complete())
+
+        # The persisted session is whole and has every chunk
+        with open(os.path.join(settings.SESSIONS_DIR, f"{self.upload_id}.json")) as f:
+            saved = json.load(f)
+        self.assertEqual(saved["chunk_bitmap"], bitmap.encode())
+        leftovers = [name for name in os.listdir(settings.SESSIONS_DIR)
+                     if name.startswith(self.upload_id) and name.endswith(".tmp")]
+        self.assertEqual(leftovers, [])
+
+
+class TestUploadProgress(unittest.TestCase):
+    def setUp(self):
+        self.manager = WebSocketManager()
+        self.upload_id = uuid.uuid4().hex
+        self.manager.create_upload_session(self.upload_id, project_id=1, user_id=1, file_size=4000)
+
+    def tearDown(self):
+        self.manager.remove_upload_session(self.upload_id)
+
+    def test_progress_is_percent_of_file(self):
+        self.assertEqual(self.manager.update_upload_progress(self.upload_id, 1000)["progress"], 25)
+        self.assertEqual(self.manager.commit_upload_offset(self.upload_id, 3999)["progress"], 99)
+        self.assertEqual(self.manager.update_upload_progress(self.upload_id, 4000)["progress"], 100)
+
+
+if __name__ == "__main__":
+    unittest.main()